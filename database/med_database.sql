@@ -11,6 +11,9 @@ SET row_security = off;
 DROP SCHEMA IF EXISTS tables CASCADE;
 DROP SCHEMA IF EXISTS procedures CASCADE;
 DROP SCHEMA IF EXISTS init CASCADE;
+DROP SCHEMA IF EXISTS stats CASCADE;
+DROP SCHEMA IF EXISTS partitions CASCADE;
+DROP SCHEMA IF EXISTS archive CASCADE;
 DROP DATABASE IF EXISTS med_database;
 DROP ROLE IF EXISTS med_user;
 
@@ -41,6 +44,13 @@ CREATE SCHEMA procedures;
 -- Создаем схему для инициализации
 CREATE SCHEMA init;
 
+-- Создаем схему для сводной статистики
+CREATE SCHEMA stats;
+
+-- Создаем схемы для секций таблиц и отсоединенных (архивных) секций
+CREATE SCHEMA partitions;
+CREATE SCHEMA archive;
+
 -- Установим search_path
 ALTER DATABASE med_database SET search_path TO tables, procedures, init, public;
 
@@ -55,6 +65,9 @@ SET search_path TO tables, procedures, init, public;
 ALTER SCHEMA tables OWNER TO med_procedures_owner;
 ALTER SCHEMA procedures OWNER TO med_procedures_owner;
 ALTER SCHEMA init OWNER TO med_procedures_owner;
+ALTER SCHEMA stats OWNER TO med_procedures_owner;
+ALTER SCHEMA partitions OWNER TO med_procedures_owner;
+ALTER SCHEMA archive OWNER TO med_procedures_owner;
 
 -- Таблица "Пациенты"
 CREATE TABLE tables.patients (
@@ -110,27 +123,92 @@ ALTER TABLE tables.medical_records OWNER TO med_procedures_owner;
 -- Для ускорения поиска по имени пациента создаем индекс:
 CREATE INDEX idx_patients_full_name ON tables.patients(full_name);
 
--- Добавляем поле age (возраст) как производное
+-- Индексы по внешним ключам (нужны для ON DELETE CASCADE и соединений)
+-- и по столбцам, по которым чаще всего ищут
+CREATE INDEX idx_doctors_clinic_id ON tables.doctors(clinic_id);
+CREATE INDEX idx_appointments_patient_id ON tables.appointments(patient_id);
+CREATE INDEX idx_appointments_doctor_id ON tables.appointments(doctor_id);
+CREATE INDEX idx_appointments_clinic_id ON tables.appointments(clinic_id);
+CREATE INDEX idx_appointments_appointment_date ON tables.appointments(appointment_date);
+CREATE INDEX idx_appointments_status ON tables.appointments(status);
+CREATE INDEX idx_medical_records_patient_id ON tables.medical_records(patient_id);
+CREATE INDEX idx_medical_records_record_date ON tables.medical_records(record_date);
+
+-- Индексы для поиска по префиксу ФИО без учета регистра (lower(full_name) LIKE 'абв%')
+CREATE INDEX idx_patients_full_name_prefix ON tables.patients(lower(full_name) text_pattern_ops);
+CREATE INDEX idx_doctors_full_name_prefix ON tables.doctors(lower(full_name) text_pattern_ops);
+
+-- Частичный индекс по дате только запланированных записей: по нему
+-- procedures.mark_missed_appointments находит прошедшие записи, не читая историю
+CREATE INDEX idx_appointments_scheduled_date ON tables.appointments(appointment_date)
+WHERE status = 'запланировано';
+
+-- Добавляем поле age (возраст) как производное. Хранимое значение обновляет
+-- procedures.refresh_patient_ages, функции чтения считают возраст на лету
 ALTER TABLE tables.patients ADD COLUMN age INT;
 
 -- Переходим в схему procedures
 SET search_path TO procedures, tables, init, public;
 
--- Функция для расчета возраста
-CREATE OR REPLACE FUNCTION procedures.calculate_age()
-RETURNS TRIGGER
+-- Функция для расчета возраста по дате рождения на текущую дату
+CREATE OR REPLACE FUNCTION procedures.patient_age(birth_date DATE)
+RETURNS INT
 AS $$
+    SELECT DATE_PART('year', AGE(birth_date))::INT;
+$$ LANGUAGE sql STABLE;
+-- Пример: SELECT procedures.patient_age('1990-05-15');
+
+-- Функция, возвращающая источник строк таблицы для функций чтения: для patients -
+-- подзапрос, в котором age вычисляется при чтении (столбцы в том же порядке, что и
+-- в таблице, чтобы строки подходили под тип tables.patients), для остальных - саму таблицу
+CREATE OR REPLACE FUNCTION procedures.get_table_source(table_name TEXT)
+RETURNS TEXT
+AS $$
+DECLARE
+    columns_list TEXT;
 BEGIN
-    NEW.age := DATE_PART('year', AGE(NEW.birth_date));
-    RETURN NEW;
+    IF table_name <> 'patients' THEN
+        RETURN format('tables.%I', table_name);
+    END IF;
+
+    SELECT string_agg(
+        CASE WHEN a.attname = 'age'
+            THEN 'procedures.patient_age(p.birth_date) AS age'
+            ELSE format('p.%I', a.attname)
+        END,
+        ', ' ORDER BY a.attnum
+    )
+    INTO columns_list
+    FROM pg_attribute AS a
+    WHERE a.attrelid = 'tables.patients'::regclass AND a.attnum > 0 AND NOT a.attisdropped;
+
+    RETURN format('(SELECT %s FROM tables.patients AS p)', columns_list);
 END;
-$$ LANGUAGE plpgsql;
+$$ LANGUAGE plpgsql STABLE;
+-- Пример: SELECT procedures.get_table_source('patients');
 
--- Триггер для расчета возраста
-CREATE TRIGGER trigger_calculate_age
-BEFORE INSERT OR UPDATE ON tables.patients
-FOR EACH ROW
-EXECUTE FUNCTION procedures.calculate_age();
+-- Процедура обновления хранимого возраста пациентов одним запросом: меняются только
+-- строки, у которых возраст устарел (после дня рождения). Вызывается периодически
+-- (maintenance.py) вместо построчного триггера на каждую вставку и изменение
+CREATE OR REPLACE PROCEDURE procedures.refresh_patient_ages(INOUT updated_total BIGINT DEFAULT 0)
+AS $$
+BEGIN
+    PERFORM set_config('med.skip_notify', 'on', true);
+    UPDATE tables.patients
+    SET age = procedures.patient_age(birth_date)
+    WHERE age IS DISTINCT FROM procedures.patient_age(birth_date);
+    GET DIAGNOSTICS updated_total = ROW_COUNT;
+    PERFORM set_config('med.skip_notify', 'off', true);
+
+    IF updated_total > 0 THEN
+        PERFORM pg_notify(
+            'med_table_changes',
+            json_build_object('table', 'patients', 'op', 'BULK')::TEXT
+        );
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+-- Пример: CALL procedures.refresh_patient_ages();
 
 -- Триггер для изменения статуса записи
 CREATE OR REPLACE FUNCTION procedures.update_appointment_status()
@@ -144,33 +222,716 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
--- Триггер для обновления статуса записи
+-- Триггер для обновления статуса записи. Условие WHEN проверяется без вызова функции,
+-- поэтому остальные вставки и изменения записей не тратят время на триггер.
+-- Записи, которые прошли, но никто не менял, переводит procedures.mark_missed_appointments
 CREATE TRIGGER trigger_update_status
 BEFORE INSERT OR UPDATE ON tables.appointments
 FOR EACH ROW
+WHEN (NEW.status = 'запланировано' AND NEW.appointment_date < CURRENT_DATE)
 EXECUTE FUNCTION procedures.update_appointment_status();
 
--- Процедура поиска записи по ключу
-CREATE OR REPLACE FUNCTION procedures.search_by_key(
-    table_name TEXT,
-    column_name TEXT,
-    search_value TEXT
+-- Процедура для перевода всех прошедших запланированных записей в статус 'пропущено'.
+-- Записи выбираются по частичному индексу idx_appointments_scheduled_date пачками
+-- по batch_size, каждая пачка - отдельная транзакция, поэтому блокировки держатся
+-- недолго. Строки, заблокированные другими транзакциями, пропускаются до следующего
+-- запуска (SKIP LOCKED). Вместо построчных уведомлений на пачку уходит одно "BULK".
+-- В updated_total возвращается число измененных записей.
+-- Из-за COMMIT внутри процедуру нужно вызывать вне транзакции (в режиме AUTOCOMMIT)
+CREATE OR REPLACE PROCEDURE procedures.mark_missed_appointments(
+    batch_size INT DEFAULT 10000,
+    INOUT updated_total BIGINT DEFAULT 0
 )
-RETURNS TABLE(result JSON)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated_num INT;
+BEGIN
+    IF batch_size < 1 THEN
+        RAISE EXCEPTION 'Batch size must be positive';
+    END IF;
+    updated_total := 0;
+
+    LOOP
+        PERFORM set_config('med.skip_notify', 'on', true);
+
+        UPDATE tables.appointments AS a
+        SET status = 'пропущено'
+        WHERE a.id IN (
+            SELECT id
+            FROM tables.appointments
+            WHERE appointment_date < CURRENT_DATE
+            AND status = 'запланировано'
+            LIMIT batch_size
+            FOR UPDATE SKIP LOCKED
+        );
+        GET DIAGNOSTICS updated_num = ROW_COUNT;
+        updated_total := updated_total + updated_num;
+
+        IF updated_num > 0 THEN
+            PERFORM pg_notify(
+                'med_table_changes',
+                json_build_object('table', 'appointments', 'op', 'BULK')::TEXT
+            );
+        END IF;
+        COMMIT;
+
+        EXIT WHEN updated_num < batch_size;
+    END LOOP;
+END;
+$$;
+-- Пример: CALL procedures.mark_missed_appointments(10000, NULL);
+
+-- Секционирование записей на прием и медкнижек по дате включается при инициализации:
+-- CALL init.initialize_database(TRUE). Секции по месяцам лежат в схеме partitions
+-- (<таблица>_pГГГГММ), строки вне созданных секций попадают в секцию по умолчанию
+-- <таблица>_default. Отсоединенные старые секции переносятся в схему archive
+
+-- Функция, возвращающая столбец, по которому секционирована таблица схемы tables
+-- (NULL, если таблица не секционирована)
+CREATE OR REPLACE FUNCTION procedures.get_partition_column(table_name TEXT)
+RETURNS TEXT
 AS $$
+    SELECT a.attname::TEXT
+    FROM pg_partitioned_table AS pt
+    JOIN pg_attribute AS a ON a.attrelid = pt.partrelid AND a.attnum = pt.partattrs[0]
+    WHERE pt.partrelid = to_regclass(format('tables.%I', table_name));
+$$ LANGUAGE sql STABLE;
+-- Пример: SELECT procedures.get_partition_column('appointments');
+
+-- Процедура создания месячных секций таблицы за период from_date..to_date.
+-- Существующие секции пропускаются. Строки месяца, уже попавшие в секцию по умолчанию,
+-- переносятся в новую секцию до ее присоединения (данные таблицы при этом не меняются,
+-- поэтому построчные уведомления на время переноса отключены)
+CREATE OR REPLACE PROCEDURE procedures.create_partitions(table_name TEXT, from_date DATE, to_date DATE)
+LANGUAGE plpgsql
+SECURITY DEFINER -- выполняется с правами владельца процедуры
+AS $$
+DECLARE
+    partition_column TEXT := procedures.get_partition_column(table_name);
+    skip_notify TEXT := COALESCE(current_setting('med.skip_notify', true), 'off');
+    month_start DATE := date_trunc('month', from_date)::DATE;
+    month_end DATE;
+    partition_name TEXT;
 BEGIN
-    RETURN QUERY EXECUTE FORMAT(
-        'SELECT row_to_json(t) FROM tables.%I t WHERE %I = %L',
+    IF partition_column IS NULL THEN
+        RAISE EXCEPTION 'Table %.% is not partitioned', 'tables', table_name;
+    END IF;
+
+    PERFORM set_config('med.skip_notify', 'on', true);
+
+    WHILE month_start <= to_date LOOP
+        month_end := (month_start + INTERVAL '1 month')::DATE;
+        partition_name := format('%s_p%s', table_name, to_char(month_start, 'YYYYMM'));
+
+        IF to_regclass(format('partitions.%I', partition_name)) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE partitions.%I (LIKE tables.%I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                partition_name,
+                table_name
+            );
+            EXECUTE format(
+                'WITH moved_rows AS (
+                     DELETE FROM partitions.%I WHERE %I >= %L AND %I < %L RETURNING *
+                 )
+                 INSERT INTO partitions.%I SELECT * FROM moved_rows',
+                table_name || '_default',
+                partition_column,
+                month_start,
+                partition_column,
+                month_end,
+                partition_name
+            );
+            EXECUTE format(
+                'ALTER TABLE tables.%I ATTACH PARTITION partitions.%I FOR VALUES FROM (%L) TO (%L)',
+                table_name,
+                partition_name,
+                month_start,
+                month_end
+            );
+        END IF;
+
+        month_start := month_end;
+    END LOOP;
+
+    PERFORM set_config('med.skip_notify', skip_notify, true);
+END;
+$$;
+-- Пример: CALL procedures.create_partitions('appointments', '2025-01-01', '2025-12-31');
+
+-- Процедура создания секций всех секционированных таблиц на months_ahead месяцев
+-- вперед от текущего. Заодно создает секции для месяцев, строки которых накопились
+-- в секции по умолчанию (например, после загрузки старых данных через COPY).
+-- Вызывается периодически (maintenance.py)
+CREATE OR REPLACE PROCEDURE procedures.create_partitions_ahead(months_ahead INT DEFAULT 3)
+LANGUAGE plpgsql
+SECURITY DEFINER -- выполняется с правами владельца процедуры
+AS $$
+DECLARE
+    table_name TEXT;
+    partition_column TEXT;
+    month_start DATE;
+BEGIN
+    IF months_ahead < 0 THEN
+        RAISE EXCEPTION 'Months ahead must not be negative';
+    END IF;
+
+    FOR table_name, partition_column IN
+        SELECT c.relname, procedures.get_partition_column(c.relname)
+        FROM pg_class AS c
+        WHERE c.relnamespace = to_regnamespace('tables')
+        AND c.relkind = 'p'
+    LOOP
+        FOR month_start IN EXECUTE format(
+            'SELECT DISTINCT date_trunc(''month'', %I)::DATE FROM partitions.%I',
+            partition_column,
+            table_name || '_default'
+        ) LOOP
+            CALL procedures.create_partitions(table_name, month_start, month_start);
+        END LOOP;
+
+        CALL procedures.create_partitions(
+            table_name,
+            CURRENT_DATE,
+            (date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead))::DATE
+        );
+    END LOOP;
+END;
+$$;
+-- Пример: CALL procedures.create_partitions_ahead(3);
+
+-- Процедура архивации: секции, все даты которых раньше older_than, отсоединяются
+-- от таблиц и переносятся в схему archive вместе с данными. Приложение их больше
+-- не видит, сводка stats.appointment_counts уменьшается на архивные записи,
+-- внешние ключи архивных таблиц удаляются (удаление пациента их не затрагивает).
+-- В archived_num возвращается число перенесенных секций
+CREATE OR REPLACE PROCEDURE procedures.archive_partitions(older_than DATE, INOUT archived_num INT DEFAULT 0)
+LANGUAGE plpgsql
+SECURITY DEFINER -- выполняется с правами владельца процедуры
+AS $$
+DECLARE
+    partition_row RECORD;
+    archive_name TEXT;
+    constraint_name TEXT;
+BEGIN
+    archived_num := 0;
+
+    FOR partition_row IN
+        SELECT parent.relname AS table_name, child.relname AS partition_name
+        FROM pg_inherits AS i
+        JOIN pg_class AS parent ON parent.oid = i.inhparent
+        JOIN pg_class AS child ON child.oid = i.inhrelid
+        WHERE parent.relnamespace = to_regnamespace('tables')
+        AND parent.relkind = 'p'
+        AND child.relnamespace = to_regnamespace('partitions')
+        AND substring(
+            pg_get_expr(child.relpartbound, child.oid) FROM 'TO \(''([^'']+)''\)'
+        )::DATE <= older_than
+        ORDER BY child.relname
+    LOOP
+        -- Блокировка секции до отсоединения: сводка и архив видят одни и те же строки
+        EXECUTE format('LOCK TABLE partitions.%I IN ACCESS EXCLUSIVE MODE', partition_row.partition_name);
+
+        IF partition_row.table_name = 'appointments' THEN
+            EXECUTE format(
+                'INSERT INTO stats.appointment_count_deltas (clinic_id, doctor_id, status, appointments_num)
+                 SELECT COALESCE(clinic_id, 0), COALESCE(doctor_id, 0), COALESCE(status, ''''), -COUNT(*)
+                 FROM partitions.%I
+                 GROUP BY 1, 2, 3',
+                partition_row.partition_name
+            );
+        END IF;
+
+        EXECUTE format(
+            'ALTER TABLE tables.%I DETACH PARTITION partitions.%I',
+            partition_row.table_name,
+            partition_row.partition_name
+        );
+
+        FOR constraint_name IN
+            SELECT conname
+            FROM pg_constraint
+            WHERE conrelid = format('partitions.%I', partition_row.partition_name)::REGCLASS
+            AND contype = 'f'
+        LOOP
+            EXECUTE format(
+                'ALTER TABLE partitions.%I DROP CONSTRAINT %I',
+                partition_row.partition_name,
+                constraint_name
+            );
+        END LOOP;
+
+        -- Секцию того же месяца могли создать заново и снова архивировать
+        archive_name := partition_row.partition_name;
+        IF to_regclass(format('archive.%I', archive_name)) IS NOT NULL THEN
+            archive_name := archive_name || '_' || to_char(clock_timestamp(), 'YYYYMMDDHH24MISS');
+            EXECUTE format(
+                'ALTER TABLE partitions.%I RENAME TO %I',
+                partition_row.partition_name,
+                archive_name
+            );
+        END IF;
+        EXECUTE format('ALTER TABLE partitions.%I SET SCHEMA archive', archive_name);
+
+        PERFORM pg_notify(
+            'med_table_changes',
+            json_build_object('table', partition_row.table_name, 'op', 'BULK')::TEXT
+        );
+        archived_num := archived_num + 1;
+    END LOOP;
+END;
+$$;
+-- Пример: CALL procedures.archive_partitions('2024-01-01', NULL);
+
+-- Процедура перевода таблицы схемы tables в секционированную по столбцу partition_column
+-- (вызывается из init.initialize_database(TRUE)). Таблица пересоздается с теми же
+-- столбцами, значениями по умолчанию, проверками и внешними ключами; первичный ключ
+-- дополняется столбцом секционирования. Секции создаются по месяцам уже имеющихся строк,
+-- после чего строки копируются в новую таблицу. Уже секционированная таблица не меняется
+CREATE OR REPLACE PROCEDURE init.partition_table(table_name TEXT, partition_column TEXT)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    old_table_name TEXT := table_name || '_unpartitioned';
+    sequence_name TEXT := pg_get_serial_sequence(format('tables.%I', table_name), 'id');
+    foreign_key RECORD;
+    month_start DATE;
+BEGIN
+    IF procedures.get_partition_column(table_name) IS NOT NULL THEN
+        RETURN;
+    END IF;
+
+    EXECUTE format('ALTER TABLE tables.%I RENAME TO %I', table_name, old_table_name);
+    EXECUTE format(
+        'ALTER TABLE tables.%I RENAME CONSTRAINT %I TO %I',
+        old_table_name,
+        table_name || '_pkey',
+        old_table_name || '_pkey'
+    );
+
+    EXECUTE format(
+        'CREATE TABLE tables.%I (LIKE tables.%I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+         PARTITION BY RANGE (%I)',
         table_name,
-        column_name,
-        search_value
+        old_table_name,
+        partition_column
+    );
+    EXECUTE format(
+        'ALTER TABLE tables.%I ADD CONSTRAINT %I PRIMARY KEY (id, %I)',
+        table_name,
+        table_name || '_pkey',
+        partition_column
     );
+    FOR foreign_key IN
+        SELECT conname, pg_get_constraintdef(oid) AS definition
+        FROM pg_constraint
+        WHERE conrelid = format('tables.%I', old_table_name)::REGCLASS
+        AND contype = 'f'
+    LOOP
+        EXECUTE format(
+            'ALTER TABLE tables.%I ADD CONSTRAINT %I %s',
+            table_name,
+            foreign_key.conname,
+            foreign_key.definition
+        );
+    END LOOP;
+
+    EXECUTE format(
+        'CREATE TABLE partitions.%I PARTITION OF tables.%I DEFAULT',
+        table_name || '_default',
+        table_name
+    );
+    FOR month_start IN EXECUTE format(
+        'SELECT DISTINCT date_trunc(''month'', %I)::DATE FROM tables.%I',
+        partition_column,
+        old_table_name
+    ) LOOP
+        CALL procedures.create_partitions(table_name, month_start, month_start);
+    END LOOP;
+
+    EXECUTE format('INSERT INTO tables.%I SELECT * FROM tables.%I', table_name, old_table_name);
+
+    -- Последовательность id переходит к новой таблице, старая удаляется вместе с
+    -- индексами и триггерами (их заново создает init.initialize_database)
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY tables.%I.id', sequence_name, table_name);
+    EXECUTE format('DROP TABLE tables.%I', old_table_name);
+    EXECUTE format('ALTER TABLE tables.%I OWNER TO med_procedures_owner', table_name);
+
+    RAISE NOTICE 'Таблица %.% секционирована по столбцу %', 'tables', table_name, partition_column;
+END;
+$$;
+-- Пример: CALL init.partition_table('appointments', 'appointment_date');
+
+-- Триггерная функция для уведомления клиентов об изменениях данных.
+-- В канал med_table_changes уходит компактное сообщение {"table", "op", "id"};
+-- для TRUNCATE (триггер на уровне оператора) - без id. Уведомления доставляются
+-- слушателям только после COMMIT, одинаковые сообщения транзакции склеиваются.
+-- Массовая загрузка отключает построчные уведомления настройкой транзакции
+-- med.skip_notify = 'on' и отправляет одно сообщение {"table", "op": "BULK"} на таблицу.
+-- Имя таблицы передается аргументом триггера: у секций секционированной таблицы
+-- TG_TABLE_NAME - имя секции, а клиенты ждут имя самой таблицы
+CREATE OR REPLACE FUNCTION procedures.notify_row_change()
+RETURNS TRIGGER
+AS $$
+DECLARE
+    record_id INT;
+    table_name TEXT := COALESCE(TG_ARGV[0], TG_TABLE_NAME);
+BEGIN
+    IF current_setting('med.skip_notify', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify(
+            'med_table_changes',
+            json_build_object('table', table_name, 'op', TG_OP)::TEXT
+        );
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        record_id := OLD.id;
+    ELSE
+        record_id := NEW.id;
+    END IF;
+
+    PERFORM pg_notify(
+        'med_table_changes',
+        json_build_object('table', table_name, 'op', TG_OP, 'id', record_id)::TEXT
+    );
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-/* Пример:
-SELECT * FROM procedures.search_by_key('patients', 'full_name', 'Алексеева Анна Сергеевна');
-*/
+-- Процедура для создания триггеров уведомлений на всех таблицах схемы tables
+CREATE OR REPLACE PROCEDURE procedures.create_notify_triggers()
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    table_name TEXT;
+BEGIN
+    FOR table_name IN
+        SELECT c.relname
+        FROM pg_class AS c
+        WHERE c.relnamespace = to_regnamespace('tables')
+        AND c.relkind IN ('r', 'p')
+        AND NOT c.relispartition
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trigger_notify_row_change ON tables.%I', table_name);
+        EXECUTE format(
+            'CREATE TRIGGER trigger_notify_row_change
+             AFTER INSERT OR UPDATE OR DELETE ON tables.%I
+             FOR EACH ROW
+             EXECUTE FUNCTION procedures.notify_row_change(%L)',
+            table_name,
+            table_name
+        );
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trigger_notify_truncate ON tables.%I', table_name);
+        EXECUTE format(
+            'CREATE TRIGGER trigger_notify_truncate
+             AFTER TRUNCATE ON tables.%I
+             FOR EACH STATEMENT
+             EXECUTE FUNCTION procedures.notify_row_change(%L)',
+            table_name,
+            table_name
+        );
+    END LOOP;
+END;
+$$;
+-- Пример: CALL procedures.create_notify_triggers();
+
+-- Триггеры уведомлений об изменениях данных
+CALL procedures.create_notify_triggers();
+
+-- Сводная таблица для Dashboard: число записей на прием по поликлинике, доктору и статусу.
+-- Поддерживается триггерами на tables.appointments, поэтому сводки читаются
+-- без просмотра всей истории записей. 0 в clinic_id / doctor_id и пустая строка
+-- в status - значение в записи не указано. Строки с нулем не удаляются сразу,
+-- их убирает procedures.rebuild_appointment_stats()
+CREATE TABLE stats.appointment_counts (
+    clinic_id INT NOT NULL,
+    doctor_id INT NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    appointments_num BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (clinic_id, doctor_id, status)
+);
+ALTER TABLE stats.appointment_counts OWNER TO med_procedures_owner;
+
+-- Изменения сводки, еще не перенесенные в stats.appointment_counts. Триггеры только
+-- добавляют сюда строки, поэтому одновременные записи на прием к одному доктору
+-- не обновляют одну и ту же строку сводки (в SERIALIZABLE это давало ошибку
+-- сериализации). Переносит изменения procedures.fold_appointment_stats(),
+-- procedures.get_dashboard_stats() складывает сводку с еще не перенесенными
+CREATE TABLE stats.appointment_count_deltas (
+    clinic_id INT NOT NULL,
+    doctor_id INT NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    appointments_num BIGINT NOT NULL
+);
+ALTER TABLE stats.appointment_count_deltas OWNER TO med_procedures_owner;
+
+-- Триггерная функция (на уровне оператора) для пересчета сводки по изменившимся строкам.
+-- Изменения берутся из переходных таблиц new_rows / old_rows: на каждый оператор,
+-- в том числе COPY и массовые INSERT ... SELECT, - один агрегирующий запрос
+CREATE OR REPLACE FUNCTION procedures.apply_appointment_stats_delta()
+RETURNS TRIGGER
+AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        TRUNCATE stats.appointment_counts, stats.appointment_count_deltas;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO stats.appointment_count_deltas (clinic_id, doctor_id, status, appointments_num)
+        SELECT COALESCE(clinic_id, 0), COALESCE(doctor_id, 0), COALESCE(status, ''), COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO stats.appointment_count_deltas (clinic_id, doctor_id, status, appointments_num)
+        SELECT COALESCE(clinic_id, 0), COALESCE(doctor_id, 0), COALESCE(status, ''), -COUNT(*)
+        FROM old_rows
+        GROUP BY 1, 2, 3;
+    ELSE
+        -- При UPDATE сводка меняется, только если изменились поликлиника, доктор или статус
+        INSERT INTO stats.appointment_count_deltas (clinic_id, doctor_id, status, appointments_num)
+        SELECT clinic_id, doctor_id, status, SUM(delta)
+        FROM (
+            SELECT COALESCE(clinic_id, 0) AS clinic_id, COALESCE(doctor_id, 0) AS doctor_id,
+                   COALESCE(status, '') AS status, 1 AS delta
+            FROM new_rows
+            UNION ALL
+            SELECT COALESCE(clinic_id, 0), COALESCE(doctor_id, 0), COALESCE(status, ''), -1
+            FROM old_rows
+        ) AS changes
+        GROUP BY 1, 2, 3
+        HAVING SUM(delta) <> 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER; -- med_user не пишет в схему stats напрямую
+
+-- Процедура для создания триггеров сводной статистики на tables.appointments
+CREATE OR REPLACE PROCEDURE procedures.create_appointment_stats_triggers()
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DROP TRIGGER IF EXISTS trigger_appointment_stats_insert ON tables.appointments;
+    CREATE TRIGGER trigger_appointment_stats_insert
+    AFTER INSERT ON tables.appointments
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION procedures.apply_appointment_stats_delta();
+
+    DROP TRIGGER IF EXISTS trigger_appointment_stats_update ON tables.appointments;
+    CREATE TRIGGER trigger_appointment_stats_update
+    AFTER UPDATE ON tables.appointments
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION procedures.apply_appointment_stats_delta();
+
+    DROP TRIGGER IF EXISTS trigger_appointment_stats_delete ON tables.appointments;
+    CREATE TRIGGER trigger_appointment_stats_delete
+    AFTER DELETE ON tables.appointments
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION procedures.apply_appointment_stats_delta();
+
+    DROP TRIGGER IF EXISTS trigger_appointment_stats_truncate ON tables.appointments;
+    CREATE TRIGGER trigger_appointment_stats_truncate
+    AFTER TRUNCATE ON tables.appointments
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION procedures.apply_appointment_stats_delta();
+END;
+$$;
+-- Пример: CALL procedures.create_appointment_stats_triggers();
+
+-- Триггеры сводной статистики
+CALL procedures.create_appointment_stats_triggers();
+
+-- Процедура для полного пересчета сводной статистики по tables.appointments.
+-- Нужна после инициализации на уже заполненных таблицах; заодно удаляет нулевые строки.
+-- На время пересчета изменения записей на прием блокируются
+CREATE OR REPLACE PROCEDURE procedures.rebuild_appointment_stats()
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    LOCK TABLE tables.appointments IN SHARE MODE;
+    TRUNCATE stats.appointment_counts, stats.appointment_count_deltas;
+    INSERT INTO stats.appointment_counts (clinic_id, doctor_id, status, appointments_num)
+    SELECT COALESCE(clinic_id, 0), COALESCE(doctor_id, 0), COALESCE(status, ''), COUNT(*)
+    FROM tables.appointments
+    GROUP BY 1, 2, 3;
+END;
+$$;
+-- Пример: CALL procedures.rebuild_appointment_stats();
+
+-- Процедура переноса накопленных изменений stats.appointment_count_deltas в сводку
+-- stats.appointment_counts одним запросом. Вызывается периодически (maintenance.py).
+-- Выполняется в READ COMMITTED (вне транзакции, как и другие процедуры обслуживания):
+-- строки изменений, добавленные во время переноса, останутся до следующего вызова.
+-- В folded_num возвращается число перенесенных строк изменений
+CREATE OR REPLACE PROCEDURE procedures.fold_appointment_stats(INOUT folded_num BIGINT DEFAULT 0)
+LANGUAGE plpgsql
+SECURITY DEFINER -- med_user не пишет в схему stats напрямую
+AS $$
+BEGIN
+    WITH folded AS (
+        DELETE FROM stats.appointment_count_deltas
+        RETURNING clinic_id, doctor_id, status, appointments_num
+    ),
+    applied AS (
+        INSERT INTO stats.appointment_counts AS counts (clinic_id, doctor_id, status, appointments_num)
+        SELECT clinic_id, doctor_id, status, SUM(appointments_num)
+        FROM folded
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (clinic_id, doctor_id, status)
+        DO UPDATE SET appointments_num = counts.appointments_num + EXCLUDED.appointments_num
+    )
+    SELECT COUNT(*) INTO folded_num FROM folded;
+END;
+$$;
+-- Пример: CALL procedures.fold_appointment_stats(NULL);
+
+-- Функция для получения сводной статистики для Dashboard в формате JSON:
+-- число записей по статусам, по поликлиникам и по докторам (всего и по каждому статусу)
+CREATE OR REPLACE FUNCTION procedures.get_dashboard_stats()
+RETURNS JSON AS $$
+BEGIN
+    RETURN (
+        WITH counts AS (
+            SELECT clinic_id, doctor_id, status, SUM(appointments_num) AS appointments_num
+            FROM (
+                SELECT clinic_id, doctor_id, status, appointments_num
+                FROM stats.appointment_counts
+                UNION ALL
+                SELECT clinic_id, doctor_id, status, appointments_num
+                FROM stats.appointment_count_deltas
+            ) AS all_counts
+            GROUP BY clinic_id, doctor_id, status
+            HAVING SUM(appointments_num) <> 0
+        ),
+        clinic_counts AS (
+            SELECT clinic_id, status, SUM(appointments_num) AS appointments_num
+            FROM counts
+            GROUP BY clinic_id, status
+        ),
+        doctor_counts AS (
+            SELECT doctor_id, status, SUM(appointments_num) AS appointments_num
+            FROM counts
+            GROUP BY doctor_id, status
+        )
+        SELECT json_build_object(
+            'statuses', (
+                SELECT COALESCE(json_object_agg(status, appointments_num), '{}')
+                FROM (
+                    SELECT status, SUM(appointments_num) AS appointments_num
+                    FROM counts
+                    GROUP BY status
+                ) AS status_counts
+            ),
+            'clinics', (
+                SELECT COALESCE(json_agg(clinic_stats ORDER BY total DESC, clinic_id), '[]')
+                FROM (
+                    SELECT cc.clinic_id, c.name, SUM(cc.appointments_num) AS total,
+                           json_object_agg(cc.status, cc.appointments_num) AS statuses
+                    FROM clinic_counts AS cc
+                    LEFT JOIN tables.clinic AS c ON c.id = cc.clinic_id
+                    GROUP BY cc.clinic_id, c.name
+                ) AS clinic_stats
+            ),
+            'doctors', (
+                SELECT COALESCE(json_agg(doctor_stats ORDER BY total DESC, doctor_id), '[]')
+                FROM (
+                    SELECT dc.doctor_id, d.full_name, d.specialization, d.clinic_id,
+                           SUM(dc.appointments_num) AS total,
+                           json_object_agg(dc.status, dc.appointments_num) AS statuses
+                    FROM doctor_counts AS dc
+                    LEFT JOIN tables.doctors AS d ON d.id = dc.doctor_id
+                    GROUP BY dc.doctor_id, d.full_name, d.specialization, d.clinic_id
+                ) AS doctor_stats
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
+-- Пример: SELECT procedures.get_dashboard_stats();
+
+-- Функция сборки условия WHERE из набора условий, объединенных через AND.
+-- Каждое условие: {"column": ..., "mode": "eq" | "range" | "prefix", "value": ..., "value_to": ...}
+-- eq     - равенство, значение приводится к типу столбца (работают индексы, в т.ч. PK)
+-- range  - диапазон value..value_to (BETWEEN), любая из границ может быть null
+-- prefix - поиск по началу строки без учета регистра (lower(столбец) LIKE 'префикс%')
+CREATE OR REPLACE FUNCTION procedures.build_search_condition(table_name TEXT, filters JSON)
+RETURNS TEXT AS $$
+DECLARE
+    search_filter JSON;
+    column_name TEXT;
+    column_type TEXT;
+    conditions TEXT[] := ARRAY[]::TEXT[];
+BEGIN
+    FOR search_filter IN SELECT * FROM json_array_elements(filters)
+    LOOP
+        column_name := search_filter->>'column';
+
+        SELECT format_type(a.atttypid, a.atttypmod)
+        INTO column_type
+        FROM pg_attribute AS a
+        WHERE a.attrelid = format('tables.%I', table_name)::REGCLASS
+        AND a.attname = column_name
+        AND a.attnum > 0
+        AND NOT a.attisdropped;
+
+        IF column_type IS NULL THEN
+            RAISE EXCEPTION 'Column % does not exist in table tables.%', column_name, table_name;
+        END IF;
+
+        CASE COALESCE(search_filter->>'mode', 'eq')
+        WHEN 'eq' THEN
+            conditions := conditions || format(
+                't.%I = %L::%s', column_name, search_filter->>'value', column_type
+            );
+        WHEN 'range' THEN
+            IF search_filter->>'value' IS NOT NULL AND search_filter->>'value_to' IS NOT NULL THEN
+                conditions := conditions || format(
+                    't.%I BETWEEN %L::%s AND %L::%s',
+                    column_name,
+                    search_filter->>'value', column_type,
+                    search_filter->>'value_to', column_type
+                );
+            ELSIF search_filter->>'value' IS NOT NULL THEN
+                conditions := conditions || format(
+                    't.%I >= %L::%s', column_name, search_filter->>'value', column_type
+                );
+            ELSIF search_filter->>'value_to' IS NOT NULL THEN
+                conditions := conditions || format(
+                    't.%I <= %L::%s', column_name, search_filter->>'value_to', column_type
+                );
+            END IF;
+        WHEN 'prefix' THEN
+            -- Экранируем спецсимволы LIKE, чтобы значение искалось буквально
+            conditions := conditions || format(
+                'lower(t.%I::TEXT) LIKE %L',
+                column_name,
+                lower(replace(replace(replace(
+                    search_filter->>'value', '\', '\\'), '%', '\%'), '_', '\_')) || '%'
+            );
+        ELSE
+            RAISE EXCEPTION 'Unknown search mode %', search_filter->>'mode';
+        END CASE;
+    END LOOP;
+
+    IF cardinality(conditions) = 0 THEN
+        RAISE EXCEPTION 'No search conditions given';
+    END IF;
+
+    RETURN array_to_string(conditions, ' AND ');
+END;
+$$ LANGUAGE plpgsql;
+-- Пример: SELECT procedures.build_search_condition('patients', '[{"column": "full_name", "mode": "prefix", "value": "Иван"}]');
 
 -- Процедура удаления записи
 CREATE OR REPLACE PROCEDURE procedures.delete_record(table_name TEXT, column_name TEXT, key_value TEXT)
@@ -190,7 +951,7 @@ BEGIN
     EXECUTE format(
         'INSERT INTO tables.%I (%s) VALUES (%s)',
         table_name,
-        array_to_string(columns, ', '),
+        array_to_string(ARRAY(SELECT quote_ident(x) FROM unnest(columns) AS x), ', '),
         array_to_string(ARRAY(SELECT quote_literal(x) FROM unnest(info) AS x), ', ')
     );
 END;
@@ -214,6 +975,60 @@ END;
 $$;
 -- Пример: CALL procedures.update_record('patients', 'contacts', '89991112233', 'id', '1');
 
+-- Процедура изменения нескольких столбцов записи одним UPDATE.
+-- new_values - JSON-объект {"столбец": "значение", ...}; значения приводятся к типам
+-- столбцов через json_populate_record, триггеры срабатывают один раз на запись
+CREATE OR REPLACE PROCEDURE procedures.update_record_fields(table_name TEXT, new_values JSON, key_column TEXT, key_value TEXT)
+LANGUAGE plpgsql AS $$
+DECLARE
+    set_columns TEXT;
+BEGIN
+    SELECT string_agg(format('%I', column_name), ', ')
+    INTO set_columns
+    FROM json_object_keys(new_values) AS column_name;
+
+    IF set_columns IS NULL THEN
+        RETURN;
+    END IF;
+
+    EXECUTE format(
+        'UPDATE tables.%1$I AS t
+         SET (%2$s) = (SELECT %2$s FROM json_populate_record(NULL::tables.%1$I, $1))
+         WHERE t.%3$I = %4$L',
+        table_name, set_columns, key_column, key_value
+    ) USING new_values;
+END;
+$$;
+-- Пример: CALL procedures.update_record_fields('patients', '{"contacts": "89991112233", "full_name": "Иванов Иван"}', 'id', '1');
+
+-- Процедура изменения многих записей одним UPDATE.
+-- new_rows - JSON-массив [{"id": ..., "столбец": "значение", ...}, ...];
+-- у всех элементов должен быть одинаковый набор столбцов, иначе недостающие станут NULL
+CREATE OR REPLACE PROCEDURE procedures.update_records_batch(table_name TEXT, new_rows JSON, key_column TEXT)
+LANGUAGE plpgsql AS $$
+DECLARE
+    set_columns TEXT;
+BEGIN
+    SELECT string_agg(format('%1$I = v.%1$I', column_name), ', ')
+    INTO set_columns
+    FROM json_object_keys(new_rows->0) AS column_name
+    WHERE column_name <> key_column;
+
+    IF set_columns IS NULL THEN
+        RETURN;
+    END IF;
+
+    EXECUTE format(
+        'UPDATE tables.%1$I AS t
+         SET %2$s
+         FROM json_populate_recordset(NULL::tables.%1$I, $1) AS v
+         WHERE t.%3$I = v.%3$I',
+        table_name, set_columns, key_column
+    ) USING new_rows;
+END;
+$$;
+-- Пример: CALL procedures.update_records_batch('appointments', '[{"id": 1, "status": "завершено"}, {"id": 2, "status": "отменено"}]', 'id');
+
 -- Процедура для удаления схемы с каскадным удалением всех таблиц
 CREATE OR REPLACE PROCEDURE procedures.drop_database_schema()
 LANGUAGE plpgsql
@@ -227,67 +1042,376 @@ BEGIN
     EXECUTE 'DROP SCHEMA IF EXISTS tables CASCADE';
     RAISE NOTICE 'Схема tables и все связанные таблицы удалены.';
 
+    -- Сводная статистика строится по удаленным таблицам
+    EXECUTE 'DROP SCHEMA IF EXISTS stats CASCADE';
+
+    -- Секции удаляются вместе с таблицами, архивные секции - вместе с базой
+    EXECUTE 'DROP SCHEMA IF EXISTS partitions CASCADE';
+    EXECUTE 'DROP SCHEMA IF EXISTS archive CASCADE';
+
     -- Устанавливаем флаг инициализации в FALSE
     UPDATE init.initialization_status SET is_initialized = FALSE;
+
+    -- Структура схемы изменилась: клиенты перечитают каталог
+    CALL init.bump_schema_version();
 END;
 $$;
 -- Пример: CALL procedures.drop_database_schema();
 
--- Функция для подсчета таблиц
-CREATE OR REPLACE FUNCTION procedures.count_tables()
-RETURNS INTEGER AS $$
+-- Функции ниже возвращают строки таблицы в ее собственном типе (SETOF anyelement), а не в JSON:
+-- столбцы приходят в объявленном порядке и с родными типами (даты остаются датами).
+-- Таблица задается значением ее типа строки: NULL::tables.patients
+
+-- Функция для получения имени таблицы схемы tables по значению типа ее строки
+CREATE OR REPLACE FUNCTION procedures.get_row_table_name(table_row ANYELEMENT)
+RETURNS TEXT AS $$
 DECLARE
-    table_count INTEGER;
+    table_name TEXT;
 BEGIN
-    SELECT COUNT(*)
-    INTO table_count
-    FROM information_schema.tables
-    WHERE table_schema = 'tables';
+    SELECT c.relname
+    INTO table_name
+    FROM pg_class AS c
+    WHERE c.reltype = pg_typeof(table_row)
+    AND c.relnamespace = to_regnamespace('tables')
+    AND c.relkind IN ('r', 'p');
+
+    IF table_name IS NULL THEN
+        RAISE EXCEPTION 'Type % is not a table of schema tables', pg_typeof(table_row);
+    END IF;
 
-    RETURN table_count;
+    RETURN table_name;
 END;
 $$ LANGUAGE plpgsql;
--- Пример: SELECT procedures.count_tables();
+-- Пример: SELECT procedures.get_row_table_name(NULL::tables.patients);
 
--- Функция для получения заголовков таблицы
-CREATE OR REPLACE FUNCTION procedures.get_all_table_headers()
-RETURNS JSON AS $$
-DECLARE
-    headers JSON;
+-- Функция для выдачи всех строк таблицы
+CREATE OR REPLACE FUNCTION procedures.get_all_rows(table_row ANYELEMENT)
+RETURNS SETOF ANYELEMENT AS $$
 BEGIN
-    SELECT json_object_agg(
-        table_name,
-        column_headers
-    )
-    INTO headers
-    FROM (
-        SELECT
-            c.table_name,
-            json_agg(c.column_name::TEXT ORDER BY c.ordinal_position) AS column_headers
-        FROM information_schema.columns AS c
-        WHERE c.table_schema = 'tables'
-        GROUP BY c.table_name
-        ORDER BY c.table_name
-    ) subquery;
+    RETURN QUERY EXECUTE format(
+        'SELECT t.* FROM %s AS t ORDER BY t.id',
+        procedures.get_table_source(procedures.get_row_table_name(table_row))
+    );
+END;
+$$ LANGUAGE plpgsql;
+-- Пример: SELECT * FROM procedures.get_all_rows(NULL::tables.patients);
 
-    RETURN headers;
+-- Функция для постраничной выдачи строк таблицы (keyset-пагинация по id)
+CREATE OR REPLACE FUNCTION procedures.get_page_rows(table_row ANYELEMENT, last_id INT, page_size INT)
+RETURNS SETOF ANYELEMENT AS $$
+BEGIN
+    RETURN QUERY EXECUTE format(
+        'SELECT t.* FROM %s AS t WHERE t.id > $1 ORDER BY t.id LIMIT $2',
+        procedures.get_table_source(procedures.get_row_table_name(table_row))
+    ) USING last_id, page_size;
 END;
 $$ LANGUAGE plpgsql;
--- Пример: SELECT procedures.get_all_table_headers();
+-- Пример: SELECT * FROM procedures.get_page_rows(NULL::tables.patients, 0, 200);
 
--- Функция для выдачи всех данных из таблицы
-CREATE OR REPLACE FUNCTION procedures.get_all_data(table_name TEXT)
-RETURNS SETOF JSON AS $$
+-- Функция для выдачи страницы строк перед first_id (keyset-пагинация назад по id):
+-- page_size строк с наибольшими id < first_id в порядке возрастания id
+CREATE OR REPLACE FUNCTION procedures.get_prev_page_rows(table_row ANYELEMENT, first_id INT, page_size INT)
+RETURNS SETOF ANYELEMENT AS $$
 BEGIN
     RETURN QUERY EXECUTE format(
-        'SELECT row_to_json(t)
-         FROM tables.%I AS t
-         ORDER BY t.id',
-        table_name
+        'SELECT p.* FROM (SELECT t.* FROM %s AS t WHERE t.id < $1 ORDER BY t.id DESC LIMIT $2) AS p ORDER BY p.id',
+        procedures.get_table_source(procedures.get_row_table_name(table_row))
+    ) USING first_id, page_size;
+END;
+$$ LANGUAGE plpgsql;
+-- Пример: SELECT * FROM procedures.get_prev_page_rows(NULL::tables.patients, 1000, 200);
+
+-- Функция для выдачи строк таблицы из диапазона id (first_id, last_id]
+CREATE OR REPLACE FUNCTION procedures.get_range_rows(table_row ANYELEMENT, first_id INT, last_id INT)
+RETURNS SETOF ANYELEMENT AS $$
+BEGIN
+    RETURN QUERY EXECUTE format(
+        'SELECT t.* FROM %s AS t WHERE t.id > $1 AND t.id <= $2 ORDER BY t.id',
+        procedures.get_table_source(procedures.get_row_table_name(table_row))
+    ) USING first_id, last_id;
+END;
+$$ LANGUAGE plpgsql;
+-- Пример: SELECT * FROM procedures.get_range_rows(NULL::tables.patients, 0, 200);
+
+-- Функция для выдачи строк таблицы по списку id
+CREATE OR REPLACE FUNCTION procedures.get_rows_by_ids(table_row ANYELEMENT, ids INT[])
+RETURNS SETOF ANYELEMENT AS $$
+BEGIN
+    RETURN QUERY EXECUTE format(
+        'SELECT t.* FROM %s AS t WHERE t.id = ANY($1) ORDER BY t.id',
+        procedures.get_table_source(procedures.get_row_table_name(table_row))
+    ) USING ids;
+END;
+$$ LANGUAGE plpgsql;
+-- Пример: SELECT * FROM procedures.get_rows_by_ids(NULL::tables.patients, ARRAY[1, 2, 3]);
+
+-- Функция поиска строк по нескольким условиям (формат условий - см. build_search_condition)
+CREATE OR REPLACE FUNCTION procedures.search_rows(table_row ANYELEMENT, filters JSON)
+RETURNS SETOF ANYELEMENT AS $$
+DECLARE
+    table_name TEXT := procedures.get_row_table_name(table_row);
+BEGIN
+    RETURN QUERY EXECUTE format(
+        'SELECT t.* FROM %s AS t WHERE %s ORDER BY t.id',
+        procedures.get_table_source(table_name),
+        procedures.build_search_condition(table_name, filters)
+    );
+END;
+$$ LANGUAGE plpgsql;
+-- Пример: SELECT * FROM procedures.search_rows(NULL::tables.appointments, '[{"column": "status", "mode": "eq", "value": "пропущено"}]');
+
+-- Процедура создания индексов текстового поиска: GIN-индекс по to_tsvector('russian', conclusion)
+-- для полнотекстового поиска по заключениям и, если на сервере есть расширение pg_trgm,
+-- триграммные GIN-индексы по ФИО для нечеткого поиска. Без pg_trgm нечеткий поиск отключен
+CREATE OR REPLACE PROCEDURE procedures.create_search_indexes()
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    CREATE INDEX IF NOT EXISTS idx_medical_records_conclusion_fts
+        ON tables.medical_records USING GIN (to_tsvector('russian', conclusion));
+
+    IF NOT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        RAISE NOTICE 'Расширение pg_trgm не установлено на сервере, нечеткий поиск отключен';
+        RETURN;
+    END IF;
+
+    BEGIN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    EXCEPTION WHEN insufficient_privilege THEN
+        RAISE NOTICE 'Нет прав на создание расширения pg_trgm, нечеткий поиск отключен';
+        RETURN;
+    END;
+
+    -- Тексты индексов выполняются через EXECUTE: без pg_trgm класс gin_trgm_ops не существует
+    EXECUTE 'CREATE INDEX IF NOT EXISTS idx_patients_full_name_trgm
+        ON tables.patients USING GIN (full_name gin_trgm_ops)';
+    EXECUTE 'CREATE INDEX IF NOT EXISTS idx_doctors_full_name_trgm
+        ON tables.doctors USING GIN (full_name gin_trgm_ops)';
+END;
+$$;
+-- Пример: CALL procedures.create_search_indexes();
+
+-- Индексы текстового поиска
+CALL procedures.create_search_indexes();
+
+-- Функция, проверяющая, доступен ли нечеткий поиск (установлено ли расширение pg_trgm)
+CREATE OR REPLACE FUNCTION procedures.is_fuzzy_search_available()
+RETURNS BOOLEAN AS $$
+    SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm');
+$$ LANGUAGE sql STABLE;
+-- Пример: SELECT procedures.is_fuzzy_search_available();
+
+-- Функция полнотекстового поиска по текстовому столбцу с русской морфологией.
+-- Запрос - в синтаксисе websearch_to_tsquery: слова через пробел, "фраза в кавычках",
+-- -слово для исключения, or. Строки упорядочены по рангу ts_rank (самые релевантные
+-- первыми), затем по id; возвращается страница из page_size строк после первых page_offset.
+-- По medical_records.conclusion поиск идет по индексу idx_medical_records_conclusion_fts
+CREATE OR REPLACE FUNCTION procedures.search_fulltext_rows(
+    table_row ANYELEMENT,
+    column_name TEXT,
+    search_text TEXT,
+    page_offset INT DEFAULT 0,
+    page_size INT DEFAULT 200
+)
+RETURNS SETOF ANYELEMENT AS $$
+BEGIN
+    RETURN QUERY EXECUTE format(
+        'SELECT t.*
+         FROM %s AS t, websearch_to_tsquery(''russian'', $1) AS query
+         WHERE to_tsvector(''russian'', t.%I) @@ query
+         ORDER BY ts_rank(to_tsvector(''russian'', t.%I), query) DESC, t.id
+         OFFSET $2 LIMIT $3',
+        procedures.get_table_source(procedures.get_row_table_name(table_row)),
+        column_name,
+        column_name
+    ) USING search_text, page_offset, page_size;
+END;
+$$ LANGUAGE plpgsql;
+-- Пример: SELECT * FROM procedures.search_fulltext_rows(NULL::tables.medical_records, 'conclusion', 'операции на коленном суставе', 0, 20);
+
+-- Функция нечеткого поиска (pg_trgm) по текстовому столбцу, например по ФИО с опечатками:
+-- строки, в которых есть фрагмент, похожий на search_text (word_similarity не ниже
+-- pg_trgm.word_similarity_threshold), по убыванию сходства, затем по id.
+-- Возвращается страница из page_size строк после первых page_offset
+CREATE OR REPLACE FUNCTION procedures.search_fuzzy_rows(
+    table_row ANYELEMENT,
+    column_name TEXT,
+    search_text TEXT,
+    page_offset INT DEFAULT 0,
+    page_size INT DEFAULT 200
+)
+RETURNS SETOF ANYELEMENT AS $$
+BEGIN
+    IF NOT procedures.is_fuzzy_search_available() THEN
+        RAISE EXCEPTION 'Fuzzy search requires the pg_trgm extension';
+    END IF;
+
+    RETURN QUERY EXECUTE format(
+        'SELECT t.*
+         FROM %s AS t
+         WHERE $1 <%% t.%I
+         ORDER BY word_similarity($1, t.%I) DESC, t.id
+         OFFSET $2 LIMIT $3',
+        procedures.get_table_source(procedures.get_row_table_name(table_row)),
+        column_name,
+        column_name
+    ) USING search_text, page_offset, page_size;
+END;
+$$ LANGUAGE plpgsql;
+-- Пример: SELECT * FROM procedures.search_fuzzy_rows(NULL::tables.patients, 'full_name', 'Ивонов', 0, 20);
+
+-- Функция для получения каталога схемы tables одним запросом к pg_catalog:
+-- столбцы с типами, первичный ключ и внешние ключи каждой таблицы, а также
+-- номер версии схемы, по которому клиент понимает, что каталог устарел
+CREATE OR REPLACE FUNCTION procedures.get_schema_catalog()
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER -- номер версии хранится в схеме init
+AS $$
+DECLARE
+    catalog JSON;
+BEGIN
+    SELECT json_build_object(
+        'version', (SELECT version FROM init.schema_version),
+        'tables', COALESCE(json_object_agg(c.relname, json_build_object(
+            'columns', (
+                SELECT json_agg(
+                    json_build_object(
+                        'name', a.attname,
+                        'type', format_type(a.atttypid, a.atttypmod)
+                    ) ORDER BY a.attnum
+                )
+                FROM pg_attribute AS a
+                WHERE a.attrelid = c.oid
+                AND a.attnum > 0
+                AND NOT a.attisdropped
+            ),
+            'primary_key', COALESCE((
+                SELECT json_agg(a.attname ORDER BY k.ord)
+                FROM pg_constraint AS pk
+                CROSS JOIN unnest(pk.conkey) WITH ORDINALITY AS k(attnum, ord)
+                JOIN pg_attribute AS a ON a.attrelid = c.oid AND a.attnum = k.attnum
+                WHERE pk.conrelid = c.oid
+                AND pk.contype = 'p'
+            ), '[]'::JSON),
+            'foreign_keys', COALESCE((
+                SELECT json_agg(
+                    json_build_object(
+                        'columns', (
+                            SELECT json_agg(a.attname ORDER BY k.ord)
+                            FROM unnest(fk.conkey) WITH ORDINALITY AS k(attnum, ord)
+                            JOIN pg_attribute AS a
+                                ON a.attrelid = fk.conrelid AND a.attnum = k.attnum
+                        ),
+                        'references_table', referenced.relname,
+                        'references_columns', (
+                            SELECT json_agg(a.attname ORDER BY k.ord)
+                            FROM unnest(fk.confkey) WITH ORDINALITY AS k(attnum, ord)
+                            JOIN pg_attribute AS a
+                                ON a.attrelid = fk.confrelid AND a.attnum = k.attnum
+                        )
+                    ) ORDER BY fk.conname
+                )
+                FROM pg_constraint AS fk
+                JOIN pg_class AS referenced ON referenced.oid = fk.confrelid
+                WHERE fk.conrelid = c.oid
+                AND fk.contype = 'f'
+            ), '[]'::JSON)
+        ) ORDER BY c.relname), '{}'::JSON)
+    )
+    INTO catalog
+    FROM pg_class AS c
+    WHERE c.relnamespace = to_regnamespace('tables')
+    AND c.relkind IN ('r', 'p')
+    AND NOT c.relispartition;
+
+    RETURN catalog;
+END;
+$$;
+-- Пример: SELECT procedures.get_schema_catalog();
+
+-- Функция для получения текущего номера версии схемы (дешевая проверка свежести каталога)
+CREATE OR REPLACE FUNCTION procedures.get_schema_version()
+RETURNS BIGINT
+LANGUAGE plpgsql
+SECURITY DEFINER -- номер версии хранится в схеме init
+AS $$
+DECLARE
+    current_version BIGINT;
+BEGIN
+    SELECT version INTO current_version FROM init.schema_version;
+    RETURN current_version;
+END;
+$$;
+-- Пример: SELECT procedures.get_schema_version();
+
+-- Функция для сбора статистики использования индексов:
+-- последовательные сканирования таблиц, внешние ключи без индекса
+-- и самые тяжелые запросы из pg_stat_statements (если расширение установлено)
+CREATE OR REPLACE FUNCTION procedures.get_index_usage_stats()
+RETURNS JSON AS $$
+DECLARE
+    tables_stats JSON;
+    unindexed_foreign_keys JSON;
+    statements_stats JSON := '[]'::JSON;
+BEGIN
+    SELECT COALESCE(json_agg(json_build_object(
+        'table_name', s.relname,
+        'seq_scan', s.seq_scan,
+        'seq_tup_read', s.seq_tup_read,
+        'idx_scan', COALESCE(s.idx_scan, 0),
+        'live_rows', s.n_live_tup
+    ) ORDER BY s.seq_tup_read DESC), '[]'::JSON)
+    INTO tables_stats
+    FROM pg_stat_user_tables AS s
+    WHERE s.schemaname = 'tables';
+
+    SELECT COALESCE(json_agg(json_build_object(
+        'table_name', referencing.relname,
+        'columns', (
+            SELECT json_agg(a.attname ORDER BY k.ord)
+            FROM unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord)
+            JOIN pg_attribute AS a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+        )
+    )), '[]'::JSON)
+    INTO unindexed_foreign_keys
+    FROM pg_constraint AS c
+    JOIN pg_class AS referencing ON referencing.oid = c.conrelid
+    WHERE c.contype = 'f'
+    AND c.connamespace = 'tables'::regnamespace
+    AND NOT EXISTS (
+        -- Индекс подходит, если столбцы внешнего ключа - его первые столбцы
+        SELECT 1
+        FROM pg_index AS i
+        WHERE i.indrelid = c.conrelid
+        AND (string_to_array(i.indkey::TEXT, ' ')::INT2[])[1:cardinality(c.conkey)] @> c.conkey
+    );
+
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements') THEN
+        EXECUTE
+            'SELECT COALESCE(json_agg(json_build_object(
+                 ''query'', st.query,
+                 ''calls'', st.calls,
+                 ''total_exec_time'', st.total_exec_time,
+                 ''rows'', st.rows
+             ) ORDER BY st.total_exec_time DESC), ''[]''::JSON)
+             FROM (
+                 SELECT * FROM pg_stat_statements
+                 WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+                 ORDER BY total_exec_time DESC
+                 LIMIT 10
+             ) AS st'
+        INTO statements_stats;
+    END IF;
+
+    RETURN json_build_object(
+        'tables', tables_stats,
+        'unindexed_foreign_keys', unindexed_foreign_keys,
+        'statements', statements_stats
     );
 END;
 $$ LANGUAGE plpgsql;
--- Пример: SELECT * FROM procedures.get_all_data('patients');
+-- Пример: SELECT procedures.get_index_usage_stats();
 
 
 -- Процедура для очистки конкретной таблицы
@@ -297,12 +1421,7 @@ SECURITY DEFINER -- выполняется с правами владельца
 AS $$
 BEGIN
     -- Проверка существования таблицы
-    IF NOT EXISTS (
-        SELECT 1
-        FROM information_schema.tables
-        WHERE table_schema = 'tables'
-        AND table_name = table_name_
-    ) THEN
+    IF to_regclass(format('tables.%I', table_name_)) IS NULL THEN
         RAISE EXCEPTION 'Table %.% does not exist', 'tables', table_name_;
     END IF;
 
@@ -326,9 +1445,11 @@ BEGIN
 
     -- Перебираем все таблицы в схеме tables
     FOR table_name IN
-        SELECT tables.table_name
-        FROM information_schema.tables
-        WHERE table_schema = 'tables'
+        SELECT c.relname
+        FROM pg_class AS c
+        WHERE c.relnamespace = to_regnamespace('tables')
+        AND c.relkind IN ('r', 'p')
+        AND NOT c.relispartition
     LOOP
         -- Очистка каждой таблицы
     		EXECUTE format('TRUNCATE TABLE tables.%I RESTART IDENTITY CASCADE', table_name);
@@ -393,6 +1514,169 @@ END;
 $$;
 -- Пример: CALL procedures.seed_data();
 
+-- Процедура для генерации синтетических данных заданного объема.
+-- При scale = 1: 10 поликлиник, 200 докторов, 10 000 пациентов, 100 000 записей на прием
+-- и 50 000 записей медкнижки; scale = 100 дает 1 млн пациентов и 10 млн записей на прием.
+-- seed (от -1 до 1) передается в setseed: при одинаковых scale и seed данные совпадают.
+-- Внешние ключи ссылаются только на вставленные здесь же строки, поликлиника записи
+-- на прием совпадает с поликлиникой доктора. Каждая таблица заполняется одним
+-- INSERT ... SELECT FROM generate_series, построчные уведомления отключены
+CREATE OR REPLACE PROCEDURE procedures.seed_scaled_data(scale NUMERIC DEFAULT 1, seed DOUBLE PRECISION DEFAULT 0)
+LANGUAGE plpgsql
+SECURITY DEFINER -- выполняется с правами владельца процедуры
+AS $$
+DECLARE
+    partitioned_table TEXT;
+    clinics_num INT := GREATEST(1, round(10 * scale));
+    doctors_num INT := GREATEST(1, round(200 * scale));
+    patients_num INT := GREATEST(1, round(10000 * scale));
+    appointments_num INT := round(100000 * scale);
+    records_num INT := round(50000 * scale);
+    clinic_ids INT[];
+    doctor_ids INT[];
+    patient_ids INT[];
+    last_names TEXT[] := ARRAY['Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов',
+        'Соколов', 'Лебедев', 'Козлов', 'Новиков', 'Морозов', 'Волков', 'Алексеев', 'Федоров'];
+    male_names TEXT[] := ARRAY['Иван', 'Петр', 'Алексей', 'Сергей', 'Андрей', 'Дмитрий',
+        'Михаил', 'Николай', 'Павел', 'Олег'];
+    female_names TEXT[] := ARRAY['Анна', 'Мария', 'Елена', 'Ольга', 'Татьяна', 'Наталья',
+        'Ирина', 'Светлана', 'Василиса', 'Дарья'];
+    patronymics TEXT[] := ARRAY['Иванович', 'Петрович', 'Алексеевич', 'Сергеевич', 'Андреевич',
+        'Дмитриевич', 'Михайлович', 'Николаевич', 'Павлович', 'Олегович'];
+    specializations TEXT[] := ARRAY['Терапевт', 'Хирург', 'Кардиолог', 'Невролог', 'Офтальмолог',
+        'Отоларинголог', 'Эндокринолог', 'Дерматолог'];
+    streets TEXT[] := ARRAY['Ленина', 'Белинского', 'Горького', 'Минина', 'Гагарина', 'Советская'];
+    conclusions TEXT[] := ARRAY[
+        'Общее состояние хорошее. Рекомендовано продолжить лечение.',
+        'Необходима операция на коленном суставе.',
+        'Проведена успешная терапия. Пациент в стабильном состоянии.',
+        'Рекомендовано повторное обследование через месяц.',
+        'Назначен курс физиотерапии.',
+        'Показатели в норме, жалоб нет.'];
+BEGIN
+    IF scale <= 0 THEN
+        RAISE EXCEPTION 'Scale must be positive, got %', scale;
+    END IF;
+    IF seed < -1 OR seed > 1 THEN
+        RAISE EXCEPTION 'Seed must be between -1 and 1, got %', seed;
+    END IF;
+
+    PERFORM setseed(seed);
+    PERFORM set_config('med.skip_notify', 'on', true);
+
+    -- Поликлиники
+    WITH inserted AS (
+        INSERT INTO tables.clinic (name, address, phone)
+        SELECT
+            'Поликлиника №' || g,
+            'г. Нижний Новгород, ул. ' || streets[1 + floor(random() * array_length(streets, 1))::INT]
+                || ', д. ' || (1 + floor(random() * 150)::INT),
+            '831' || lpad(floor(random() * 10000000)::TEXT, 7, '0')
+        FROM generate_series(1, clinics_num) AS g
+        RETURNING id
+    )
+    SELECT array_agg(id ORDER BY id) INTO clinic_ids FROM inserted;
+    RAISE NOTICE 'Таблица clinic: добавлено % строк.', clinics_num;
+
+    -- Доктора; доктор с номером g работает в поликлинике с номером (g - 1) % clinics_num + 1
+    WITH inserted AS (
+        INSERT INTO tables.doctors (full_name, specialization, contacts, clinic_id)
+        SELECT
+            last_names[1 + floor(random() * array_length(last_names, 1))::INT] || ' '
+                || male_names[1 + floor(random() * array_length(male_names, 1))::INT] || ' '
+                || patronymics[1 + floor(random() * array_length(patronymics, 1))::INT],
+            specializations[1 + floor(random() * array_length(specializations, 1))::INT],
+            '89' || lpad(floor(random() * 1000000000)::TEXT, 9, '0'),
+            clinic_ids[(g - 1) % clinics_num + 1]
+        FROM generate_series(1, doctors_num) AS g
+        ORDER BY g
+        RETURNING id
+    )
+    SELECT array_agg(id ORDER BY id) INTO doctor_ids FROM inserted;
+    RAISE NOTICE 'Таблица doctors: добавлено % строк.', doctors_num;
+
+    -- Пациенты; женские ФИО получаются из мужских окончаниями -а и -на
+    WITH inserted AS (
+        INSERT INTO tables.patients (full_name, birth_date, contacts, passport_data, insurance_policy_number)
+        SELECT
+            CASE WHEN p.is_female
+                THEN last_names[p.last_idx] || 'а ' || female_names[p.first_idx] || ' '
+                    || regexp_replace(patronymics[p.patronymic_idx], 'ич$', 'на')
+                ELSE last_names[p.last_idx] || ' ' || male_names[p.first_idx] || ' '
+                    || patronymics[p.patronymic_idx]
+            END,
+            DATE '1940-01-01' + floor(random() * 30000)::INT,
+            '89' || lpad(floor(random() * 1000000000)::TEXT, 9, '0'),
+            lpad(floor(random() * 10000)::TEXT, 4, '0') || ' '
+                || lpad(floor(random() * 1000000)::TEXT, 6, '0'),
+            lpad(floor(random() * 100000000)::TEXT, 8, '0')
+        FROM (
+            SELECT
+                g,
+                random() < 0.5 AS is_female,
+                1 + floor(random() * array_length(last_names, 1))::INT AS last_idx,
+                1 + floor(random() * array_length(male_names, 1))::INT AS first_idx,
+                1 + floor(random() * array_length(patronymics, 1))::INT AS patronymic_idx
+            FROM generate_series(1, patients_num) AS g
+        ) AS p
+        ORDER BY p.g
+        RETURNING id
+    )
+    SELECT array_agg(id ORDER BY id) INTO patient_ids FROM inserted;
+    RAISE NOTICE 'Таблица patients: добавлено % строк.', patients_num;
+
+    -- Если таблицы секционированы, секции под даты 2023-2025 годов создаются заранее,
+    -- чтобы строки сразу попадали в свои секции, а не в секцию по умолчанию
+    FOR partitioned_table IN
+        SELECT c.relname
+        FROM pg_class AS c
+        WHERE c.relnamespace = to_regnamespace('tables')
+        AND c.relkind = 'p'
+    LOOP
+        CALL procedures.create_partitions(partitioned_table, DATE '2023-01-01', DATE '2025-12-31');
+    END LOOP;
+
+    -- Записи на прием за 2023-2025 годы; прошедшие запланированные приемы
+    -- триггер update_appointment_status помечает как пропущенные
+    INSERT INTO tables.appointments (patient_id, doctor_id, appointment_date, status, clinic_id)
+    SELECT
+        patient_ids[1 + floor(random() * patients_num)::INT],
+        doctor_ids[a.doctor_idx],
+        a.appointment_date,
+        CASE
+            WHEN a.status_roll < 0.1 THEN 'отменено'
+            WHEN a.status_roll < 0.8 AND a.appointment_date < CURRENT_DATE THEN 'завершено'
+            ELSE 'запланировано'
+        END,
+        clinic_ids[(a.doctor_idx - 1) % clinics_num + 1]
+    FROM (
+        SELECT
+            g,
+            1 + floor(random() * doctors_num)::INT AS doctor_idx,
+            DATE '2023-01-01' + floor(random() * 1096)::INT AS appointment_date,
+            random() AS status_roll
+        FROM generate_series(1, appointments_num) AS g
+    ) AS a
+    ORDER BY a.g;
+    RAISE NOTICE 'Таблица appointments: добавлено % строк.', appointments_num;
+
+    -- Записи медицинской книжки
+    INSERT INTO tables.medical_records (patient_id, conclusion, record_date)
+    SELECT
+        patient_ids[1 + floor(random() * patients_num)::INT],
+        conclusions[1 + floor(random() * array_length(conclusions, 1))::INT],
+        DATE '2023-01-01' + floor(random() * 1096)::INT
+    FROM generate_series(1, records_num) AS g
+    ORDER BY g;
+    RAISE NOTICE 'Таблица medical_records: добавлено % строк.', records_num;
+
+    -- Одно уведомление на таблицу вместо построчных
+    PERFORM pg_notify('med_table_changes', json_build_object('table', t, 'op', 'BULK')::TEXT)
+    FROM unnest(ARRAY['clinic', 'doctors', 'patients', 'appointments', 'medical_records']) AS t;
+END;
+$$;
+-- Пример: CALL procedures.seed_scaled_data(100, 0.42);
+
 -- Переходим в схему init
 SET search_path TO init, tables, procedures, public;
 
@@ -415,25 +1699,78 @@ END;
 $$ LANGUAGE plpgsql;
 -- SELECT init.is_db_initialized();
 
+-- Номер версии структуры схемы tables. Увеличивается процедурами, меняющими
+-- структуру (инициализация, удаление), клиенты сравнивают его со своим кэшем каталога
+CREATE TABLE init.schema_version (
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO init.schema_version (version) VALUES (0);
+
+-- Процедура для увеличения номера версии схемы с уведомлением слушателей канала
+-- med_schema_changed (уведомление уходит при COMMIT транзакции)
+CREATE OR REPLACE PROCEDURE init.bump_schema_version()
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    new_version BIGINT;
+BEGIN
+    UPDATE init.schema_version SET version = version + 1 RETURNING version INTO new_version;
+    PERFORM pg_notify('med_schema_changed', new_version::TEXT);
+END;
+$$;
+-- CALL init.bump_schema_version();
+
 
 -- Создаем процедуру инициализации в схеме init
-ALTER FUNCTION procedures.calculate_age() OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.patient_age(date) OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.get_table_source(text) OWNER TO med_procedures_owner;
+ALTER PROCEDURE procedures.refresh_patient_ages(bigint) OWNER TO med_procedures_owner;
 ALTER FUNCTION procedures.update_appointment_status() OWNER TO med_procedures_owner;
-ALTER FUNCTION procedures.search_by_key(text, text, text) OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.notify_row_change() OWNER TO med_procedures_owner;
+ALTER PROCEDURE procedures.create_notify_triggers() OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.build_search_condition(text, json) OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.search_rows(anyelement, json) OWNER TO med_procedures_owner;
+ALTER PROCEDURE procedures.create_search_indexes() OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.is_fuzzy_search_available() OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.search_fulltext_rows(anyelement, text, text, int, int) OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.search_fuzzy_rows(anyelement, text, text, int, int) OWNER TO med_procedures_owner;
 ALTER PROCEDURE procedures.delete_record(text, text, text) OWNER TO med_procedures_owner;
 ALTER PROCEDURE procedures.insert_into_table(text, text[], text[]) OWNER TO med_procedures_owner;
 ALTER PROCEDURE procedures.update_record(text, text, text, text, text) OWNER TO med_procedures_owner;
+ALTER PROCEDURE procedures.update_record_fields(text, json, text, text) OWNER TO med_procedures_owner;
+ALTER PROCEDURE procedures.update_records_batch(text, json, text) OWNER TO med_procedures_owner;
 ALTER PROCEDURE procedures.drop_database_schema() OWNER TO med_procedures_owner;
-ALTER FUNCTION procedures.count_tables() OWNER TO med_procedures_owner;
-ALTER FUNCTION procedures.get_all_table_headers() OWNER TO med_procedures_owner;
-ALTER FUNCTION procedures.get_all_data(text) OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.apply_appointment_stats_delta() OWNER TO med_procedures_owner;
+ALTER PROCEDURE procedures.create_appointment_stats_triggers() OWNER TO med_procedures_owner;
+ALTER PROCEDURE procedures.rebuild_appointment_stats() OWNER TO med_procedures_owner;
+ALTER PROCEDURE procedures.fold_appointment_stats(BIGINT) OWNER TO med_procedures_owner;
+ALTER PROCEDURE procedures.mark_missed_appointments(int, bigint) OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.get_partition_column(text) OWNER TO med_procedures_owner;
+ALTER PROCEDURE procedures.create_partitions(text, date, date) OWNER TO med_procedures_owner;
+ALTER PROCEDURE procedures.create_partitions_ahead(int) OWNER TO med_procedures_owner;
+ALTER PROCEDURE procedures.archive_partitions(date, int) OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.get_dashboard_stats() OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.get_row_table_name(anyelement) OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.get_all_rows(anyelement) OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.get_page_rows(anyelement, int, int) OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.get_prev_page_rows(anyelement, int, int) OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.get_range_rows(anyelement, int, int) OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.get_rows_by_ids(anyelement, int[]) OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.get_schema_catalog() OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.get_schema_version() OWNER TO med_procedures_owner;
+ALTER FUNCTION procedures.get_index_usage_stats() OWNER TO med_procedures_owner;
 ALTER PROCEDURE procedures.clear_table(text) OWNER TO med_procedures_owner;
 ALTER PROCEDURE procedures.clear_all_tables() OWNER TO med_procedures_owner;
 ALTER PROCEDURE procedures.seed_data() OWNER TO med_procedures_owner;
+ALTER PROCEDURE procedures.seed_scaled_data(numeric, double precision) OWNER TO med_procedures_owner;
 
-CREATE OR REPLACE PROCEDURE init.initialize_database()
+-- partitioned = TRUE: записи на прием и медкнижки секционируются по месяцам дат
+-- (init.partition_table), уже секционированные таблицы остаются секционированными
+CREATE OR REPLACE PROCEDURE init.initialize_database(partitioned BOOLEAN DEFAULT FALSE)
 LANGUAGE plpgsql
 AS $$
+DECLARE
+    updated_patients_num BIGINT;
 BEGIN
     -- Проверка, что текущий пользователь — 'med_procedures_owner'
     IF current_user != 'med_procedures_owner' THEN
@@ -498,6 +1835,19 @@ BEGIN
     ALTER TABLE tables.appointments OWNER TO med_procedures_owner;
     ALTER TABLE tables.medical_records OWNER TO med_procedures_owner;
 
+    -- Схемы для секций и архивных секций
+    CREATE SCHEMA IF NOT EXISTS partitions;
+    ALTER SCHEMA partitions OWNER TO med_procedures_owner;
+    CREATE SCHEMA IF NOT EXISTS archive;
+    ALTER SCHEMA archive OWNER TO med_procedures_owner;
+
+    -- Секционирование по дате (до создания индексов: индексы создаются уже на
+    -- секционированных таблицах и наследуются секциями)
+    IF partitioned THEN
+        CALL init.partition_table('appointments', 'appointment_date');
+        CALL init.partition_table('medical_records', 'record_date');
+    END IF;
+
     -- Создаем индекс для ускорения поиска по имени пациента, если его нет
     IF NOT EXISTS (
         SELECT 1 FROM pg_indexes
@@ -508,6 +1858,49 @@ BEGIN
         CREATE INDEX idx_patients_full_name ON tables.patients(full_name);
     END IF;
 
+    -- Индексы по внешним ключам и часто используемым в поиске столбцам
+    CREATE INDEX IF NOT EXISTS idx_doctors_clinic_id ON tables.doctors(clinic_id);
+    CREATE INDEX IF NOT EXISTS idx_appointments_patient_id ON tables.appointments(patient_id);
+    CREATE INDEX IF NOT EXISTS idx_appointments_doctor_id ON tables.appointments(doctor_id);
+    CREATE INDEX IF NOT EXISTS idx_appointments_clinic_id ON tables.appointments(clinic_id);
+    CREATE INDEX IF NOT EXISTS idx_appointments_appointment_date ON tables.appointments(appointment_date);
+    CREATE INDEX IF NOT EXISTS idx_appointments_status ON tables.appointments(status);
+    CREATE INDEX IF NOT EXISTS idx_medical_records_patient_id ON tables.medical_records(patient_id);
+    CREATE INDEX IF NOT EXISTS idx_medical_records_record_date ON tables.medical_records(record_date);
+
+    -- Индексы для поиска по префиксу ФИО без учета регистра
+    CREATE INDEX IF NOT EXISTS idx_patients_full_name_prefix
+        ON tables.patients(lower(full_name) text_pattern_ops);
+    CREATE INDEX IF NOT EXISTS idx_doctors_full_name_prefix
+        ON tables.doctors(lower(full_name) text_pattern_ops);
+
+    -- Индексы текстового поиска (полнотекстовый по заключениям, триграммный по ФИО)
+    CALL procedures.create_search_indexes();
+
+    -- Частичный индекс по дате запланированных записей (для mark_missed_appointments)
+    CREATE INDEX IF NOT EXISTS idx_appointments_scheduled_date
+        ON tables.appointments(appointment_date)
+        WHERE status = 'запланировано';
+
+    -- Сводная таблица для Dashboard
+    CREATE SCHEMA IF NOT EXISTS stats;
+    ALTER SCHEMA stats OWNER TO med_procedures_owner;
+    CREATE TABLE IF NOT EXISTS stats.appointment_counts (
+        clinic_id INT NOT NULL,
+        doctor_id INT NOT NULL,
+        status VARCHAR(50) NOT NULL,
+        appointments_num BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (clinic_id, doctor_id, status)
+    );
+    ALTER TABLE stats.appointment_counts OWNER TO med_procedures_owner;
+    CREATE TABLE IF NOT EXISTS stats.appointment_count_deltas (
+        clinic_id INT NOT NULL,
+        doctor_id INT NOT NULL,
+        status VARCHAR(50) NOT NULL,
+        appointments_num BIGINT NOT NULL
+    );
+    ALTER TABLE stats.appointment_count_deltas OWNER TO med_procedures_owner;
+
     -- Даем пользователю права на схему с таблицами
     GRANT USAGE ON SCHEMA tables TO med_user;
 
@@ -517,6 +1910,10 @@ BEGIN
     -- Даем права на последовательности
     GRANT USAGE, SELECT ON ALL SEQUENCES IN SCHEMA tables TO med_user;
 
+    -- Сводную статистику пользователь только читает
+    GRANT USAGE ON SCHEMA stats TO med_user;
+    GRANT SELECT ON ALL TABLES IN SCHEMA stats TO med_user;
+
     -- Даем пользователю права на схему procedures
     GRANT USAGE ON SCHEMA procedures TO med_user;
 
@@ -524,36 +1921,90 @@ BEGIN
     GRANT EXECUTE ON PROCEDURE procedures.delete_record(TEXT, TEXT, TEXT) TO med_user;
     GRANT EXECUTE ON PROCEDURE procedures.insert_into_table(TEXT, TEXT[], TEXT[]) TO med_user;
     GRANT EXECUTE ON PROCEDURE procedures.update_record(TEXT, TEXT, TEXT, TEXT, TEXT) TO med_user;
+    GRANT EXECUTE ON PROCEDURE procedures.update_record_fields(TEXT, JSON, TEXT, TEXT) TO med_user;
+    GRANT EXECUTE ON PROCEDURE procedures.update_records_batch(TEXT, JSON, TEXT) TO med_user;
     GRANT EXECUTE ON PROCEDURE procedures.clear_table(TEXT) to med_user;
     GRANT EXECUTE ON PROCEDURE procedures.clear_all_tables() to med_user;
     GRANT EXECUTE ON PROCEDURE procedures.seed_data() TO med_user;
-    GRANT EXECUTE ON FUNCTION procedures.search_by_key(TEXT, TEXT, TEXT) TO med_user;
-    GRANT EXECUTE ON FUNCTION procedures.count_tables() TO med_user;
-    GRANT EXECUTE ON FUNCTION procedures.get_all_table_headers() TO med_user;
-    GRANT EXECUTE ON FUNCTION procedures.get_all_data(TEXT) TO med_user;
+    GRANT EXECUTE ON PROCEDURE procedures.mark_missed_appointments(INT, BIGINT) TO med_user;
+    GRANT EXECUTE ON PROCEDURE procedures.refresh_patient_ages(BIGINT) TO med_user;
+    GRANT EXECUTE ON PROCEDURE procedures.create_partitions(TEXT, DATE, DATE) TO med_user;
+    GRANT EXECUTE ON PROCEDURE procedures.create_partitions_ahead(INT) TO med_user;
+    GRANT EXECUTE ON PROCEDURE procedures.archive_partitions(DATE, INT) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.get_partition_column(TEXT) TO med_user;
+    GRANT EXECUTE ON PROCEDURE procedures.seed_scaled_data(NUMERIC, DOUBLE PRECISION) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.build_search_condition(TEXT, JSON) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.search_rows(ANYELEMENT, JSON) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.is_fuzzy_search_available() TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.search_fulltext_rows(ANYELEMENT, TEXT, TEXT, INT, INT) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.search_fuzzy_rows(ANYELEMENT, TEXT, TEXT, INT, INT) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.patient_age(DATE) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.get_table_source(TEXT) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.get_row_table_name(ANYELEMENT) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.get_all_rows(ANYELEMENT) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.get_page_rows(ANYELEMENT, INT, INT) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.get_prev_page_rows(ANYELEMENT, INT, INT) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.get_range_rows(ANYELEMENT, INT, INT) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.get_rows_by_ids(ANYELEMENT, INT[]) TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.get_schema_catalog() TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.get_schema_version() TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.get_index_usage_stats() TO med_user;
+    GRANT EXECUTE ON FUNCTION procedures.get_dashboard_stats() TO med_user;
+    GRANT EXECUTE ON PROCEDURE procedures.fold_appointment_stats(BIGINT) TO med_user;
     REVOKE EXECUTE ON PROCEDURE procedures.drop_database_schema() FROM med_user;
 
     -- Пересоздаем триггеры
-    -- Для расчета возраста
+    -- Возраст больше не считается построчным триггером (см. procedures.get_table_source
+    -- и procedures.refresh_patient_ages), старый триггер удаляется
     DROP TRIGGER IF EXISTS trigger_calculate_age ON tables.patients;
-    CREATE TRIGGER trigger_calculate_age
-    BEFORE INSERT OR UPDATE ON tables.patients
-    FOR EACH ROW
-    EXECUTE FUNCTION procedures.calculate_age();
+    DROP FUNCTION IF EXISTS procedures.calculate_age();
+
+    -- Функции чтения в JSON заменены функциями, возвращающими строки в типе таблицы
+    -- (get_all_rows, get_page_rows, get_range_rows, get_rows_by_ids, search_rows)
+    DROP FUNCTION IF EXISTS procedures.get_all_data(TEXT);
+    DROP FUNCTION IF EXISTS procedures.get_data_page(TEXT, INT, INT);
+    DROP FUNCTION IF EXISTS procedures.get_data_range(TEXT, INT, INT);
+    DROP FUNCTION IF EXISTS procedures.get_data_by_ids(TEXT, INT[]);
+    DROP FUNCTION IF EXISTS procedures.search_by_filters(TEXT, JSON);
+    DROP FUNCTION IF EXISTS procedures.search_by_key(TEXT, TEXT, TEXT);
+
+    -- Структуру таблиц и внешние ключи приложение берет из procedures.get_schema_catalog()
+    DROP FUNCTION IF EXISTS procedures.count_tables();
+    DROP FUNCTION IF EXISTS procedures.get_all_table_headers();
+    DROP FUNCTION IF EXISTS procedures.get_tables_references();
 
     -- Для обновления статуса записи
     DROP TRIGGER IF EXISTS trigger_update_status ON tables.appointments;
     CREATE TRIGGER trigger_update_status
     BEFORE INSERT OR UPDATE ON tables.appointments
     FOR EACH ROW
+    WHEN (NEW.status = 'запланировано' AND NEW.appointment_date < CURRENT_DATE)
     EXECUTE FUNCTION procedures.update_appointment_status();
 
+    -- Для уведомления клиентов об изменениях данных (LISTEN med_table_changes)
+    CALL procedures.create_notify_triggers();
+
+    -- Для сводной статистики (пересчет - на случай уже заполненных таблиц)
+    CALL procedures.create_appointment_stats_triggers();
+    CALL procedures.rebuild_appointment_stats();
+
+    -- Хранимый возраст пациентов (на случай уже заполненной таблицы)
+    CALL procedures.refresh_patient_ages(updated_patients_num);
+
+    -- Секции на ближайшие месяцы (для несекционированных таблиц ничего не делает)
+    CALL procedures.create_partitions_ahead();
+
     -- Устанавливаем флаг инициализации в TRUE
     UPDATE init.initialization_status SET is_initialized = TRUE;
 
+    -- Структура схемы изменилась: клиенты перечитают каталог
+    CALL init.bump_schema_version();
+
     RAISE NOTICE 'База данных инициализирована.';
 END;
 $$;
 
 -- Вызов процедуры инициализации
 -- CALL init.initialize_database();
+-- С секционированием записей на прием и медкнижек по дате:
+-- CALL init.initialize_database(TRUE);
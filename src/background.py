@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox as ms
+
+# Как часто (в мс) главный цикл Tk проверяет, завершились ли фоновые задачи
+POLL_INTERVAL_MS = 50
+
+# Количество потоков для запросов к БД (по одному на вкладку при старте)
+MAX_WORKERS = 5
+
+
+def error_handler(title, message):
+    # Колбэк для on_error: показывает ошибку пользователю и печатает подробности в консоль
+    def handle_error(error):
+        ms.showerror(title=title, message=message)
+        print(error)
+
+    return handle_error
+
+
+class BackgroundTask:
+    def __init__(self, future, on_success, on_error, cancellable):
+        self.future = future
+        self.on_success = on_success
+        self.on_error = on_error
+        # Результат записи или загрузки схемы нужен интерфейсу всегда,
+        # поэтому такие задачи кнопка Cancel не отменяет
+        self.cancellable = cancellable
+        self.is_cancelled = False
+        self.is_delivered = False
+
+    def is_active(self):
+        # Задача еще выполняется или ее результат еще не передан в главный поток
+        return not self.is_cancelled and not self.is_delivered
+
+    def cancel(self):
+        # Задача из очереди не запустится; у уже выполняющейся будет отброшен результат
+        self.is_cancelled = True
+        self.future.cancel()
+
+
+class BackgroundExecutor:
+    # Выполняет вызовы DataBaseManager в пуле потоков и возвращает результат
+    # в главный поток Tk через after(), так что окно не зависает на долгих запросах
+    def __init__(self, widget, on_state_change=None, max_workers=MAX_WORKERS):
+        self.widget = widget
+        self.on_state_change = on_state_change
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="db_worker"
+        )
+        self.active_tasks = set()
+
+    def submit(self, func, *args, on_success=None, on_error=None, cancellable=True):
+        task = BackgroundTask(
+            self.executor.submit(func, *args), on_success, on_error, cancellable
+        )
+        self.active_tasks.add(task)
+        self.__notify_state_change()
+        self.widget.after(POLL_INTERVAL_MS, self.__poll, task)
+        return task
+
+    def cancel(self, task):
+        task.cancel()
+        self.active_tasks.discard(task)
+        self.__notify_state_change()
+
+    def cancel_all(self):
+        # Отменяются только задачи, отмеченные как cancellable. Запрос, который
+        # уже выполняется, не прерывается: отбрасывается только его результат
+        for task in list(self.active_tasks):
+            if task.cancellable:
+                task.cancel()
+                self.active_tasks.discard(task)
+        self.__notify_state_change()
+
+    def shutdown(self):
+        for task in self.active_tasks:
+            task.cancel()
+        self.active_tasks.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __poll(self, task):
+        if task.is_cancelled:
+            return
+        if not task.future.done():
+            self.widget.after(POLL_INTERVAL_MS, self.__poll, task)
+            return
+
+        task.is_delivered = True
+        self.active_tasks.discard(task)
+        self.__notify_state_change()
+
+        error = task.future.exception()
+        if error is not None:
+            if task.on_error is not None:
+                task.on_error(error)
+            else:
+                print(error)
+            return
+        if task.on_success is not None:
+            task.on_success(task.future.result())
+
+    def __notify_state_change(self):
+        if self.on_state_change is not None:
+            cancellable_tasks_num = sum(task.cancellable for task in self.active_tasks)
+            self.on_state_change(len(self.active_tasks), cancellable_tasks_num)
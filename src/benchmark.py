@@ -0,0 +1,333 @@
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from db_manager import DataBaseManager
+from generate_data import get_rows_num
+
+# Операции, которые повторяются iterations раз на каждом уровне параллельности
+REPEATED_OPERATIONS = (
+    "get_data_from_table",
+    "find_record",
+    "add_data",
+    "update_record",
+    "delete_record",
+)
+
+# Процентили задержки в отчете
+PERCENTILES = (50, 90, 95, 99)
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(sorted_values, percent):
+    # Метод ближайшего ранга: значение, не меньше которого percent% измерений
+    if not sorted_values:
+        return None
+    rank = max(1, round(percent / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(operation, scale, concurrency, latencies, errors_num, wall_time):
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    result = {
+        "operation": operation,
+        "scale": scale,
+        "concurrency": concurrency,
+        "iterations": len(latencies) + errors_num,
+        "errors": errors_num,
+        "wall_time_s": round(wall_time, 4),
+        "throughput_ops": round(len(latencies) / wall_time, 2) if wall_time else None,
+        "latency_ms": None,
+    }
+    if latencies_ms:
+        result["latency_ms"] = {
+            "min": round(latencies_ms[0], 3),
+            "mean": round(sum(latencies_ms) / len(latencies_ms), 3),
+            "max": round(latencies_ms[-1], 3),
+        }
+        for percent in PERCENTILES:
+            result["latency_ms"]["p{}".format(percent)] = round(
+                percentile(latencies_ms, percent), 3
+            )
+    return result
+
+
+def timed_call(func, args):
+    start_time = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start_time
+
+
+def run_operation(operation, scale, concurrency, calls, row_cache=None):
+    # calls - список пар (функция, аргументы); выполняются в concurrency потоках.
+    # row_cache - включенный кэш строк, его попадания за операцию попадают в результат
+    latencies = []
+    errors_num = 0
+    if row_cache is not None:
+        row_cache.reset_stats()
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(timed_call, func, args) for func, args in calls]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception as e:
+                errors_num += 1
+                print("{}: {}".format(operation, e))
+    wall_time = time.perf_counter() - start_time
+
+    result = summarize(operation, scale, concurrency, latencies, errors_num, wall_time)
+    if row_cache is not None:
+        row_cache_stats = row_cache.to_dict()
+        result["row_cache"] = {
+            "hits": row_cache_stats["hits"],
+            "misses": row_cache_stats["misses"],
+            "hit_ratio": row_cache_stats["hit_ratio"],
+        }
+    print(
+        "{operation:>20} scale={scale:<6} concurrency={concurrency:<3} "
+        "throughput={throughput_ops} ops/s p50={p50} ms p95={p95} ms".format(
+            p50=(result["latency_ms"] or {}).get("p50"),
+            p95=(result["latency_ms"] or {}).get("p95"),
+            **result
+        )
+    )
+    return result
+
+
+def make_calls(db_manager, operation, rows_num, iterations, rnd, deleted_ids):
+    # Аргументы всех вызовов готовятся заранее, чтобы генерация не попала в замер
+    patients_num = rows_num["patients"]
+    if operation == "get_data_from_table":
+        return [(db_manager.get_data_from_table, ("doctors",))] * iterations
+    if operation == "find_record":
+        return [
+            (
+                db_manager.find_record,
+                ("appointments", "patient_id", rnd.randint(1, patients_num)),
+            )
+            for _ in range(iterations)
+        ]
+    if operation == "add_data":
+        return [
+            (
+                db_manager.add_data,
+                (
+                    "clinic",
+                    ["name", "address", "phone"],
+                    ["Benchmark clinic", "Benchmark street", "8310000000"],
+                ),
+            )
+        ] * iterations
+    if operation == "update_record":
+        return [
+            (
+                db_manager.update_record,
+                (
+                    "patients",
+                    "contacts",
+                    "89{:09d}".format(rnd.randrange(10**9)),
+                    "id",
+                    rnd.randint(1, patients_num),
+                ),
+            )
+            for _ in range(iterations)
+        ]
+    if operation == "delete_record":
+        # Каждая запись медкнижки удаляется не больше одного раза за прогон
+        free_ids = [
+            record_id
+            for record_id in range(1, rows_num["medical_records"] + 1)
+            if record_id not in deleted_ids
+        ]
+        ids = rnd.sample(free_ids, min(iterations, len(free_ids)))
+        deleted_ids.update(ids)
+        return [
+            (db_manager.delete_record, ("medical_records", "id", record_id))
+            for record_id in ids
+        ]
+    raise Exception("Unknown benchmark operation: {}".format(operation))
+
+
+def run_benchmark(db_manager, scales, concurrency_levels, iterations, seed):
+    results = []
+    row_cache = db_manager.get_row_cache()
+    for scale in scales:
+        rnd = random.Random(seed)
+        rows_num = get_rows_num(scale)
+
+        # Исходные данные: очистка и генерация заданного объема (тоже замеряется)
+        db_manager.clear_all_tables()
+        results.append(
+            run_operation(
+                "seed_scaled_data",
+                scale,
+                1,
+                [(db_manager.seed_scaled_data, (scale, seed))],
+            )
+        )
+
+        deleted_ids = set()
+        for concurrency in concurrency_levels:
+            for operation in REPEATED_OPERATIONS:
+                calls = make_calls(
+                    db_manager, operation, rows_num, iterations, rnd, deleted_ids
+                )
+                results.append(
+                    run_operation(operation, scale, concurrency, calls, row_cache)
+                )
+
+        # Разрушающие операции - по одному разу, без параллельности
+        results.append(
+            run_operation(
+                "clear_table",
+                scale,
+                1,
+                [(db_manager.clear_table, ("medical_records",))],
+            )
+        )
+        db_manager.clear_all_tables()
+        results.append(
+            run_operation("seed_data", scale, 1, [(db_manager.seed_data, ())])
+        )
+    return results
+
+
+def compare_results(results, baseline_path, row_cache_enabled):
+    # Сравнение медианы и p95 с результатами другого коммита
+    with open(baseline_path, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+
+    # В прогонах без поля row_cache кэш мог быть включен в database.ini
+    if baseline["meta"].get("row_cache") != row_cache_enabled:
+        print(
+            "\nWARNING: row cache is {} in this run and {} in {}, "
+            "read latencies are not comparable".format(
+                "on" if row_cache_enabled else "off",
+                {True: "on", False: "off"}.get(
+                    baseline["meta"].get("row_cache"), "unknown"
+                ),
+                baseline_path,
+            )
+        )
+
+    baseline_results = {
+        (result["operation"], result["scale"], result["concurrency"]): result
+        for result in baseline["results"]
+    }
+    print(
+        "\nComparison with {} ({}):".format(baseline_path, baseline["meta"]["commit"])
+    )
+    for result in results:
+        key = (result["operation"], result["scale"], result["concurrency"])
+        old_result = baseline_results.get(key)
+        if (
+            old_result is None
+            or not old_result["latency_ms"]
+            or not result["latency_ms"]
+        ):
+            continue
+        changes = []
+        for metric in ("p50", "p95"):
+            old_value = old_result["latency_ms"][metric]
+            new_value = result["latency_ms"][metric]
+            if old_value:
+                changes.append(
+                    "{} {:+.1f}%".format(metric, (new_value / old_value - 1) * 100)
+                )
+        print(
+            "{:>20} scale={:<6} concurrency={:<3} {}".format(*key, ", ".join(changes))
+        )
+
+
+def parse_list(value, item_type):
+    return [item_type(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark DataBaseManager operations against a local PostgreSQL. "
+        "WARNING: clears all tables of the database"
+    )
+    parser.add_argument(
+        "--scales",
+        default="0.01,0.1,1",
+        help="comma separated data scale factors, see generate_data.py (default 0.01,0.1,1)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        default="1,4,8",
+        help="comma separated numbers of parallel threads (default 1,4,8)",
+    )
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=100,
+        help="calls of each operation per concurrency level (default 100)",
+    )
+    parser.add_argument("--seed", type=float, default=0, help="data and random seed")
+    parser.add_argument(
+        "--output", default="benchmark.json", help="JSON file for the results"
+    )
+    parser.add_argument("--compare", help="JSON results of another run to compare with")
+    parser.add_argument(
+        "--row-cache",
+        action="store_true",
+        help="serve repeated reads from the row cache (off by default: with it the "
+        "read operations mostly measure cache lookups)",
+    )
+    args = parser.parse_args()
+
+    scales = parse_list(args.scales, float)
+    concurrency_levels = parse_list(args.concurrency, int)
+    if not scales or any(scale <= 0 for scale in scales):
+        parser.error("--scales must be positive numbers")
+    if not concurrency_levels or any(level < 1 for level in concurrency_levels):
+        parser.error("--concurrency must be positive integers")
+
+    db_manager = DataBaseManager("med_user")
+    db_manager.set_row_cache_enabled(args.row_cache)
+    results = run_benchmark(
+        db_manager, scales, concurrency_levels, args.iterations, args.seed
+    )
+
+    report = {
+        "meta": {
+            "commit": get_git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scales": scales,
+            "concurrency": concurrency_levels,
+            "iterations": args.iterations,
+            "seed": args.seed,
+            "row_cache": args.row_cache,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(report, output_file, ensure_ascii=False, indent=2)
+    print("Results written to {}".format(args.output))
+
+    if args.compare:
+        compare_results(results, args.compare, args.row_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import queue
+import select
+import threading
+
+import psycopg2
+from psycopg2 import sql
+
+# Канал уведомлений об изменениях данных (триггеры procedures.notify_row_change)
+TABLE_CHANGES_CHANNEL = "med_table_changes"
+
+# Канал уведомлений об изменении структуры схемы (init.bump_schema_version)
+SCHEMA_CHANGES_CHANNEL = "med_schema_changed"
+
+# Служебное уведомление: соединение восстановлено, часть уведомлений могла потеряться
+RECONNECTED_CHANNEL = "reconnected"
+
+# Сколько секунд поток ждет уведомлений, прежде чем проверить флаг остановки
+LISTEN_TIMEOUT = 1
+
+# Пауза перед повторным подключением после обрыва соединения
+RECONNECT_DELAY = 5
+
+
+class ChangeListener(threading.Thread):
+    # Отдельное соединение psycopg2 в режиме AUTOCOMMIT, подписанное через LISTEN
+    # на каналы channels. Пришедшие уведомления складываются в очередь, которую
+    # главный поток Tk забирает через get_notifications()
+    def __init__(self, connection_params, channels):
+        super().__init__(name="db_listener", daemon=True)
+        self.connection_params = connection_params
+        self.channels = channels
+        self.notifications = queue.Queue()
+        self.stop_event = threading.Event()
+        self.connected_event = threading.Event()
+
+    def run(self):
+        is_reconnect = False
+        while not self.stop_event.is_set():
+            try:
+                self.__listen(is_reconnect)
+            except psycopg2.Error as e:
+                print(e)
+                self.stop_event.wait(RECONNECT_DELAY)
+            is_reconnect = True
+
+    def stop(self):
+        self.stop_event.set()
+
+    def is_connected(self):
+        # Подписка LISTEN активна: уведомления об изменениях сейчас не теряются
+        return self.connected_event.is_set()
+
+    def get_notifications(self):
+        # Список пар (канал, payload), пришедших с прошлого вызова
+        notifications = []
+        while True:
+            try:
+                notifications.append(self.notifications.get_nowait())
+            except queue.Empty:
+                return notifications
+
+    def __listen(self, is_reconnect):
+        connection = psycopg2.connect(**self.connection_params)
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                for channel in self.channels:
+                    cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+            if is_reconnect:
+                self.notifications.put((RECONNECTED_CHANNEL, ""))
+            self.connected_event.set()
+
+            while not self.stop_event.is_set():
+                # Ждем, пока на сокете соединения появятся данные
+                if select.select([connection], [], [], LISTEN_TIMEOUT) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    self.notifications.put((notify.channel, notify.payload))
+        finally:
+            self.connected_event.clear()
+            connection.close()
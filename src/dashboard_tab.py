@@ -0,0 +1,137 @@
+import tkinter as tk
+from tkinter import ttk
+
+from background import error_handler
+
+# Статусы записей на прием в порядке столбцов сводки (как в chk_status)
+APPOINTMENT_STATUSES = ("запланировано", "пропущено", "отменено", "завершено")
+
+# Таблицы, от изменений которых зависит сводка
+DASHBOARD_TABLES = ("appointments", "doctors", "clinic")
+
+
+class DashboardTab(ttk.Frame):
+    # Вкладка со сводкой записей на прием по статусам, поликлиникам и докторам.
+    # Данные берутся из сводной таблицы (DataBaseManager.get_dashboard_stats),
+    # поэтому загрузка не зависит от объема истории записей
+    def __init__(self, master, notebook, db_manager):
+        super().__init__(master)
+        self.notebook = notebook
+        self.db_manager = db_manager
+        self.executor = notebook.executor
+        self.is_loaded = False
+        self.stats_task = None
+        # Сводку попросили обновить, пока шла загрузка: после нее загружается еще раз
+        self.is_refresh_pending = False
+        self.setup_ui()
+
+    def setup_ui(self):
+        self.totals_label = tk.Label(self, anchor="w", justify="left")
+        self.totals_label.pack(fill="x", padx=5, pady=5)
+
+        status_columns = [(status, status.upper()) for status in APPOINTMENT_STATUSES]
+        self.clinics_tree = self.create_tree(
+            "Clinics",
+            [("id", "ID"), ("name", "NAME"), ("total", "TOTAL")] + status_columns,
+        )
+        self.doctors_tree = self.create_tree(
+            "Doctors",
+            [
+                ("id", "ID"),
+                ("full_name", "FULL_NAME"),
+                ("specialization", "SPECIALIZATION"),
+                ("clinic_id", "CLINIC_ID"),
+                ("total", "TOTAL"),
+            ]
+            + status_columns,
+        )
+
+        refresh_button = tk.Button(self, text="Refresh", command=self.refresh_stats)
+        refresh_button.pack(side="left", padx=5, pady=5)
+
+    def create_tree(self, title, columns):
+        tree_frame = tk.LabelFrame(self, text=title)
+        tree_frame.pack(fill="both", expand=True, padx=5, pady=5)
+
+        tree = ttk.Treeview(
+            tree_frame, columns=[key for key, _ in columns], show="headings"
+        )
+        for key, heading in columns:
+            tree.heading(key, text=heading)
+            tree.column(key, anchor="center", width=100)
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        tree.pack(side="left", fill="both", expand=True)
+        return tree
+
+    def ensure_loaded(self):
+        # Сводка загружается при первом показе вкладки
+        if self.is_loaded:
+            return
+        self.is_loaded = True
+        self.refresh_stats()
+
+    def refresh_stats(self):
+        if not self.is_loaded:
+            return
+        if self.stats_task is not None and self.stats_task.is_active():
+            # Идущая загрузка могла начаться до изменения, о котором сообщили
+            self.is_refresh_pending = True
+            return
+
+        self.is_refresh_pending = False
+        self.stats_task = self.executor.submit(
+            self.db_manager.get_dashboard_stats,
+            on_success=self.on_stats_loaded,
+            on_error=self.on_stats_load_error,
+        )
+
+    def on_stats_loaded(self, stats):
+        self.display_stats(stats)
+        self.refresh_pending_stats()
+
+    def on_stats_load_error(self, error):
+        error_handler("Loading error", "Load dashboard error")(error)
+        self.refresh_pending_stats()
+
+    def refresh_pending_stats(self):
+        if self.is_refresh_pending:
+            self.refresh_stats()
+
+    def display_stats(self, stats):
+        statuses = stats["statuses"]
+        self.totals_label["text"] = "Appointments: {}  ({})".format(
+            sum(statuses.values()),
+            ", ".join(
+                "{}: {}".format(status, statuses.get(status, 0))
+                for status in APPOINTMENT_STATUSES
+            ),
+        )
+
+        self.clinics_tree.delete(*self.clinics_tree.get_children())
+        for clinic in stats["clinics"]:
+            self.clinics_tree.insert(
+                "",
+                "end",
+                values=[clinic["clinic_id"], clinic["name"], clinic["total"]]
+                + self.get_status_values(clinic["statuses"]),
+            )
+
+        self.doctors_tree.delete(*self.doctors_tree.get_children())
+        for doctor in stats["doctors"]:
+            self.doctors_tree.insert(
+                "",
+                "end",
+                values=[
+                    doctor["doctor_id"],
+                    doctor["full_name"],
+                    doctor["specialization"],
+                    doctor["clinic_id"],
+                    doctor["total"],
+                ]
+                + self.get_status_values(doctor["statuses"]),
+            )
+
+    def get_status_values(self, statuses):
+        return [statuses.get(status, 0) for status in APPOINTMENT_STATUSES]
@@ -1,23 +1,100 @@
+import csv
+import io
+import json
+import threading
+import time
 from configparser import ConfigParser
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
 
+from psycopg2 import sql
 from sqlalchemy import create_engine, text
 
-from sql_injection_check import is_possible_sql_injection
+from change_listener import (
+    SCHEMA_CHANGES_CHANNEL,
+    TABLE_CHANGES_CHANNEL,
+    ChangeListener,
+)
+from profiling import profiler
+from row_cache import RowCache
+from schema_catalog import SchemaCatalog
+
+# Количество строк, загружаемых за один запрос при постраничном чтении таблицы
+PAGE_SIZE = 200
+
+# Режимы поиска procedures.build_search_condition: равенство, диапазон, префикс строки
+SEARCH_MODES = ("eq", "range", "prefix")
+
+# Режимы поиска по тексту: полнотекстовый (с ранжированием) и нечеткий по триграммам
+TEXT_SEARCH_MODES = ("fulltext", "fuzzy")
+
+# Количество строк в одной пачке COPY при массовой вставке
+BULK_BATCH_SIZE = 5000
+
+# Таблицы меньше этого размера не попадают в рекомендации по индексам
+INDEX_ADVICE_MIN_ROWS = 1000
+
+# Количество строк, которое серверный курсор отдает за один FETCH при выгрузке
+STREAM_BATCH_SIZE = 2000
+
+# Количество записей на прием, которое обслуживание обновляет в одной транзакции
+MAINTENANCE_BATCH_SIZE = 10000
+
+# На сколько месяцев вперед обслуживание создает секции секционированных таблиц
+PARTITIONS_MONTHS_AHEAD = 3
+
+# Настройки пула соединений по умолчанию (переопределяются секцией [engine] в database.ini)
+ENGINE_DEFAULTS = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "pool_recycle": 1800,
+    "pool_pre_ping": True,
+    "isolation_level": "SERIALIZABLE",
+    "echo": False,
+}
+
+# Настройки профилирования запросов по умолчанию (секция [profiling] в database.ini)
+PROFILING_DEFAULTS = {
+    "enabled": True,
+    "slow_query_ms": 500,
+    "explain_slow_queries": False,
+}
+
+# Настройки кэша прочитанных строк по умолчанию (секция [row_cache] в database.ini)
+ROW_CACHE_DEFAULTS = {
+    "enabled": True,
+    "max_size_mb": 64,
+}
+
+# Движки SQLAlchemy общие на весь процесс: по одному на секцию database.ini
+_engines = {}
+_engines_lock = threading.Lock()
+
+# Каталоги схемы общие на весь процесс: по одному на базу данных (хост, имя базы)
+_schema_catalogs = {}
+_schema_catalogs_lock = threading.Lock()
+
+# Кэши прочитанных строк общие на весь процесс: по одному на базу данных
+_row_caches = {}
+_row_caches_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _statement(query):
+    # Кэш конструкций text(): для повторяющихся запросов SQLAlchemy берет
+    # уже скомпилированный SQL из своего кэша, значения передаются параметрами
+    return text(query)
 
 
 class DataBaseManager:
     def __init__(self, user_name="med_user"):
         self.connection_params = self.__get_config(section=user_name)
-        self.engine = create_engine(
-            "postgresql+psycopg2://{}:{}@{}/{}".format(
-                self.connection_params["user"],
-                self.connection_params["password"],
-                self.connection_params["host"],
-                self.connection_params["database"],
-            ),
-            echo=True,
-            isolation_level="SERIALIZABLE",
-        )
+        self.engine = self.__get_engine(user_name)
+        # Чтение идет через тот же пул, но в режиме AUTOCOMMIT:
+        # каждый SELECT выполняется в собственной READ COMMITTED транзакции без BEGIN/COMMIT
+        self.read_engine = self.engine.execution_options(isolation_level="AUTOCOMMIT")
 
     def __get_config(self, filename="database.ini", section="med_user"):
         parser = ConfigParser()
@@ -36,83 +113,649 @@ class DataBaseManager:
 
         return db_connection_info
 
+    def __get_engine_config(self, filename="database.ini", section="engine"):
+        parser = ConfigParser()
+
+        parser.read(filename)
+
+        return {
+            "pool_size": parser.getint(
+                section, "pool_size", fallback=ENGINE_DEFAULTS["pool_size"]
+            ),
+            "max_overflow": parser.getint(
+                section, "max_overflow", fallback=ENGINE_DEFAULTS["max_overflow"]
+            ),
+            "pool_timeout": parser.getint(
+                section, "pool_timeout", fallback=ENGINE_DEFAULTS["pool_timeout"]
+            ),
+            "pool_recycle": parser.getint(
+                section, "pool_recycle", fallback=ENGINE_DEFAULTS["pool_recycle"]
+            ),
+            "pool_pre_ping": parser.getboolean(
+                section, "pool_pre_ping", fallback=ENGINE_DEFAULTS["pool_pre_ping"]
+            ),
+            "isolation_level": parser.get(
+                section, "isolation_level", fallback=ENGINE_DEFAULTS["isolation_level"]
+            ),
+            "echo": parser.getboolean(
+                section, "echo", fallback=ENGINE_DEFAULTS["echo"]
+            ),
+        }
+
+    def __get_profiling_config(self, filename="database.ini", section="profiling"):
+        parser = ConfigParser()
+
+        parser.read(filename)
+
+        return {
+            "enabled": parser.getboolean(
+                section, "enabled", fallback=PROFILING_DEFAULTS["enabled"]
+            ),
+            "slow_query_ms": parser.getint(
+                section, "slow_query_ms", fallback=PROFILING_DEFAULTS["slow_query_ms"]
+            ),
+            "explain_slow_queries": parser.getboolean(
+                section,
+                "explain_slow_queries",
+                fallback=PROFILING_DEFAULTS["explain_slow_queries"],
+            ),
+        }
+
+    def __get_row_cache_config(self, filename="database.ini", section="row_cache"):
+        parser = ConfigParser()
+
+        parser.read(filename)
+
+        return {
+            "enabled": parser.getboolean(
+                section, "enabled", fallback=ROW_CACHE_DEFAULTS["enabled"]
+            ),
+            "max_size_mb": parser.getint(
+                section, "max_size_mb", fallback=ROW_CACHE_DEFAULTS["max_size_mb"]
+            ),
+        }
+
+    def __get_engine(self, user_name):
+        with _engines_lock:
+            if user_name not in _engines:
+                engine = create_engine(
+                    "postgresql+psycopg2://{}:{}@{}/{}".format(
+                        self.connection_params["user"],
+                        self.connection_params["password"],
+                        self.connection_params["host"],
+                        self.connection_params["database"],
+                    ),
+                    **self.__get_engine_config(),
+                )
+                profiling_config = self.__get_profiling_config()
+                if profiling_config["enabled"]:
+                    profiler.configure(
+                        profiling_config["slow_query_ms"],
+                        profiling_config["explain_slow_queries"],
+                    )
+                    profiler.attach(engine)
+                _engines[user_name] = engine
+            return _engines[user_name]
+
+    @contextmanager
+    def __connect(self, engine, method, begin=False):
+        # Соединение из пула; время ожидания свободного соединения попадает в профиль,
+        # имя метода - в параметры выполнения, откуда его берут события профилировщика
+        start_time = time.perf_counter()
+        with engine.begin() if begin else engine.connect() as connect:
+            profiler.record_checkout(time.perf_counter() - start_time)
+            yield connect.execution_options(profiler_method=method)
+
+    @contextmanager
+    def __raw_connection(self):
+        start_time = time.perf_counter()
+        connection = self.engine.raw_connection()
+        profiler.record_checkout(time.perf_counter() - start_time)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def __fetch_all(self, method, query, params=None):
+        # method - имя публичного метода DataBaseManager, под которым запрос попадает
+        # в статистику профилировщика; его передают все служебные методы запросов
+        with self.__connect(self.read_engine, method) as connect:
+            return connect.execute(_statement(query), params or {}).fetchall()
+
+    def __fetch_rows(self, method, query, row_type, params):
+        # Строки таблицы приходят в родных типах столбцов и сразу упаковываются
+        # в row_type (namedtuple из каталога схемы), без промежуточных словарей
+        with self.__connect(self.read_engine, method) as connect:
+            result = connect.execute(_statement(query), params)
+            rows = list(map(row_type._make, result.fetchall()))
+        profiler.record_received_rows(rows)
+        return rows
+
+    def __fetch_cached_rows(self, method, table_name, query, row_type, params=None):
+        # Чтение через кэш строк: ключ - текст запроса (в нем уже есть таблица)
+        # и значения параметров. Вызывающему отдается копия списка
+        params = params or {}
+        row_cache = self.get_row_cache()
+        if row_cache is None:
+            return self.__fetch_rows(method, query, row_type, params)
+
+        cache_key = (query,) + tuple(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in sorted(params.items())
+        )
+        rows = row_cache.get(cache_key)
+        if rows is None:
+            generation = row_cache.get_generation(table_name)
+            rows = self.__fetch_rows(method, query, row_type, params)
+            row_cache.put(table_name, cache_key, rows, generation)
+        return list(rows)
+
+    def __stream(self, method, query, row_type, batch_size, params=None):
+        # Серверный курсор: строки приходят пачками по batch_size, память не растет.
+        # Именованному курсору psycopg2 нужна транзакция, поэтому здесь не AUTOCOMMIT
+        with self.__connect(self.engine, method) as connect:
+            connect = connect.execution_options(
+                isolation_level="REPEATABLE READ",
+                postgresql_readonly=True,
+                stream_results=True,
+                yield_per=batch_size,
+            )
+            result = connect.execute(_statement(query), params or {})
+            # Между пачками вызывающий может выполнять другие запросы в этом же потоке
+            query_stats = profiler.get_last_query_stats()
+            for batch in result.partitions():
+                rows = list(map(row_type._make, batch))
+                profiler.record_received_rows(rows, query_stats)
+                yield from rows
+
+    def __execute(self, method, query, params=None):
+        # engine.begin() выполняет COMMIT при выходе из блока и ROLLBACK при ошибке
+        with self.__connect(self.engine, method, begin=True) as connect:
+            connect.execute(_statement(query), params or {})
+
+    def __call_autocommit(self, method, query, params=None):
+        # Для процедур с COMMIT внутри: они выполняются только вне транзакции,
+        # поэтому вызов идет через движок в режиме AUTOCOMMIT
+        with self.__connect(self.read_engine, method) as connect:
+            return connect.execute(_statement(query), params or {}).fetchall()
+
+    def __execute_many(self, method, query, params_list):
+        # Один и тот же запрос с разными параметрами в одной транзакции
+        with self.__connect(self.engine, method, begin=True) as connect:
+            connect.execute(_statement(query), params_list)
+
+    def get_profiler(self):
+        return profiler
+
+    def __get_schema_catalog_key(self):
+        return (self.connection_params["host"], self.connection_params["database"])
+
+    def get_schema_version(self):
+        query = "SELECT procedures.get_schema_version()"
+        return self.__fetch_all("get_schema_version", query)[0][0]
+
+    def get_schema_catalog(self, refresh=False):
+        # Каталог загружается из pg_catalog один раз на процесс. Не чаще чем раз
+        # в VERSION_CHECK_INTERVAL секунд сверяется номер версии схемы, и только
+        # если он изменился, каталог загружается заново
+        catalog_key = self.__get_schema_catalog_key()
+        with _schema_catalogs_lock:
+            catalog = _schema_catalogs.get(catalog_key)
+
+        if catalog is not None and not refresh:
+            if not catalog.is_version_check_due():
+                return catalog
+            if self.get_schema_version() == catalog.version:
+                catalog.mark_version_checked()
+                return catalog
+
+        query = "SELECT procedures.get_schema_catalog()"
+        catalog = SchemaCatalog(self.__fetch_all("get_schema_catalog", query)[0][0])
+        with _schema_catalogs_lock:
+            _schema_catalogs[catalog_key] = catalog
+        # Закэшированные строки могли остаться от прежней структуры таблиц
+        self.invalidate_row_cache()
+        return catalog
+
+    def invalidate_schema_catalog(self):
+        with _schema_catalogs_lock:
+            _schema_catalogs.pop(self.__get_schema_catalog_key(), None)
+        self.invalidate_row_cache()
+
+    def get_row_cache(self):
+        # None, если кэш строк выключен в database.ini
+        catalog_key = self.__get_schema_catalog_key()
+        with _row_caches_lock:
+            if catalog_key not in _row_caches:
+                row_cache_config = self.__get_row_cache_config()
+                _row_caches[catalog_key] = (
+                    RowCache(row_cache_config["max_size_mb"] * 1024 * 1024)
+                    if row_cache_config["enabled"]
+                    else None
+                )
+            return _row_caches[catalog_key]
+
+    def set_row_cache_enabled(self, enabled):
+        # Включает или выключает кэш строк для всего процесса независимо от database.ini
+        # (benchmark.py по умолчанию замеряет чтение без кэша)
+        catalog_key = self.__get_schema_catalog_key()
+        with _row_caches_lock:
+            if not enabled:
+                _row_caches[catalog_key] = None
+            elif _row_caches.get(catalog_key) is None:
+                row_cache_config = self.__get_row_cache_config()
+                _row_caches[catalog_key] = RowCache(
+                    row_cache_config["max_size_mb"] * 1024 * 1024
+                )
+
+    def invalidate_row_cache(self, table_name=None):
+        # Сброс закэшированных строк таблицы и всех таблиц, которые ссылаются на нее
+        # (каскадное удаление меняет и их), или всего кэша при table_name = None.
+        # Вызывается после собственных изменений и по уведомлениям об изменениях
+        row_cache = self.get_row_cache()
+        if row_cache is None:
+            return
+        if table_name is None:
+            row_cache.clear()
+            return
+        with _schema_catalogs_lock:
+            catalog = _schema_catalogs.get(self.__get_schema_catalog_key())
+        if catalog is None or not catalog.has_table(table_name):
+            row_cache.invalidate([table_name])
+        else:
+            row_cache.invalidate(catalog.get_dependent_tables(table_name))
+
     def get_tables_number(self):
-        query = "SELECT * FROM procedures.count_tables();"
-        with self.engine.connect() as connect:
-            tables_num = connect.execute(text(query)).fetchall()[0][0]
-            connect.commit()
-        return tables_num
+        return len(self.get_schema_catalog().get_table_names())
 
     def get_table_titles_and_headers(self):
         # Возвращает словарь в формате "название_таблицы": ["заголовок1", "заголовок2", ...]
-        query = "SELECT * FROM procedures.get_all_table_headers();"
-        tables_info = None
-        with self.engine.connect() as connect:
-            tables_info = connect.execute(text(query)).fetchall()[0][0]
-            connect.commit()
-        return tables_info
+        return self.get_schema_catalog().get_headers()
+
+    def __rows_query(self, function_name, table_title, args=""):
+        # Запрос к функции, возвращающей строки таблицы в ее собственном типе:
+        # таблица передается значением NULL::tables."имя", поэтому имя проверяется
+        # по каталогу и подставляется в текст запроса, а не параметром.
+        # Возвращает текст запроса и класс строки таблицы
+        catalog = self.get_schema_catalog()
+        catalog.get_table(table_title)
+        query = 'SELECT * FROM procedures.{}(NULL::tables."{}"{})'.format(
+            function_name, table_title.replace('"', '""'), args
+        )
+        return query, catalog.get_row_type(table_title)
 
     def get_data_from_table(self, table_title):
-        query = "SELECT * FROM procedures.get_all_data('{}')".format(table_title)
-        with self.engine.connect() as connect:
-            tables_info = [row[0] for row in connect.execute(text(query)).fetchall()]
-            connect.commit()
-        return tables_info
+        query, row_type = self.__rows_query("get_all_rows", table_title)
+        return self.__fetch_cached_rows(
+            "get_data_from_table", table_title, query, row_type
+        )
+
+    def get_data_page(self, table_title, last_id=0, page_size=PAGE_SIZE):
+        # Keyset-пагинация: строки с id > last_id, не более page_size штук
+        query, row_type = self.__rows_query(
+            "get_page_rows", table_title, ", :last_id, :page_size"
+        )
+        params = {"last_id": int(last_id), "page_size": int(page_size)}
+        return self.__fetch_cached_rows(
+            "get_data_page", table_title, query, row_type, params
+        )
+
+    def get_data_page_before(self, table_title, first_id, page_size=PAGE_SIZE):
+        # Keyset-пагинация назад: не более page_size строк с наибольшими id < first_id,
+        # в порядке возрастания id
+        query, row_type = self.__rows_query(
+            "get_prev_page_rows", table_title, ", :first_id, :page_size"
+        )
+        params = {"first_id": int(first_id), "page_size": int(page_size)}
+        return self.__fetch_cached_rows(
+            "get_data_page_before", table_title, query, row_type, params
+        )
+
+    def get_data_range(self, table_title, first_id, last_id):
+        # Строки с first_id < id <= last_id
+        query, row_type = self.__rows_query(
+            "get_range_rows", table_title, ", :first_id, :last_id"
+        )
+        params = {"first_id": int(first_id), "last_id": int(last_id)}
+        return self.__fetch_cached_rows(
+            "get_data_range", table_title, query, row_type, params
+        )
+
+    def get_data_by_ids(self, table_title, ids):
+        query, row_type = self.__rows_query("get_rows_by_ids", table_title, ", :ids")
+        params = {"ids": [int(record_id) for record_id in ids]}
+        return self.__fetch_cached_rows(
+            "get_data_by_ids", table_title, query, row_type, params
+        )
+
+    def create_change_listener(
+        self, channels=(TABLE_CHANGES_CHANNEL, SCHEMA_CHANGES_CHANNEL)
+    ):
+        # Слушатель уведомлений об изменениях на отдельном соединении (не из пула):
+        # оно занято LISTEN все время работы приложения
+        return ChangeListener(self.connection_params, channels)
+
+    def iter_table_data(self, table_title, batch_size=STREAM_BATCH_SIZE):
+        query, row_type = self.__rows_query("get_all_rows", table_title)
+        return self.__stream("iter_table_data", query, row_type, batch_size)
+
+    def iter_found_records(
+        self, table_name, key_col, key_val, batch_size=STREAM_BATCH_SIZE
+    ):
+        query, row_type = self.__rows_query("search_rows", table_name, ", :filters")
+        params = {"filters": json.dumps([self.make_search_filter(key_col, key_val)])}
+        return self.__stream("iter_found_records", query, row_type, batch_size, params)
+
+    def copy_table_to_csv(self, table_name, output_file):
+        self.get_schema_catalog().get_table(table_name)
+
+        with self.__raw_connection() as connection:
+            start_time = time.perf_counter()
+            with connection.cursor() as cursor:
+                # Источник строк тот же, что у функций чтения (для patients age
+                # вычисляется при чтении); текст собирает сервер из имени таблицы
+                cursor.execute("SELECT procedures.get_table_source(%s)", (table_name,))
+                table_source = cursor.fetchone()[0]
+
+                # COPY TO STDOUT пишет CSV прямо в файл, строки не собираются в Python
+                copy_query = sql.SQL(
+                    "COPY (SELECT * FROM {} AS t ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER)"
+                ).format(sql.SQL(table_source))
+                cursor.copy_expert(copy_query.as_string(cursor), output_file)
+                copied_rows_num = cursor.rowcount
+            connection.rollback()
+            profiler.record_query(
+                "copy_table_to_csv",
+                "COPY TO STDOUT",
+                time.perf_counter() - start_time,
+                rows=copied_rows_num,
+            )
+
+    def get_dashboard_stats(self):
+        # Сводка записей на прием из таблицы stats.appointment_counts и еще не
+        # перенесенных в нее изменений: {"statuses": {...}, "clinics": [...], "doctors": [...]}
+        query = "SELECT procedures.get_dashboard_stats()"
+        return self.__fetch_all("get_dashboard_stats", query)[0][0]
+
+    def fold_appointment_stats(self):
+        # Перенос накопленных триггерами изменений сводки в stats.appointment_counts,
+        # возвращает число перенесенных строк изменений
+        query = "CALL procedures.fold_appointment_stats(NULL)"
+        return self.__call_autocommit("fold_appointment_stats", query)[0][0]
+
+    def get_tables_references(self):
+        # Возвращает словарь "таблица": ["ссылающаяся_таблица1", ...]
+        return self.get_schema_catalog().get_references()
+
+    def suggest_indexes(self, min_live_rows=INDEX_ADVICE_MIN_ROWS):
+        # Возвращает список рекомендаций по индексам на основе статистики сервера
+        query = "SELECT procedures.get_index_usage_stats()"
+        stats = self.__fetch_all("suggest_indexes", query)[0][0]
+        suggestions = []
+
+        for foreign_key in stats["unindexed_foreign_keys"]:
+            columns = ", ".join(foreign_key["columns"])
+            suggestions.append(
+                "{0}: foreign key ({1}) has no index, ON DELETE CASCADE scans "
+                "the whole table. CREATE INDEX ON tables.{0} ({1});".format(
+                    foreign_key["table_name"], columns
+                )
+            )
+
+        for table_stats in stats["tables"]:
+            if table_stats["live_rows"] < min_live_rows:
+                continue
+            if table_stats["seq_scan"] > table_stats["idx_scan"]:
+                suggestions.append(
+                    "{}: {} sequential scans read {} rows, only {} index scans. "
+                    "Index the columns used in search.".format(
+                        table_stats["table_name"],
+                        table_stats["seq_scan"],
+                        table_stats["seq_tup_read"],
+                        table_stats["idx_scan"],
+                    )
+                )
+
+        for statement in stats["statements"]:
+            suggestions.append(
+                "Heavy query ({} calls, {:.1f} ms total): {}".format(
+                    statement["calls"], statement["total_exec_time"], statement["query"]
+                )
+            )
+
+        return suggestions
 
     def add_data(self, table_name, table_headers, new_values):
-        if any(is_possible_sql_injection(val) for val in new_values):
-            raise Exception("Possible SQL-injection detected")
+        # Списки передаются в процедуру как массивы TEXT[]
+        query = "CALL procedures.insert_into_table(:table_name, :columns, :info)"
+        params = {
+            "table_name": table_name,
+            "columns": list(table_headers),
+            "info": list(new_values),
+        }
+        self.__execute("add_data", query, params)
+        self.invalidate_row_cache(table_name)
 
-        table_headers_sql_arr = "ARRAY[{}]".format(
-            ", ".join(f"'{head}'" for head in table_headers)
+    def bulk_add_data(
+        self,
+        table_name,
+        table_headers,
+        rows,
+        batch_size=BULK_BATCH_SIZE,
+        progress_callback=None,
+    ):
+        # Потоковая вставка через COPY FROM STDIN пачками по batch_size строк.
+        # Все пачки идут в одной транзакции; триггеры BEFORE INSERT срабатывают и для COPY.
+        # progress_callback(номер_пачки, вставлено_строк) вызывается после каждой пачки.
+        # Вместо построчных уведомлений med_table_changes отправляется одно "BULK"
+        self.get_schema_catalog().check_columns(table_name, table_headers)
+
+        copy_query = sql.SQL(
+            "COPY tables.{} ({}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        ).format(
+            sql.Identifier(table_name),
+            sql.SQL(", ").join(sql.Identifier(head) for head in table_headers),
         )
-        new_values_sql_arr = "ARRAY[{}]".format(
-            ", ".join(f"'{val}'" for val in new_values)
+
+        rows_iterator = iter(rows)
+        inserted_rows_num = 0
+        sent_bytes_num = 0
+        start_time = time.perf_counter()
+        with self.__raw_connection() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT set_config('med.skip_notify', 'on', true)")
+                    batch_idx = 0
+                    while True:
+                        batch = list(islice(rows_iterator, batch_size))
+                        if not batch:
+                            break
+
+                        # None передается как \N (NULL), пустая строка остается пустой
+                        buffer = io.StringIO()
+                        csv.writer(buffer).writerows(
+                            ["\\N" if val is None else val for val in row]
+                            for row in batch
+                        )
+                        sent_bytes_num += buffer.tell()
+                        buffer.seek(0)
+                        cursor.copy_expert(copy_query.as_string(cursor), buffer)
+
+                        batch_idx += 1
+                        inserted_rows_num += len(batch)
+                        if progress_callback is not None:
+                            progress_callback(batch_idx, inserted_rows_num)
+
+                    cursor.execute(
+                        "SELECT pg_notify(%s, %s)",
+                        (
+                            TABLE_CHANGES_CHANNEL,
+                            json.dumps({"table": table_name, "op": "BULK"}),
+                        ),
+                    )
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        self.invalidate_row_cache(table_name)
+
+        profiler.record_query(
+            "bulk_add_data",
+            "COPY FROM STDIN",
+            time.perf_counter() - start_time,
+            rows=inserted_rows_num,
+            bytes_sent=sent_bytes_num,
         )
+        return inserted_rows_num
 
+    def reserve_ids(self, table_name, count):
+        # Заранее берет count значений из последовательности столбца id таблицы,
+        # чтобы массовая вставка могла сразу проставить внешние ключи на эти строки
+        self.get_schema_catalog().get_table(table_name)
         query = (
-            f"CALL procedures.insert_into_table('{table_name}', "
-            f"{table_headers_sql_arr}, {new_values_sql_arr})"
+            "SELECT nextval(pg_get_serial_sequence(:table_name, 'id')) "
+            "FROM generate_series(1, :count)"
         )
-
-        with self.engine.connect() as connect:
-            connect.execute(text(query))
-            connect.commit()
+        params = {"table_name": "tables." + table_name, "count": int(count)}
+        return [row[0] for row in self.__fetch_all("reserve_ids", query, params)]
 
     def update_record(self, table_name, col_name, new_val, key_col, key_val):
-        if any(is_possible_sql_injection(val) for val in new_val.split()):
-            raise Exception("Possible SQL-injection detected")
+        query = (
+            "CALL procedures.update_record("
+            ":table_name, :col_name, :new_val, :key_col, :key_val)"
+        )
+        params = {
+            "table_name": table_name,
+            "col_name": col_name,
+            "new_val": str(new_val),
+            "key_col": key_col,
+            "key_val": str(key_val),
+        }
+        self.__execute("update_record", query, params)
+        self.invalidate_row_cache(table_name)
+
+    def update_record_fields(self, table_name, new_values, key_col, key_val):
+        # new_values - словарь {"столбец": значение}; все изменения одним UPDATE
+        if not new_values:
+            return
 
-        query = "CALL procedures.update_record('{}', '{}', '{}', '{}', '{}')".format(
-            table_name, col_name, new_val, key_col, key_val
+        query = (
+            "CALL procedures.update_record_fields("
+            ":table_name, :new_values, :key_col, :key_val)"
         )
+        params = {
+            "table_name": table_name,
+            "new_values": json.dumps(
+                {
+                    col: None if val is None else str(val)
+                    for col, val in new_values.items()
+                }
+            ),
+            "key_col": key_col,
+            "key_val": str(key_val),
+        }
+        self.__execute("update_record_fields", query, params)
+        self.invalidate_row_cache(table_name)
 
-        with self.engine.connect() as connect:
-            connect.execute(text(query))
-            connect.commit()
+    def update_records_batch(self, table_name, rows_new_values, key_col="id"):
+        # rows_new_values - словарь {значение_ключа: {"столбец": значение, ...}, ...}.
+        # Записи группируются по набору изменяемых столбцов: на каждую группу один UPDATE,
+        # все группы - в одной транзакции
+        rows_by_columns = {}
+        for key_val, new_values in rows_new_values.items():
+            if not new_values:
+                continue
+            new_row = {
+                col: None if val is None else str(val)
+                for col, val in new_values.items()
+            }
+            new_row[key_col] = str(key_val)
+            rows_by_columns.setdefault(frozenset(new_values), []).append(new_row)
 
-    def delete_record(self, table_name, key_col, key_val):
-        query = "CALL procedures.delete_record('{}', '{}', '{}')".format(
-            table_name, key_col, key_val
+        if not rows_by_columns:
+            return
+
+        query = "CALL procedures.update_records_batch(:table_name, :new_rows, :key_col)"
+        self.__execute_many(
+            "update_records_batch",
+            query,
+            [
+                {
+                    "table_name": table_name,
+                    "new_rows": json.dumps(new_rows),
+                    "key_col": key_col,
+                }
+                for new_rows in rows_by_columns.values()
+            ],
         )
-        with self.engine.connect() as connect:
-            connect.execute(text(query))
-            connect.commit()
+        self.invalidate_row_cache(table_name)
+
+    def delete_record(self, table_name, key_col, key_val):
+        query = "CALL procedures.delete_record(:table_name, :key_col, :key_val)"
+        params = {"table_name": table_name, "key_col": key_col, "key_val": str(key_val)}
+        self.__execute("delete_record", query, params)
+        self.invalidate_row_cache(table_name)
 
-    def find_record(self, table_name, key_col, key_val):
-        if any(is_possible_sql_injection(val) for val in key_val.split()):
-            raise Exception("Possible SQL-injection detected")
+    def make_search_filter(self, key_col, key_val, mode="eq", key_val_to=None):
+        # Условие поиска для find_records_by_filters; пустая граница диапазона - без границы
+        if mode not in SEARCH_MODES:
+            raise Exception("Unknown search mode: {}".format(mode))
+        return {
+            "column": key_col,
+            "mode": mode,
+            "value": None if key_val in (None, "") else str(key_val),
+            "value_to": None if key_val_to in (None, "") else str(key_val_to),
+        }
 
-        query = "SELECT * FROM procedures.search_by_key('{}', '{}', '{}');".format(
-            table_name, key_col, key_val
+    def find_record(self, table_name, key_col, key_val, mode="eq", key_val_to=None):
+        search_filter = self.make_search_filter(key_col, key_val, mode, key_val_to)
+        return self.find_records_by_filters(table_name, [search_filter])
+
+    def find_records_by_filters(self, table_name, filters):
+        # Все условия объединяются через AND и проверяются на сервере
+        query, row_type = self.__rows_query("search_rows", table_name, ", :filters")
+        params = {"filters": json.dumps(filters)}
+        return self.__fetch_cached_rows(
+            "find_records_by_filters", table_name, query, row_type, params
+        )
+
+    def search_text(
+        self,
+        table_name,
+        column,
+        search_value,
+        mode="fulltext",
+        page_offset=0,
+        page_size=PAGE_SIZE,
+    ):
+        # Строки по убыванию релевантности: fulltext - по словам запроса в формате
+        # websearch (фраза в кавычках, -исключение), fuzzy - похожие строки (pg_trgm)
+        if mode not in TEXT_SEARCH_MODES:
+            raise Exception("Unknown text search mode: {}".format(mode))
+        function_name = (
+            "search_fulltext_rows" if mode == "fulltext" else "search_fuzzy_rows"
+        )
+        query, row_type = self.__rows_query(
+            function_name,
+            table_name,
+            ", :column, :search_value, :page_offset, :page_size",
+        )
+        params = {
+            "column": column,
+            "search_value": str(search_value),
+            "page_offset": int(page_offset),
+            "page_size": int(page_size),
+        }
+        return self.__fetch_cached_rows(
+            "search_text", table_name, query, row_type, params
         )
 
-        with self.engine.connect() as connect:
-            found_records = connect.execute(text(query)).fetchall()
-            connect.commit()
-        return [found_record[0] for found_record in found_records]
+    def is_fuzzy_search_available(self):
+        query = "SELECT procedures.is_fuzzy_search_available()"
+        return self.__fetch_all("is_fuzzy_search_available", query)[0][0]
 
-    def init_db_for_med_user(self):
+    def init_db_for_med_user(self, partitioned=False):
+        # partitioned - секционировать записи на прием и медкнижки по месяцам дат
         if self.connection_params["user"] != "med_procedures_owner":
             raise Exception(
                 "Permission denied: user "
@@ -120,10 +763,12 @@ class DataBaseManager:
                 + " can't init database"
             )
 
-        init_db_query = "CALL init.initialize_database();"
-        with self.engine.connect() as connect:
-            connect.execute(text(init_db_query))
-            connect.commit()
+        init_db_query = "CALL init.initialize_database(:partitioned);"
+        self.__execute(
+            "init_db_for_med_user", init_db_query, {"partitioned": bool(partitioned)}
+        )
+        self.invalidate_schema_catalog()
+        self.invalidate_row_cache()
 
     def drop_database(self):
         if self.connection_params["user"] != "med_procedures_owner":
@@ -134,9 +779,8 @@ class DataBaseManager:
             )
 
         init_db_query = "CALL procedures.drop_database_schema()"
-        with self.engine.connect() as connect:
-            connect.execute(text(init_db_query))
-            connect.commit()
+        self.__execute("drop_database", init_db_query)
+        self.invalidate_schema_catalog()
 
     def is_database_initialized(self):
         if self.connection_params["user"] != "med_procedures_owner":
@@ -146,25 +790,64 @@ class DataBaseManager:
                 + " can't drop database"
             )
         query = "SELECT init.is_db_initialized()"
-        with self.engine.connect() as connect:
-            is_inited = connect.execute(text(query)).fetchall()[0][0]
-            connect.commit()
-        return is_inited
+        return self.__fetch_all("is_database_initialized", query)[0][0]
 
     def seed_data(self):
         query = "CALL procedures.seed_data();"
-        with self.engine.connect() as connect:
-            connect.execute(text(query))
-            connect.commit()
+        self.__execute("seed_data", query)
+        self.invalidate_row_cache()
+
+    def seed_scaled_data(self, scale=1, seed=0):
+        # Генерация синтетических данных на сервере (generate_series), см. generate_data.py
+        query = "CALL procedures.seed_scaled_data(:scale, :seed)"
+        self.__execute("seed_scaled_data", query, {"scale": scale, "seed": float(seed)})
+        self.invalidate_row_cache()
+
+    def mark_missed_appointments(self, batch_size=MAINTENANCE_BATCH_SIZE):
+        # Прошедшие запланированные записи -> 'пропущено' пачками по batch_size,
+        # каждая пачка в своей транзакции. Возвращает число измененных записей
+        query = "CALL procedures.mark_missed_appointments(:batch_size, NULL)"
+        updated_num = self.__call_autocommit(
+            "mark_missed_appointments", query, {"batch_size": int(batch_size)}
+        )[0][0]
+        if updated_num:
+            self.invalidate_row_cache("appointments")
+        return updated_num
+
+    def refresh_patient_ages(self):
+        # Пересчет хранимого возраста пациентов одним UPDATE (только устаревшие строки).
+        # Функции чтения считают возраст сами, хранимое значение нужно прямым запросам
+        query = "CALL procedures.refresh_patient_ages(NULL)"
+        updated_num = self.__call_autocommit("refresh_patient_ages", query)[0][0]
+        if updated_num:
+            self.invalidate_row_cache("patients")
+        return updated_num
+
+    def create_partitions_ahead(self, months_ahead=PARTITIONS_MONTHS_AHEAD):
+        # Секции на months_ahead месяцев вперед и для строк из секций по умолчанию.
+        # Для несекционированных таблиц ничего не делает
+        query = "CALL procedures.create_partitions_ahead(:months_ahead)"
+        self.__execute(
+            "create_partitions_ahead", query, {"months_ahead": int(months_ahead)}
+        )
+
+    def archive_partitions(self, older_than):
+        # Секции с датами раньше older_than отсоединяются и переносятся в схему archive.
+        # Возвращает число перенесенных секций
+        query = "CALL procedures.archive_partitions(:older_than, NULL)"
+        archived_num = self.__call_autocommit(
+            "archive_partitions", query, {"older_than": older_than}
+        )[0][0]
+        if archived_num:
+            self.invalidate_row_cache()
+        return archived_num
 
     def clear_table(self, table_name):
-        clear_table_query = "CALL procedures.clear_table('{}')".format(table_name)
-        with self.engine.connect() as connect:
-            connect.execute(text(clear_table_query))
-            connect.commit()
+        clear_table_query = "CALL procedures.clear_table(:table_name)"
+        self.__execute("clear_table", clear_table_query, {"table_name": table_name})
+        self.invalidate_row_cache(table_name)
 
     def clear_all_tables(self):
         clear_all_tables_query = "CALL procedures.clear_all_tables();"
-        with self.engine.connect() as connect:
-            connect.execute(text(clear_all_tables_query))
-            connect.commit()
+        self.__execute("clear_all_tables", clear_all_tables_query)
+        self.invalidate_row_cache()
@@ -0,0 +1,156 @@
+import argparse
+import csv
+import json
+import os
+
+from db_manager import STREAM_BATCH_SIZE, DataBaseManager
+
+# Поддерживаемые форматы выгрузки и соответствующие расширения файлов
+EXPORT_FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".parquet": "parquet",
+}
+
+# Типы столбцов PostgreSQL (format_type без размера) -> имена типов pyarrow.
+# Столбцы остальных типов выгружаются в Parquet строками
+PARQUET_TYPES = {
+    "smallint": "int16",
+    "integer": "int32",
+    "bigint": "int64",
+    "real": "float32",
+    "double precision": "float64",
+    "boolean": "bool_",
+    "date": "date32",
+    "text": "string",
+    "character varying": "string",
+    "character": "string",
+}
+
+
+def get_export_format(file_path):
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in EXPORT_FORMATS:
+        raise Exception(
+            "Unsupported export file extension: {}. Use one of: {}".format(
+                extension, ", ".join(EXPORT_FORMATS)
+            )
+        )
+    return EXPORT_FORMATS[extension]
+
+
+def iter_batches(rows, batch_size=STREAM_BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_csv(rows, output_file, columns):
+    # Строки - namedtuple в порядке столбцов таблицы; заголовок пишется всегда,
+    # как и при COPY ... WITH (HEADER), даже если строк нет
+    writer = csv.writer(output_file)
+    writer.writerow(columns)
+    writer.writerows(rows)
+
+
+def write_jsonl(rows, output_file):
+    # Даты записываются строками в формате ISO, как их выдавал row_to_json
+    for row in rows:
+        output_file.write(json.dumps(row._asdict(), ensure_ascii=False, default=str))
+        output_file.write("\n")
+
+
+def get_parquet_type_name(column_type):
+    # "character varying(255)" -> "character varying"
+    return PARQUET_TYPES.get(column_type.split("(")[0].strip())
+
+
+def columns_table(pa, batch, schema, string_columns):
+    # Пачка строк-кортежей транспонируется в столбцы без промежуточных словарей
+    columns = [list(column) for column in zip(*batch)]
+    for column_idx in string_columns:
+        columns[column_idx] = [
+            None if value is None else str(value) for value in columns[column_idx]
+        ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def write_parquet(rows, file_path, column_types):
+    # pyarrow - необязательная зависимость, нужна только для выгрузки в Parquet.
+    # column_types - словарь "столбец": "тип" из каталога схемы в порядке столбцов:
+    # по нему строится схема файла, поэтому столбец, пустой в первых строках,
+    # не меняет тип, а пустая выгрузка дает файл без строк
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise Exception("Parquet export requires pyarrow: pip install pyarrow")
+
+    fields = []
+    string_columns = []
+    for column_idx, (column, column_type) in enumerate(column_types.items()):
+        type_name = get_parquet_type_name(column_type)
+        if type_name is None:
+            string_columns.append(column_idx)
+            type_name = "string"
+        fields.append(pa.field(column, getattr(pa, type_name)()))
+    schema = pa.schema(fields)
+
+    with pq.ParquetWriter(file_path, schema) as writer:
+        for batch in iter_batches(rows):
+            writer.write_table(columns_table(pa, batch, schema, string_columns))
+
+
+def export_table(db_manager, table_name, file_path, key_col=None, key_val=None):
+    # Потоковая выгрузка таблицы (или результата поиска key_col = key_val) в файл.
+    # Формат определяется по расширению файла
+    export_format = get_export_format(file_path)
+
+    if key_col is None and export_format == "csv":
+        with open(file_path, "w", encoding="utf-8", newline="") as output_file:
+            db_manager.copy_table_to_csv(table_name, output_file)
+        return
+
+    if key_col is None:
+        rows = db_manager.iter_table_data(table_name)
+    else:
+        rows = db_manager.iter_found_records(table_name, key_col, key_val)
+    column_types = db_manager.get_schema_catalog().get_column_types(table_name)
+
+    if export_format == "parquet":
+        write_parquet(rows, file_path, column_types)
+        return
+
+    with open(file_path, "w", encoding="utf-8", newline="") as output_file:
+        if export_format == "csv":
+            write_csv(rows, output_file, list(column_types))
+        else:
+            write_jsonl(rows, output_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export a table or a search result from MedDataBase"
+    )
+    parser.add_argument("table", help="table name, e.g. patients")
+    parser.add_argument(
+        "output", help="output file (.csv, .jsonl or .parquet), format by extension"
+    )
+    parser.add_argument("--key-col", help="search column to filter exported rows")
+    parser.add_argument("--key-val", help="search value for --key-col")
+    args = parser.parse_args()
+
+    if (args.key_col is None) != (args.key_val is None):
+        parser.error("--key-col and --key-val must be used together")
+
+    db_manager = DataBaseManager("med_user")
+    export_table(db_manager, args.table, args.output, args.key_col, args.key_val)
+
+
+if __name__ == "__main__":
+    main()
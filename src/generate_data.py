@@ -0,0 +1,237 @@
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from db_manager import BULK_BATCH_SIZE, DataBaseManager
+
+# Количество строк в каждой таблице при scale = 1 (как в procedures.seed_scaled_data).
+# scale = 100 дает 1 млн пациентов и 10 млн записей на прием
+SCALE_BASE_ROWS = {
+    "clinic": 10,
+    "doctors": 200,
+    "patients": 10000,
+    "appointments": 100000,
+    "medical_records": 50000,
+}
+
+LAST_NAMES = ["Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Соколов"]
+MALE_NAMES = ["Иван", "Петр", "Алексей", "Сергей", "Андрей", "Дмитрий", "Михаил"]
+FEMALE_NAMES = ["Анна", "Мария", "Елена", "Ольга", "Татьяна", "Наталья", "Ирина"]
+PATRONYMICS = ["Иванович", "Петрович", "Алексеевич", "Сергеевич", "Андреевич"]
+SPECIALIZATIONS = ["Терапевт", "Хирург", "Кардиолог", "Невролог", "Офтальмолог"]
+STREETS = ["Ленина", "Белинского", "Горького", "Минина", "Гагарина", "Советская"]
+CONCLUSIONS = [
+    "Общее состояние хорошее. Рекомендовано продолжить лечение.",
+    "Необходима операция на коленном суставе.",
+    "Проведена успешная терапия. Пациент в стабильном состоянии.",
+    "Рекомендовано повторное обследование через месяц.",
+    "Назначен курс физиотерапии.",
+]
+
+# Записи на прием и медкнижки генерируются за 2023-2025 годы
+FIRST_RECORD_DATE = date(2023, 1, 1)
+RECORD_DAYS_NUM = 1096
+
+
+def get_rows_num(scale):
+    return {
+        table_name: max(1, round(rows_num * scale))
+        for table_name, rows_num in SCALE_BASE_ROWS.items()
+    }
+
+
+def random_phone(rnd, prefix="89"):
+    return prefix + str(rnd.randrange(10 ** (11 - len(prefix)))).zfill(11 - len(prefix))
+
+
+def random_date(rnd):
+    return FIRST_RECORD_DATE + timedelta(days=rnd.randrange(RECORD_DAYS_NUM))
+
+
+def generate_clinics(rnd, ids):
+    for idx, clinic_id in enumerate(ids, start=1):
+        yield (
+            clinic_id,
+            "Поликлиника №{}".format(idx),
+            "г. Нижний Новгород, ул. {}, д. {}".format(
+                rnd.choice(STREETS), rnd.randint(1, 150)
+            ),
+            random_phone(rnd, "831"),
+        )
+
+
+def generate_doctors(rnd, ids, clinic_ids):
+    # Доктор с номером idx работает в поликлинике с номером idx % len(clinic_ids)
+    for idx, doctor_id in enumerate(ids):
+        yield (
+            doctor_id,
+            "{} {} {}".format(
+                rnd.choice(LAST_NAMES), rnd.choice(MALE_NAMES), rnd.choice(PATRONYMICS)
+            ),
+            rnd.choice(SPECIALIZATIONS),
+            random_phone(rnd),
+            clinic_ids[idx % len(clinic_ids)],
+        )
+
+
+def generate_patients(rnd, ids):
+    for patient_id in ids:
+        if rnd.random() < 0.5:
+            full_name = "{}а {} {}на".format(
+                rnd.choice(LAST_NAMES),
+                rnd.choice(FEMALE_NAMES),
+                rnd.choice(PATRONYMICS)[:-2],
+            )
+        else:
+            full_name = "{} {} {}".format(
+                rnd.choice(LAST_NAMES), rnd.choice(MALE_NAMES), rnd.choice(PATRONYMICS)
+            )
+        yield (
+            patient_id,
+            full_name,
+            date(1940, 1, 1) + timedelta(days=rnd.randrange(30000)),
+            random_phone(rnd),
+            "{:04d} {:06d}".format(rnd.randrange(10000), rnd.randrange(1000000)),
+            "{:08d}".format(rnd.randrange(100000000)),
+        )
+
+
+def generate_appointments(rnd, rows_num, patient_ids, doctor_ids, clinic_ids):
+    # Поликлиника записи совпадает с поликлиникой доктора (см. generate_doctors)
+    today = date.today()
+    for _ in range(rows_num):
+        doctor_idx = rnd.randrange(len(doctor_ids))
+        appointment_date = random_date(rnd)
+        status_roll = rnd.random()
+        if status_roll < 0.1:
+            status = "отменено"
+        elif status_roll < 0.8 and appointment_date < today:
+            status = "завершено"
+        else:
+            status = "запланировано"
+        yield (
+            rnd.choice(patient_ids),
+            doctor_ids[doctor_idx],
+            appointment_date,
+            status,
+            clinic_ids[doctor_idx % len(clinic_ids)],
+        )
+
+
+def generate_medical_records(rnd, rows_num, patient_ids):
+    for _ in range(rows_num):
+        yield (rnd.choice(patient_ids), rnd.choice(CONCLUSIONS), random_date(rnd))
+
+
+def print_progress(table_name):
+    def progress_callback(batch_idx, inserted_rows_num):
+        print("{}: {} rows".format(table_name, inserted_rows_num))
+
+    return progress_callback
+
+
+def generate_on_client(db_manager, scale, seed, batch_size=BULK_BATCH_SIZE):
+    # Строки генерируются в Python и загружаются через COPY (DataBaseManager.bulk_add_data).
+    # id родительских строк заранее берутся из последовательностей, поэтому внешние
+    # ключи проставляются без дополнительных запросов
+    rnd = random.Random(seed)
+    rows_num = get_rows_num(scale)
+
+    clinic_ids = db_manager.reserve_ids("clinic", rows_num["clinic"])
+    doctor_ids = db_manager.reserve_ids("doctors", rows_num["doctors"])
+    patient_ids = db_manager.reserve_ids("patients", rows_num["patients"])
+
+    tables_rows = [
+        (
+            "clinic",
+            ["id", "name", "address", "phone"],
+            generate_clinics(rnd, clinic_ids),
+        ),
+        (
+            "doctors",
+            ["id", "full_name", "specialization", "contacts", "clinic_id"],
+            generate_doctors(rnd, doctor_ids, clinic_ids),
+        ),
+        (
+            "patients",
+            [
+                "id",
+                "full_name",
+                "birth_date",
+                "contacts",
+                "passport_data",
+                "insurance_policy_number",
+            ],
+            generate_patients(rnd, patient_ids),
+        ),
+        (
+            "appointments",
+            ["patient_id", "doctor_id", "appointment_date", "status", "clinic_id"],
+            generate_appointments(
+                rnd, rows_num["appointments"], patient_ids, doctor_ids, clinic_ids
+            ),
+        ),
+        (
+            "medical_records",
+            ["patient_id", "conclusion", "record_date"],
+            generate_medical_records(rnd, rows_num["medical_records"], patient_ids),
+        ),
+    ]
+    for table_name, headers, rows in tables_rows:
+        db_manager.bulk_add_data(
+            table_name,
+            headers,
+            rows,
+            batch_size=batch_size,
+            progress_callback=print_progress(table_name),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fill MedDataBase with deterministic synthetic data"
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1,
+        help="scale factor: 1 = 10k patients and 100k appointments (default 1)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=float,
+        default=0,
+        help="random seed from -1 to 1, same seed gives same data (default 0)",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["server", "client"],
+        default="server",
+        help="server: generate_series inside PostgreSQL, "
+        "client: generate in Python and load with COPY (default server)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BULK_BATCH_SIZE,
+        help="rows per COPY batch in client mode",
+    )
+    args = parser.parse_args()
+
+    if args.scale <= 0:
+        parser.error("--scale must be positive")
+    if not -1 <= args.seed <= 1:
+        parser.error("--seed must be between -1 and 1")
+
+    db_manager = DataBaseManager("med_user")
+    start_time = time.perf_counter()
+    if args.mode == "server":
+        db_manager.seed_scaled_data(args.scale, args.seed)
+    else:
+        generate_on_client(db_manager, args.scale, args.seed, args.batch_size)
+    print("Done in {:.1f} s".format(time.perf_counter() - start_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+import json
+import tkinter as tk
+from tkinter import filedialog
+from tkinter import messagebox as ms
+from tkinter import ttk
+
+from background import BackgroundExecutor, error_handler
+from change_listener import (
+    RECONNECTED_CHANNEL,
+    SCHEMA_CHANGES_CHANNEL,
+    TABLE_CHANGES_CHANNEL,
+)
+from dashboard_tab import DASHBOARD_TABLES, DashboardTab
+from db_manager import DataBaseManager
+from export import export_table
+from pages import WelcomePage
+from performance_window import PerformanceWindow
+from tab import Tab
+
+# Как часто (в мс) главный поток забирает уведомления об изменениях из слушателя
+LIVE_UPDATES_INTERVAL_MS = 200
+
+# Если в одной пачке уведомлений по таблице больше изменённых строк,
+# вкладка обновляется целиком, а не по отдельным id
+LIVE_UPDATES_MAX_IDS = 500
+
+
+class MainPage(tk.Frame):
+    def __init__(self, master):
+        super().__init__(master)
+        self.database_manager = DataBaseManager("med_user")
+
+        self.menu_bar = tk.Menu(self)
+        self.db_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.db_menu.add_command(label="Seed database", command=self.seed_database)
+        self.db_menu.add_command(
+            label="Clear all tables", command=self.clear_all_tables
+        )
+        self.db_menu.add_command(
+            label="Export current table", command=self.export_current_table
+        )
+        self.db_menu.add_command(label="Index advisor", command=self.show_index_advice)
+        self.db_menu.add_command(
+            label="Performance", command=self.show_performance_window
+        )
+        self.db_menu.add_command(
+            label="Exit to Welcome Page", command=self.exit_to_welcome_page
+        )
+        self.menu_bar.add_cascade(label="Menu", menu=self.db_menu)
+        self.master.config(menu=self.menu_bar)
+
+        # Строка состояния: индикатор фоновых запросов к БД и кнопка их отмены
+        self.status_bar = tk.Frame(self)
+        self.status_bar.pack(side="bottom", fill="x")
+        self.status_label = tk.Label(self.status_bar, text="Ready")
+        self.status_label.pack(side="left", padx=5)
+        self.cancel_button = tk.Button(
+            self.status_bar,
+            text="Cancel",
+            state="disabled",
+            command=self.cancel_background_tasks,
+        )
+        self.cancel_button.pack(side="right", padx=5, pady=2)
+        self.progress_bar = ttk.Progressbar(
+            self.status_bar, mode="indeterminate", length=150
+        )
+        self.progress_bar.pack(side="right", padx=5)
+
+        # Все запросы к БД выполняются в фоне, результаты приходят через after()
+        self.executor = BackgroundExecutor(self, on_state_change=self.update_status_bar)
+
+        # Notebook для вкладок
+        self.notebook = ttk.Notebook(self)
+        self.notebook.pack(fill="both", expand=True)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.tabs = []  # вкладки таблиц
+        self.dashboard_tab = None
+
+        self.executor.submit(
+            self.load_tables_info,
+            on_success=self.create_tabs,
+            on_error=error_handler("Loading error", "Load tables info error"),
+            cancellable=False,
+        )
+
+        # Изменения данных (в том числе от других копий приложения) приходят
+        # уведомлениями LISTEN/NOTIFY и применяются к вкладкам построчно
+        self.change_listener = self.database_manager.create_change_listener()
+        self.change_listener.start()
+        self.live_updates_job = self.after(
+            LIVE_UPDATES_INTERVAL_MS, self.apply_live_updates
+        )
+
+    def load_tables_info(self):
+        # Выполняется в фоновом потоке; заодно загружает каталог схемы, по которому
+        # потом определяются зависимые таблицы
+        return self.database_manager.get_table_titles_and_headers()
+
+    def create_tabs(self, tables_info):
+
+        # Подключение вкладок. В каждой вкладке таблица из БД и кнопки для манипуляции данными
+        # Данные загружаются только в открытую вкладку, остальные - при первом переходе
+        for table_title in tables_info:
+            new_tab = Tab(
+                self.notebook,
+                self,
+                table_title,
+                tables_info[table_title],
+                self.database_manager,
+            )
+            self.notebook.add(new_tab, text=table_title)
+            self.tabs.append(new_tab)
+
+        # Сводка по записям на прием - последней вкладкой
+        self.dashboard_tab = DashboardTab(self.notebook, self, self.database_manager)
+        self.notebook.add(self.dashboard_tab, text="dashboard")
+
+        if self.notebook.tabs():
+            self.get_current_tab().ensure_loaded()
+
+    def get_current_tab(self):
+        return self.notebook.nametowidget(self.notebook.select())
+
+    def on_tab_changed(self, event):
+        if self.notebook.select():
+            self.get_current_tab().ensure_loaded()
+
+    def is_receiving_changes(self):
+        # Пока слушатель подключен, собственные изменения приходят теми же
+        # уведомлениями, что и чужие, и применяются в apply_live_updates.
+        # Обновлять вкладки после своих изменений нужно, только если его нет
+        return self.change_listener.is_connected()
+
+    def update_all_tables(self, changed_table=None):
+        # Если известна изменённая таблица, обновляем только её и зависимые от неё
+        # (ON DELETE CASCADE / TRUNCATE CASCADE), иначе - все вкладки
+        if self.is_receiving_changes():
+            return
+        affected_tables = None
+        if changed_table is not None:
+            catalog = self.database_manager.get_schema_catalog()
+            affected_tables = catalog.get_dependent_tables(changed_table)
+
+        for tab in self.tabs:
+            if affected_tables is None or tab.table_name in affected_tables:
+                tab.update_displayed_table_data()
+        self.refresh_dashboard(affected_tables)
+
+    def update_changed_rows(self, table_name, record_ids):
+        # Изменены строки record_ids таблицы table_name: ее вкладка перечитывает
+        # только эти строки, вкладки ссылающихся таблиц (ON DELETE CASCADE) -
+        # загруженное окно целиком, так как id удаленных в них строк неизвестны
+        if self.is_receiving_changes():
+            return
+        catalog = self.database_manager.get_schema_catalog()
+        dependent_tables = catalog.get_dependent_tables(table_name)
+        for tab in self.tabs:
+            if tab.table_name == table_name:
+                tab.apply_row_changes(record_ids)
+            elif tab.table_name in dependent_tables:
+                tab.update_displayed_table_data()
+        self.refresh_dashboard(dependent_tables)
+
+    def apply_live_updates(self):
+        # Уведомления группируются по таблицам: "таблица": {id, ...},
+        # None - таблицу нужно обновить целиком (TRUNCATE, массовая загрузка,
+        # переподключение)
+        changed_tables = {}
+        for channel, payload in self.change_listener.get_notifications():
+            if channel == SCHEMA_CHANGES_CHANNEL:
+                self.database_manager.invalidate_schema_catalog()
+            elif channel == RECONNECTED_CHANNEL:
+                # Пока соединения не было, уведомления могли потеряться
+                self.database_manager.invalidate_row_cache()
+                for tab in self.tabs:
+                    changed_tables[tab.table_name] = None
+            elif channel == TABLE_CHANGES_CHANNEL:
+                change = json.loads(payload)
+                if change.get("id") is None:
+                    changed_tables[change["table"]] = None
+                    continue
+                record_ids = changed_tables.setdefault(change["table"], set())
+                if record_ids is not None:
+                    record_ids.add(change["id"])
+
+        # Кэш строк сбрасывается и по чужим изменениям, до перечитывания вкладок
+        for table_name in changed_tables:
+            self.database_manager.invalidate_row_cache(table_name)
+
+        for tab in self.tabs:
+            if tab.table_name not in changed_tables:
+                continue
+            record_ids = changed_tables[tab.table_name]
+            if record_ids is None or len(record_ids) > LIVE_UPDATES_MAX_IDS:
+                tab.update_displayed_table_data()
+            else:
+                tab.apply_row_changes(sorted(record_ids))
+        if changed_tables:
+            self.refresh_dashboard(changed_tables)
+
+        self.live_updates_job = self.after(
+            LIVE_UPDATES_INTERVAL_MS, self.apply_live_updates
+        )
+
+    def refresh_dashboard(self, changed_tables=None):
+        # Сводка перечитывается, только если изменились таблицы, из которых она строится
+        if self.dashboard_tab is None:
+            return
+        if changed_tables is None or any(
+            table_name in changed_tables for table_name in DASHBOARD_TABLES
+        ):
+            self.dashboard_tab.refresh_stats()
+
+    def update_status_bar(self, active_tasks_num, cancellable_tasks_num):
+        if active_tasks_num:
+            if self.status_label["text"] == "Ready":
+                self.progress_bar.start(10)
+            self.status_label["text"] = "Loading... ({} queries)".format(
+                active_tasks_num
+            )
+            if cancellable_tasks_num:
+                # Cancel не останавливает запрос на сервере, а только отбрасывает
+                # результат; записи и загрузка схемы не отменяются
+                self.status_label["text"] += (
+                    " Cancel drops the results of {} reads, "
+                    "running queries still finish".format(cancellable_tasks_num)
+                )
+            self.cancel_button["state"] = (
+                "normal" if cancellable_tasks_num else "disabled"
+            )
+        else:
+            self.status_label["text"] = "Ready"
+            self.cancel_button["state"] = "disabled"
+            self.progress_bar.stop()
+
+    def cancel_background_tasks(self):
+        self.executor.cancel_all()
+
+    def seed_database(self):
+        self.executor.submit(
+            self.database_manager.seed_data,
+            on_success=lambda result: self.on_tables_changed(
+                "Database seeded successully"
+            ),
+            on_error=error_handler("Seeding Error", "Seed database error"),
+            cancellable=False,
+        )
+
+    def clear_all_tables(self):
+        self.executor.submit(
+            self.database_manager.clear_all_tables,
+            on_success=lambda result: self.on_tables_changed(
+                "All tables cleared successully"
+            ),
+            on_error=error_handler("Clearing Error", "Clear database error"),
+            cancellable=False,
+        )
+
+    def on_tables_changed(self, message):
+        ms.showinfo(title="Success", message=message)
+        self.update_all_tables()
+
+    def export_current_table(self):
+        current_tab = self.get_current_tab()
+        if current_tab not in self.tabs:
+            ms.showerror(title="Export Error", message="Select a table tab to export")
+            return
+        file_path = filedialog.asksaveasfilename(
+            title="Export table",
+            initialfile=current_tab.table_name + ".csv",
+            defaultextension=".csv",
+            filetypes=[
+                ("CSV", "*.csv"),
+                ("JSON Lines", "*.jsonl"),
+                ("Parquet", "*.parquet"),
+            ],
+        )
+        if not file_path:
+            return
+
+        self.executor.submit(
+            export_table,
+            self.database_manager,
+            current_tab.table_name,
+            file_path,
+            on_success=lambda result: ms.showinfo(
+                title="Success", message="Table exported successfully"
+            ),
+            on_error=error_handler("Export Error", "Export table error"),
+            cancellable=False,
+        )
+
+    def show_index_advice(self):
+        self.executor.submit(
+            self.database_manager.suggest_indexes,
+            on_success=self.on_index_advice_loaded,
+            on_error=error_handler("Index Advisor Error", "Index statistics error"),
+        )
+
+    def on_index_advice_loaded(self, suggestions):
+        if not suggestions:
+            ms.showinfo(title="Index Advisor", message="No index suggestions")
+            return
+        ms.showinfo(title="Index Advisor", message="\n\n".join(suggestions))
+
+    def show_performance_window(self):
+        PerformanceWindow(
+            self,
+            self.database_manager.get_profiler(),
+            self.database_manager.get_row_cache(),
+        )
+
+    def exit_to_welcome_page(self):
+        self.after_cancel(self.live_updates_job)
+        self.change_listener.stop()
+        self.executor.shutdown()
+        self.menu_bar.destroy()
+        self.db_menu.destroy()
+        self.forget()
+        self.master.config(menu=None)
+        welcome_page = WelcomePage(self.master)
+        welcome_page.pack(expand=True, fill="both")
+
+    def dummy_action(self):
+        print("Clicked!")
@@ -0,0 +1,103 @@
+import argparse
+import time
+from datetime import date, datetime
+
+from db_manager import MAINTENANCE_BATCH_SIZE, PARTITIONS_MONTHS_AHEAD, DataBaseManager
+
+
+def get_month_start(months_ago):
+    # Первое число месяца, который был months_ago месяцев назад
+    today = date.today()
+    month_idx = today.year * 12 + today.month - 1 - months_ago
+    return date(month_idx // 12, month_idx % 12 + 1, 1)
+
+
+def run_maintenance(
+    db_manager,
+    batch_size=MAINTENANCE_BATCH_SIZE,
+    months_ahead=PARTITIONS_MONTHS_AHEAD,
+    archive_months=None,
+):
+    start_time = time.perf_counter()
+    updated_num = db_manager.mark_missed_appointments(batch_size)
+    refreshed_num = db_manager.refresh_patient_ages()
+    folded_num = db_manager.fold_appointment_stats()
+    db_manager.create_partitions_ahead(months_ahead)
+    archived_num = 0
+    if archive_months is not None:
+        archived_num = db_manager.archive_partitions(get_month_start(archive_months))
+    print(
+        "{} marked {} missed appointments, refreshed {} patient ages, "
+        "folded {} stats deltas, archived {} partitions in {:.2f} s".format(
+            datetime.now().isoformat(timespec="seconds"),
+            updated_num,
+            refreshed_num,
+            folded_num,
+            archived_num,
+            time.perf_counter() - start_time,
+        )
+    )
+
+
+def main():
+    # Точка входа для планировщика (cron, systemd timer): без --interval
+    # обслуживание выполняется один раз, с ним - повторяется до остановки
+    parser = argparse.ArgumentParser(
+        description="Mark past scheduled appointments of MedDataBase as missed, "
+        "refresh stored patient ages, fold dashboard stats and maintain table partitions"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=MAINTENANCE_BATCH_SIZE,
+        help="appointments updated per transaction (default {})".format(
+            MAINTENANCE_BATCH_SIZE
+        ),
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        help="repeat every INTERVAL seconds instead of running once",
+    )
+    parser.add_argument(
+        "--months-ahead",
+        type=int,
+        default=PARTITIONS_MONTHS_AHEAD,
+        help="create partitions this many months ahead (default {})".format(
+            PARTITIONS_MONTHS_AHEAD
+        ),
+    )
+    parser.add_argument(
+        "--archive-months",
+        type=int,
+        help="move partitions older than this many months to the archive schema",
+    )
+    args = parser.parse_args()
+
+    if args.batch_size < 1:
+        parser.error("--batch-size must be positive")
+    if args.interval is not None and args.interval <= 0:
+        parser.error("--interval must be positive")
+    if args.months_ahead < 0:
+        parser.error("--months-ahead must not be negative")
+    if args.archive_months is not None and args.archive_months < 1:
+        parser.error("--archive-months must be positive")
+
+    db_manager = DataBaseManager("med_user")
+    while True:
+        try:
+            run_maintenance(
+                db_manager, args.batch_size, args.months_ahead, args.archive_months
+            )
+        except Exception as e:
+            if args.interval is None:
+                raise
+            # Для повторяющегося запуска ошибка одного прохода не останавливает цикл
+            print(e)
+        if args.interval is None:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
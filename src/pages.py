@@ -1,104 +1,50 @@
 import tkinter as tk
+from pathlib import Path
 from tkinter import messagebox as ms
-from tkinter import ttk
 
-from PIL import Image, ImageTk
+# Картинки приветственной страницы и размер, до которого они уменьшаются
+WELCOME_IMAGES_DIR = Path("images")
+WELCOME_IMAGE_SIZE = (250, 250)
 
-from db_manager import DataBaseManager
-from tab import Tab
+# Уменьшенные копии картинок в PNG: их читает сам Tk, без PIL
+WELCOME_IMAGES_CACHE_DIR = WELCOME_IMAGES_DIR / "cache"
 
 
-class MainPage(tk.Frame):
-    def __init__(self, master):
-        super().__init__(master)
-        self.database_manager = DataBaseManager("med_user")
-
-        self.menu_bar = tk.Menu(self)
-        self.db_menu = tk.Menu(self.menu_bar, tearoff=0)
-        self.db_menu.add_command(label="Seed database", command=self.seed_database)
-        self.db_menu.add_command(
-            label="Clear all tables", command=self.clear_all_tables
-        )
-        self.db_menu.add_command(
-            label="Exit to Welcome Page", command=self.exit_to_welcome_page
-        )
-        self.menu_bar.add_cascade(label="Menu", menu=self.db_menu)
-        self.master.config(menu=self.menu_bar)
-
-        tables_info = self.database_manager.get_table_titles_and_headers()
-
-        # Notebook для вкладок
-        self.notebook = ttk.Notebook(self)
-        self.notebook.pack(fill="both", expand=True)
-        self.tabs = []
-
-        # Подключение вкладок. В каждой вкладке таблица из БД и кнопки для манипуляции данными
-        for table_title in tables_info:
-            table_data = self.database_manager.get_data_from_table(table_title)
-            new_tab = Tab(
-                self.notebook,
-                self,
-                table_title,
-                tables_info[table_title],
-                table_data,
-                self.database_manager,
-            )
-            self.notebook.add(new_tab, text=table_title)
-
-    def update_all_tables(self):
-        for tab_id in self.notebook.tabs():
-            tab = self.notebook.nametowidget(tab_id)
-            tab.update_displayed_table_data()
-
-    def seed_database(self):
-        try:
-            self.database_manager.seed_data()
-            ms.showinfo(title="Success", message="Database seeded successully")
-            self.update_all_tables()
-        except Exception as e:
-            ms.showerror(title="Seeding Error", message="Seed database error")
-            print(e)
-
-    def clear_all_tables(self):
-        try:
-            self.database_manager.clear_all_tables()
-            ms.showinfo(title="Success", message="All tables cleared successully")
-            self.update_all_tables()
-        except Exception as e:
-            ms.showerror(title="Clearing Error", message="Clear database error")
-            print(e)
+def load_welcome_image(file_name):
+    # Уменьшенная копия создается через PIL один раз и пересоздается, только если
+    # исходная картинка новее. PIL импортируется лишь в этом случае
+    source_path = WELCOME_IMAGES_DIR / file_name
+    cached_path = WELCOME_IMAGES_CACHE_DIR / "{}_{}x{}.png".format(
+        source_path.stem, *WELCOME_IMAGE_SIZE
+    )
+    if (
+        not cached_path.exists()
+        or cached_path.stat().st_mtime < source_path.stat().st_mtime
+    ):
+        from PIL import Image
 
-    def exit_to_welcome_page(self):
-        self.menu_bar.destroy()
-        self.db_menu.destroy()
-        self.forget()
-        self.master.config(menu=None)
-        welcome_page = WelcomePage(self.master)
-        welcome_page.pack(expand=True, fill="both")
-
-    def dummy_action(self):
-        print("Clicked!")
+        WELCOME_IMAGES_CACHE_DIR.mkdir(exist_ok=True)
+        with Image.open(source_path) as image:
+            image.resize(WELCOME_IMAGE_SIZE).save(cached_path)
+    return tk.PhotoImage(file=str(cached_path))
 
 
 class WelcomePage(tk.Frame):
     def __init__(self, master):
         super().__init__(master, background="white")
 
-        self.db_manager = DataBaseManager("med_procedures_owner")
+        # Соединение с БД (и импорт SQLAlchemy) - только при первом нажатии кнопки
+        self.db_manager = None
 
         # Загрузка изображения
-        image = Image.open("images/left.jpg")
-        image = image.resize((250, 250))  # Подгонка размера
-        self.left_img = ImageTk.PhotoImage(image)
+        self.left_img = load_welcome_image("left.jpg")
 
         # Установка изображения через Label
         left_img_label = tk.Label(self, image=self.left_img)
         left_img_label.pack(side="left", padx=50)
 
         # Загрузка изображения
-        image = Image.open("images/right.jpg")
-        image = image.resize((250, 250))  # Подгонка размера
-        self.right_img = ImageTk.PhotoImage(image)
+        self.right_img = load_welcome_image("right.jpg")
 
         # Установка изображения через Label
         right_img_label = tk.Label(self, image=self.right_img)
@@ -113,6 +59,17 @@ class WelcomePage(tk.Frame):
         )
         welcome_lb.pack(pady=(50, 20), expand=True)
 
+        # Секционирование записей на прием и медкнижек по месяцам (при инициализации)
+        self.partitioned_var = tk.BooleanVar(value=False)
+        partitioned_check = tk.Checkbutton(
+            self,
+            text="Partition appointments and medical records by month",
+            variable=self.partitioned_var,
+            font=("Arial", 12),
+            background="white",
+        )
+        partitioned_check.pack(anchor=tk.CENTER, pady=(0, 10))
+
         button_frame = tk.Frame(self, background="white")
         button_frame.pack(anchor=tk.CENTER, pady=(0, 100))
 
@@ -140,8 +97,15 @@ class WelcomePage(tk.Frame):
         )
         drop_db_btn.pack(side=tk.LEFT, padx=5)
 
+    def get_db_manager(self):
+        if self.db_manager is None:
+            from db_manager import DataBaseManager
+
+            self.db_manager = DataBaseManager("med_procedures_owner")
+        return self.db_manager
+
     def drop_database(self):
-        if not self.db_manager.is_database_initialized():
+        if not self.get_db_manager().is_database_initialized():
             ms.showerror(title="DROP", message="Database is already dropped")
             return
 
@@ -153,22 +117,24 @@ class WelcomePage(tk.Frame):
             print(e)
 
     def init_database(self):
-        if self.db_manager.is_database_initialized():
+        if self.get_db_manager().is_database_initialized():
             ms.showerror(title="INIT", message="Database is already initialized")
             return
 
         try:
-            self.db_manager.init_db_for_med_user()
+            self.db_manager.init_db_for_med_user(self.partitioned_var.get())
             ms.showinfo(title="Success", message="Database initialized successfully")
         except Exception as e:
             ms.showerror(title="INIT ERROR", message="database init error")
             print(e)
 
     def start_main_page(self):
-        if not self.db_manager.is_database_initialized():
+        if not self.get_db_manager().is_database_initialized():
             ms.showerror(title="Start Error", message="Database is not initialized")
             return
 
+        from main_page import MainPage
+
         del self.db_manager
         self.forget()
         main_page = MainPage(self.master)
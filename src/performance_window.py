@@ -0,0 +1,164 @@
+import tkinter as tk
+from tkinter import filedialog
+from tkinter import messagebox as ms
+from tkinter import ttk
+
+# Как часто (в мс) окно перечитывает статистику профилировщика
+REFRESH_INTERVAL_MS = 1000
+
+# Столбцы таблицы статистики: ключ в строке профилировщика -> заголовок
+STATS_COLUMNS = [
+    ("method", "Method"),
+    ("procedure", "Procedure"),
+    ("calls", "Calls"),
+    ("errors", "Errors"),
+    ("total_ms", "Total, ms"),
+    ("avg_ms", "Avg, ms"),
+    ("p95_ms", "p95, ms"),
+    ("max_ms", "Max, ms"),
+    ("rows", "Rows"),
+    ("bytes_sent", "Sent, KB"),
+    ("bytes_received", "Received (est.), KB"),
+]
+
+
+class PerformanceWindow(tk.Toplevel):
+    # Окно Menu -> Performance: статистика запросов к БД из профилировщика,
+    # медленные запросы с планами, попадания в кэш строк (row_cache, если включен)
+    # и выгрузка метрик в JSON / Prometheus
+    def __init__(self, master, profiler, row_cache=None):
+        super().__init__(master)
+        self.title("Performance")
+        self.geometry("1100x500")
+        self.profiler = profiler
+        self.row_cache = row_cache
+
+        self.tree = ttk.Treeview(
+            self, columns=[key for key, title in STATS_COLUMNS], show="headings"
+        )
+        for key, title in STATS_COLUMNS:
+            self.tree.heading(key, text=title)
+            self.tree.column(key, width=90, anchor="center")
+        self.tree.column("method", width=160)
+        self.tree.column("procedure", width=220)
+        self.tree.pack(fill="both", expand=True, padx=5, pady=5)
+
+        self.checkout_label = tk.Label(self, anchor="w", justify="left")
+        self.checkout_label.pack(fill="x", padx=5)
+
+        self.row_cache_label = tk.Label(self, anchor="w", justify="left")
+        self.row_cache_label.pack(fill="x", padx=5)
+
+        self.slow_queries_text = tk.Text(self, height=8, wrap="none")
+        self.slow_queries_text.pack(fill="both", padx=5, pady=5)
+
+        buttons_frame = tk.Frame(self)
+        buttons_frame.pack(fill="x", padx=5, pady=5)
+        tk.Button(buttons_frame, text="Reset", command=self.reset_stats).pack(
+            side="left", padx=5
+        )
+        tk.Button(buttons_frame, text="Export JSON", command=self.export_json).pack(
+            side="left", padx=5
+        )
+        tk.Button(
+            buttons_frame, text="Export Prometheus", command=self.export_prometheus
+        ).pack(side="left", padx=5)
+
+        self.refresh_job = None
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        for row in self.profiler.get_summary_rows():
+            self.tree.insert(
+                "",
+                "end",
+                values=[self.format_value(key, row[key]) for key, _ in STATS_COLUMNS],
+            )
+
+        stats = self.profiler.to_dict()
+        checkout_wait = stats["checkout_wait_seconds"]
+        average_wait_ms = (
+            checkout_wait["sum"] / checkout_wait["count"] * 1000
+            if checkout_wait["count"]
+            else 0
+        )
+        self.checkout_label["text"] = (
+            "Connection checkouts: {}, average wait {:.2f} ms, max wait {:.2f} ms".format(
+                checkout_wait["count"], average_wait_ms, checkout_wait["max"] * 1000
+            )
+        )
+
+        self.row_cache_label["text"] = self.format_row_cache_stats()
+
+        self.slow_queries_text.delete("1.0", "end")
+        for slow_query in reversed(stats["slow_queries"]):
+            self.slow_queries_text.insert(
+                "end",
+                "{:.1f} ms  {}: {}\n".format(
+                    slow_query["duration_seconds"] * 1000,
+                    slow_query["method"],
+                    " ".join(slow_query["statement"].split()),
+                ),
+            )
+            if slow_query["plan"]:
+                self.slow_queries_text.insert("end", slow_query["plan"] + "\n")
+
+        self.refresh_job = self.after(REFRESH_INTERVAL_MS, self.refresh)
+
+    def format_row_cache_stats(self):
+        if self.row_cache is None:
+            return "Row cache: disabled"
+        stats = self.row_cache.to_dict()
+        hit_ratio = stats["hit_ratio"]
+        return (
+            "Row cache: {entries} entries, {size_mb:.1f} of {max_size_mb:.0f} MB, "
+            "hits {hits}, misses {misses}, hit ratio {hit_ratio_text}, "
+            "evictions {evictions}, invalidations {invalidations}".format(
+                size_mb=stats["size_bytes"] / 1024 / 1024,
+                max_size_mb=stats["max_size_bytes"] / 1024 / 1024,
+                hit_ratio_text="-" if hit_ratio is None else "{:.0%}".format(hit_ratio),
+                **stats
+            )
+        )
+
+    def format_value(self, key, value):
+        if key in ("bytes_sent", "bytes_received"):
+            return "{:.1f}".format(value / 1024)
+        if isinstance(value, float):
+            return "{:.2f}".format(value)
+        return value
+
+    def reset_stats(self):
+        self.profiler.reset()
+        if self.row_cache is not None:
+            self.row_cache.reset_stats()
+
+    def export_json(self):
+        self.export_to_file(".json", "JSON", self.profiler.to_json)
+
+    def export_prometheus(self):
+        self.export_to_file(".prom", "Prometheus", self.profiler.to_prometheus)
+
+    def export_to_file(self, extension, format_name, get_content):
+        file_path = filedialog.asksaveasfilename(
+            parent=self,
+            title="Export metrics",
+            initialfile="med_db_metrics" + extension,
+            defaultextension=extension,
+            filetypes=[(format_name, "*" + extension)],
+        )
+        if not file_path:
+            return
+        try:
+            with open(file_path, "w", encoding="utf-8") as output_file:
+                output_file.write(get_content())
+        except Exception as e:
+            ms.showerror(title="Export Error", message="Export metrics error")
+            print(e)
+
+    def close(self):
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+        self.destroy()
@@ -0,0 +1,379 @@
+import json
+import re
+import threading
+import time
+from collections import deque
+
+import psycopg2.extras
+from sqlalchemy import event
+
+from row_cache import estimate_size
+
+# Верхние границы интервалов гистограммы задержек, в секундах
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Сколько последних медленных запросов хранится вместе с планом EXPLAIN ANALYZE
+SLOW_QUERIES_LIMIT = 20
+
+# Имя вызываемой функции/процедуры БД в тексте запроса, например procedures.get_page_rows
+PROCEDURE_NAME_PATTERN = re.compile(r"\b((?:procedures|init)\.\w+)")
+
+# Функции чтения строк, медленные вызовы которых можно повторить под EXPLAIN ANALYZE
+EXPLAINED_PROCEDURE_PATTERN = re.compile(r"procedures\.(?:get|search)_\w+_rows$")
+
+# Префикс имен метрик в формате Prometheus
+METRICS_PREFIX = "med_db"
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)  # последний - +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for bucket_idx, upper_bound in enumerate(LATENCY_BUCKETS):
+            if value <= upper_bound:
+                break
+        else:
+            bucket_idx = len(LATENCY_BUCKETS)
+        self.bucket_counts[bucket_idx] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, fraction):
+        # Оценка сверху: граница интервала, в который попадает квантиль
+        if not self.count:
+            return None
+        cumulative_count = 0
+        for bucket_idx, bucket_count in enumerate(self.bucket_counts):
+            cumulative_count += bucket_count
+            if cumulative_count >= fraction * self.count:
+                if bucket_idx == len(LATENCY_BUCKETS):
+                    return self.max
+                return min(LATENCY_BUCKETS[bucket_idx], self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.max,
+            "buckets": dict(
+                zip(
+                    [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"],
+                    self.bucket_counts,
+                )
+            ),
+        }
+
+
+class QueryStats:
+    def __init__(self, method, procedure):
+        self.method = method
+        self.procedure = procedure
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.rows = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def to_dict(self):
+        return {
+            "method": self.method,
+            "procedure": self.procedure,
+            "calls": self.latency.count,
+            "errors": self.errors,
+            "rows": self.rows,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency_seconds": self.latency.to_dict(),
+        }
+
+
+class QueryProfiler:
+    # Сбор статистики запросов через события SQLAlchemy: число вызовов и гистограмма
+    # задержек по паре (метод DataBaseManager, функция/процедура БД), число строк,
+    # объем отправленного текста запроса и полученных данных (JSON и строки таблиц),
+    # ожидание соединения из пула.
+    # Медленные вызовы функций чтения строк (дольше slow_query_seconds) при
+    # explain_slow_queries повторяются под EXPLAIN ANALYZE, план сохраняется вместе с запросом
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.stats = {}
+        self.checkout_wait = LatencyHistogram()
+        self.slow_queries = deque(maxlen=SLOW_QUERIES_LIMIT)
+        self.slow_query_seconds = None
+        self.explain_slow_queries = False
+        self.started_at = time.time()
+
+    def configure(self, slow_query_ms=None, explain_slow_queries=False):
+        self.slow_query_seconds = (
+            None if slow_query_ms is None else slow_query_ms / 1000
+        )
+        self.explain_slow_queries = explain_slow_queries
+
+    def attach(self, engine):
+        event.listen(engine, "before_cursor_execute", self.__before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self.__after_cursor_execute)
+        event.listen(engine, "handle_error", self.__handle_error)
+        event.listen(engine, "connect", self.__on_connect)
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+            self.checkout_wait = LatencyHistogram()
+            self.slow_queries.clear()
+            self.started_at = time.time()
+
+    def record_checkout(self, wait_seconds):
+        with self.lock:
+            self.checkout_wait.observe(wait_seconds)
+
+    def record_query(
+        self, method, procedure, duration, rows=0, bytes_sent=0, bytes_received=0
+    ):
+        # Для запросов мимо курсоров SQLAlchemy (COPY через raw_connection)
+        with self.lock:
+            stats = self.__get_stats(method, procedure)
+            stats.latency.observe(duration)
+            stats.rows += max(rows, 0)
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+
+    def get_last_query_stats(self):
+        # Статистика последнего запроса этого потока (None, если профилирование выключено)
+        return getattr(self.local, "last_stats", None)
+
+    def record_received_rows(self, rows, stats=None):
+        # Строки таблиц приходят в родных типах мимо JSON, поэтому их объем
+        # оценивается по полученным кортежам, как в кэше строк. По умолчанию
+        # объем относится к последнему запросу этого потока
+        if stats is None:
+            stats = self.get_last_query_stats()
+        if stats is None:
+            return
+        size = estimate_size(rows)
+        with self.lock:
+            stats.bytes_received += size
+
+    def __get_stats(self, method, procedure):
+        key = (method, procedure)
+        if key not in self.stats:
+            self.stats[key] = QueryStats(method, procedure)
+        return self.stats[key]
+
+    def __get_query_key(self, statement, context):
+        method = context.execution_options.get("profiler_method", "unknown")
+        match = PROCEDURE_NAME_PATTERN.search(statement)
+        if match is not None:
+            return method, match.group(1)
+        return method, statement.split(None, 1)[0].upper() if statement else "unknown"
+
+    def __on_connect(self, dbapi_connection, connection_record):
+        # Размер полученного JSON (каталог схемы, статистика индексов) считается
+        # при разборе в psycopg2, строки таблиц - в record_received_rows
+        psycopg2.extras.register_default_json(dbapi_connection, loads=self.__json_loads)
+        psycopg2.extras.register_default_jsonb(
+            dbapi_connection, loads=self.__json_loads
+        )
+
+    def __json_loads(self, value):
+        # Строки разбираются в том же потоке сразу после выполнения запроса
+        stats = getattr(self.local, "last_stats", None)
+        if stats is not None:
+            with self.lock:
+                stats.bytes_received += len(value)
+        return json.loads(value)
+
+    def __before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        context.profiler_start_time = time.perf_counter()
+
+    def __after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        duration = time.perf_counter() - context.profiler_start_time
+        method, procedure = self.__get_query_key(statement, context)
+        query = getattr(cursor, "query", None)
+
+        with self.lock:
+            stats = self.__get_stats(method, procedure)
+            stats.latency.observe(duration)
+            stats.rows += max(cursor.rowcount, 0)
+            stats.bytes_sent += len(query) if query else len(statement)
+        self.local.last_stats = stats
+
+        if self.slow_query_seconds is not None and duration >= self.slow_query_seconds:
+            self.__record_slow_query(
+                conn.engine,
+                statement,
+                parameters,
+                method,
+                procedure,
+                duration,
+                executemany,
+            )
+
+    def __handle_error(self, exception_context):
+        context = exception_context.execution_context
+        if context is None or exception_context.statement is None:
+            return
+        method, procedure = self.__get_query_key(exception_context.statement, context)
+        with self.lock:
+            self.__get_stats(method, procedure).errors += 1
+
+    def __record_slow_query(
+        self, engine, statement, parameters, method, procedure, duration, executemany
+    ):
+        slow_query = {
+            "method": method,
+            "statement": statement,
+            "parameters": None if executemany else str(parameters),
+            "duration_seconds": duration,
+            "recorded_at": time.time(),
+            "plan": None,
+        }
+        # Повторно выполняются только функции чтения строк: CALL или SELECT с nextval()
+        # изменили бы данные второй раз. План снимается на отдельном соединении
+        # из пула (мимо событий профилировщика), чтобы ошибка EXPLAIN не прервала
+        # транзакцию вызывающего
+        is_explained = EXPLAINED_PROCEDURE_PATTERN.match(procedure) is not None
+        if self.explain_slow_queries and is_explained and not executemany:
+            explain_connection = None
+            try:
+                explain_connection = engine.raw_connection()
+                with explain_connection.cursor() as explain_cursor:
+                    explain_cursor.execute(
+                        "EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters
+                    )
+                    slow_query["plan"] = "\n".join(
+                        row[0] for row in explain_cursor.fetchall()
+                    )
+            except Exception as e:
+                slow_query["plan"] = "EXPLAIN ANALYZE failed: {}".format(e)
+            finally:
+                if explain_connection is not None:
+                    explain_connection.close()
+        with self.lock:
+            self.slow_queries.append(slow_query)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "started_at": self.started_at,
+                "queries": [stats.to_dict() for stats in self.stats.values()],
+                "checkout_wait_seconds": self.checkout_wait.to_dict(),
+                "slow_queries": list(self.slow_queries),
+            }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    def get_summary_rows(self):
+        # Строки для окна Performance, самые затратные по суммарному времени - первые
+        with self.lock:
+            stats_list = sorted(
+                self.stats.values(), key=lambda stats: stats.latency.total, reverse=True
+            )
+            return [
+                {
+                    "method": stats.method,
+                    "procedure": stats.procedure,
+                    "calls": stats.latency.count,
+                    "errors": stats.errors,
+                    "total_ms": stats.latency.total * 1000,
+                    "avg_ms": (
+                        stats.latency.total / stats.latency.count * 1000
+                        if stats.latency.count
+                        else 0
+                    ),
+                    "p95_ms": (stats.latency.quantile(0.95) or 0) * 1000,
+                    "max_ms": stats.latency.max * 1000,
+                    "rows": stats.rows,
+                    "bytes_sent": stats.bytes_sent,
+                    "bytes_received": stats.bytes_received,
+                }
+                for stats in stats_list
+            ]
+
+    def to_prometheus(self):
+        # Текстовый формат экспозиции Prometheus
+        lines = []
+
+        def add_histogram(name, help_text, histograms):
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} histogram".format(name))
+            for labels, histogram in histograms:
+                cumulative_count = 0
+                bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+                for bound, bucket_count in zip(bounds, histogram.bucket_counts):
+                    cumulative_count += bucket_count
+                    lines.append(
+                        '{}_bucket{{{}le="{}"}} {}'.format(
+                            name, labels, bound, cumulative_count
+                        )
+                    )
+                labels = "{" + labels.rstrip(",") + "}" if labels else ""
+                lines.append("{}_sum{} {}".format(name, labels, histogram.total))
+                lines.append("{}_count{} {}".format(name, labels, histogram.count))
+
+        def add_counter(name, help_text, values):
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} counter".format(name))
+            for labels, value in values:
+                lines.append("{}{{{}}} {}".format(name, labels.rstrip(","), value))
+
+        with self.lock:
+            labeled_stats = [
+                (
+                    'method="{}",procedure="{}",'.format(
+                        escape_label(stats.method), escape_label(stats.procedure)
+                    ),
+                    stats,
+                )
+                for stats in self.stats.values()
+            ]
+            add_histogram(
+                METRICS_PREFIX + "_query_duration_seconds",
+                "Database query latency",
+                [(labels, stats.latency) for labels, stats in labeled_stats],
+            )
+            add_counter(
+                METRICS_PREFIX + "_query_errors_total",
+                "Failed database queries",
+                [(labels, stats.errors) for labels, stats in labeled_stats],
+            )
+            add_counter(
+                METRICS_PREFIX + "_query_rows_total",
+                "Rows returned or affected by database queries",
+                [(labels, stats.rows) for labels, stats in labeled_stats],
+            )
+            add_counter(
+                METRICS_PREFIX + "_query_sent_bytes_total",
+                "Bytes of query text sent to the server",
+                [(labels, stats.bytes_sent) for labels, stats in labeled_stats],
+            )
+            add_counter(
+                METRICS_PREFIX + "_query_received_bytes_total",
+                "Bytes of JSON and estimated bytes of table rows received from the server",
+                [(labels, stats.bytes_received) for labels, stats in labeled_stats],
+            )
+            add_histogram(
+                METRICS_PREFIX + "_pool_checkout_wait_seconds",
+                "Time spent waiting for a pooled connection",
+                [("", self.checkout_wait)],
+            )
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Профилировщик общий на весь процесс, как и движки SQLAlchemy
+profiler = QueryProfiler()
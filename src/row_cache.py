@@ -0,0 +1,105 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+def estimate_size(rows):
+    # Приблизительный объем списка строк-кортежей в памяти, в байтах
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(map(sys.getsizeof, row))
+    return size
+
+
+class RowCache:
+    # Кэш результатов чтения строк таблиц с вытеснением давно не использованных
+    # записей (LRU), когда суммарный объем превышает max_size_bytes.
+    # Ключ - текст запроса и параметры; каждая запись привязана к таблице, по которой
+    # ее сбрасывают после изменений. Номер поколения таблицы не дает сохранить
+    # результат чтения, которое началось до сброса, а закончилось после него
+    def __init__(self, max_size_bytes):
+        self.lock = threading.Lock()
+        self.max_size_bytes = max_size_bytes
+        self.entries = OrderedDict()  # ключ -> (таблица, строки, размер)
+        self.table_keys = {}
+        self.generations = {}
+        self.clear_generation = 0
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def get_generation(self, table_name):
+        with self.lock:
+            return self.clear_generation, self.generations.get(table_name, 0)
+
+    def put(self, table_name, key, rows, generation):
+        size = estimate_size(rows)
+        if size > self.max_size_bytes:
+            return
+        with self.lock:
+            if generation != (
+                self.clear_generation,
+                self.generations.get(table_name, 0),
+            ):
+                return
+            if key in self.entries:
+                self.__remove(key)
+            self.entries[key] = (table_name, rows, size)
+            self.table_keys.setdefault(table_name, set()).add(key)
+            self.size_bytes += size
+            while self.size_bytes > self.max_size_bytes:
+                self.__remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, table_names):
+        with self.lock:
+            for table_name in table_names:
+                self.generations[table_name] = self.generations.get(table_name, 0) + 1
+                for key in self.table_keys.pop(table_name, ()):
+                    self.__remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.clear_generation += 1
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.table_keys.clear()
+            self.size_bytes = 0
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def __remove(self, key):
+        table_name, rows, size = self.entries.pop(key)
+        self.size_bytes -= size
+        table_keys = self.table_keys.get(table_name)
+        if table_keys is not None:
+            table_keys.discard(key)
+
+    def to_dict(self):
+        with self.lock:
+            requests_num = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "size_bytes": self.size_bytes,
+                "max_size_bytes": self.max_size_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / requests_num if requests_num else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
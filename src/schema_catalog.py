@@ -0,0 +1,98 @@
+import time
+from collections import namedtuple
+
+# Как часто (в секундах) закэшированный каталог сверяет номер версии схемы с сервером
+VERSION_CHECK_INTERVAL = 30
+
+
+class SchemaCatalog:
+    # Структура схемы tables, загруженная из pg_catalog одним запросом
+    # (procedures.get_schema_catalog): столбцы с типами, первичные и внешние ключи
+    def __init__(self, catalog):
+        self.version = catalog["version"]
+        self.tables = catalog["tables"]
+        self.checked_at = time.monotonic()
+        self.row_types = {}
+
+    def is_version_check_due(self):
+        return time.monotonic() - self.checked_at >= VERSION_CHECK_INTERVAL
+
+    def mark_version_checked(self):
+        self.checked_at = time.monotonic()
+
+    def get_table_names(self):
+        # Таблицы упорядочены по имени (ORDER BY relname на сервере)
+        return list(self.tables)
+
+    def has_table(self, table_name):
+        return table_name in self.tables
+
+    def get_table(self, table_name):
+        if table_name not in self.tables:
+            raise Exception("Table tables.{} does not exist".format(table_name))
+        return self.tables[table_name]
+
+    def get_columns(self, table_name):
+        return [column["name"] for column in self.get_table(table_name)["columns"]]
+
+    def get_column_types(self, table_name):
+        # Словарь "столбец": "тип" (как в format_type, например character varying(255))
+        return {
+            column["name"]: column["type"]
+            for column in self.get_table(table_name)["columns"]
+        }
+
+    def get_row_type(self, table_name):
+        # Класс строки таблицы (namedtuple) со столбцами в объявленном порядке:
+        # создается один раз на таблицу и живет, пока не сменится версия схемы
+        if table_name not in self.row_types:
+            self.row_types[table_name] = namedtuple(
+                table_name, self.get_columns(table_name), rename=True
+            )
+        return self.row_types[table_name]
+
+    def get_primary_key(self, table_name):
+        return self.get_table(table_name)["primary_key"]
+
+    def get_foreign_keys(self, table_name):
+        return self.get_table(table_name)["foreign_keys"]
+
+    def get_headers(self):
+        # Словарь "название_таблицы": ["заголовок1", "заголовок2", ...]
+        return {table_name: self.get_columns(table_name) for table_name in self.tables}
+
+    def get_references(self):
+        # Словарь "таблица": ["ссылающаяся_таблица1", ...]
+        references = {}
+        for table_name in self.tables:
+            for foreign_key in self.get_foreign_keys(table_name):
+                referencing_tables = references.setdefault(
+                    foreign_key["references_table"], []
+                )
+                if table_name not in referencing_tables:
+                    referencing_tables.append(table_name)
+        return references
+
+    def get_dependent_tables(self, table_name):
+        # Таблица и все таблицы, которые прямо или через другие ссылаются на нее
+        references = self.get_references()
+        dependent_tables = {table_name}
+        tables_to_visit = [table_name]
+        while tables_to_visit:
+            current_table = tables_to_visit.pop()
+            for referencing_table in references.get(current_table, []):
+                if referencing_table not in dependent_tables:
+                    dependent_tables.add(referencing_table)
+                    tables_to_visit.append(referencing_table)
+        return dependent_tables
+
+    def check_columns(self, table_name, columns):
+        unknown_columns = [
+            column for column in columns if column not in self.get_columns(table_name)
+        ]
+        if unknown_columns:
+            raise Exception(
+                "Unknown columns in table tables.{}: {}".format(
+                    table_name, ", ".join(unknown_columns)
+                )
+            )
@@ -1,31 +1,83 @@
+import heapq
 import tkinter as tk
 import tkinter.messagebox as ms
+from bisect import bisect_left
 from tkinter import font as tkfont
 from tkinter import ttk
 
+from background import error_handler
+from db_manager import PAGE_SIZE
+
+# Доля прокрутки, после которой подгружается следующая страница данных
+SCROLL_LOAD_THRESHOLD = 0.9
+
+# Если найденная запись дальше этого числа id от загруженного окна строк,
+# окно переносится к ней, а промежуток не загружается
+MAX_LOAD_GAP_IDS = 5 * PAGE_SIZE
+
+# Режимы поиска в окне Find: подпись в меню -> режим DataBaseManager.find_record
+SEARCH_MODE_LABELS = [("=", "eq"), ("between", "range"), ("prefix", "prefix")]
+
+# Режимы поиска по тексту (DataBaseManager.search_text): результаты по убыванию
+# релевантности, без объединения с условиями AND
+TEXT_SEARCH_MODE_LABELS = [("text", "fulltext"), ("similar", "fuzzy")]
+
+# Сколько самых длинных (по числу символов) значений столбца измеряется шрифтом
+AUTOSIZE_MEASURED_VALUES = 5
+
+# Добавочный отступ к ширине столбца для эстетики
+COLUMN_PADDING = 10
+
 
 class Tab(ttk.Frame):
-    def __init__(
-        self, master, notebook, table_name, table_columns, table_data, db_manager
-    ):
+    def __init__(self, master, notebook, table_name, table_columns, db_manager):
         super().__init__(master)
         self.notebook = notebook
         self.table_name = table_name
         self.table_columns = table_columns
-        self.table_data = table_data
+        self.table_data = {}  # id записи -> строка, загруженная в Treeview
+        self.loaded_ids = []  # id загруженных строк по возрастанию, как в Treeview
+        # Загруженное окно строк: id от first_loaded_id (0 - с начала таблицы)
+        # до last_loaded_id включительно, без пропусков
+        self.first_loaded_id = 0
+        self.last_loaded_id = 0
+        self.window_generation = 0  # растет при переносе окна к найденной записи
+        self.is_loaded = False  # первая страница запрошена (вкладку уже открывали)
+        self.is_fully_loaded = False
+        self.page_task = None  # фоновая загрузка очередной страницы
+        self.prev_page_task = None  # фоновая загрузка страницы перед окном
+        self.tree_font = None
+        self.column_widths = {}  # столбец -> измеренная ширина содержимого
         self.db_manager = db_manager
+        self.executor = notebook.executor
         self.currentHighlightedRecordID = -1
         self.found_records = []
+        # Поиск по тексту, у которого могут быть еще страницы результатов:
+        # (столбец, значение, режим) или None
+        self.text_search = None
+        self.found_page_task = None  # фоновая загрузка следующей страницы найденных
+        self.is_fuzzy_search_available = None  # неизвестно, пока не проверено
         self.setup_ui()
 
     def setup_ui(self):
-        # Таблица
-        self.tree = ttk.Treeview(self, columns=self.table_columns, show="headings")
+        # Таблица с вертикальной прокруткой
+        tree_frame = tk.Frame(self)
+        tree_frame.pack(fill="both", expand=True, padx=5, pady=5)
+
+        self.tree = ttk.Treeview(
+            tree_frame, columns=self.table_columns, show="headings"
+        )
         for table_column in self.table_columns:
             self.tree.heading(table_column, text=table_column.upper())
             self.tree.column(table_column, anchor="center")
+        self.reset_column_widths()
 
-        self.display_table_data()
+        self.scrollbar = ttk.Scrollbar(
+            tree_frame, orient="vertical", command=self.tree.yview
+        )
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
 
         # Панель с кнопками
         buttons_frame = tk.Frame(self)
@@ -52,40 +104,336 @@ class Tab(ttk.Frame):
         find_button.pack(side="left", padx=5)
         clear_table_button.pack(side="left", padx=5)
 
-    def autosize_table_columns(self):
-        style = ttk.Style()
-        tree_style = style.lookup("Treeview", "font")  # Шрифт используемый в Treeview
-        tree_font = tkfont.Font(name=tree_style, exists=True)
-        padding = 10  # Добавочный отступ для эстетики
+    def get_tree_font(self):
+        if self.tree_font is None:
+            style = ttk.Style()
+            tree_style = style.lookup(
+                "Treeview", "font"
+            )  # Шрифт используемый в Treeview
+            self.tree_font = tkfont.Font(name=tree_style, exists=True)
+        return self.tree_font
+
+    def reset_column_widths(self):
+        # Ширина столбцов по заголовкам (при создании вкладки и после очистки таблицы)
+        tree_font = self.get_tree_font()
+        for col in self.table_columns:
+            self.column_widths[col] = tree_font.measure(col.upper())
+            self.tree.column(col, width=self.column_widths[col] + COLUMN_PADDING)
+
+    def autosize_table_columns(self, rows):
+        # Измеряются только новые и измененные строки rows, и в каждом столбце - лишь
+        # несколько самых длинных по числу символов значений: measure - это запрос к Tcl.
+        # Ширина столбцов только растет, ранее измеренные значения берутся из кэша
+        tree_font = self.get_tree_font()
+
+        # Строки - кортежи в порядке столбцов таблицы, столбец берется по индексу
+        for col_idx, col in enumerate(self.table_columns):
+            longest_values = heapq.nlargest(
+                AUTOSIZE_MEASURED_VALUES, {str(row[col_idx]) for row in rows}, key=len
+            )
+            max_width = max(
+                [self.column_widths[col]]
+                + [tree_font.measure(cell_value) for cell_value in longest_values]
+            )
+
+            # Установка ширины столбца, только если она изменилась
+            if max_width != self.column_widths[col]:
+                self.column_widths[col] = max_width
+                self.tree.column(col, width=max_width + COLUMN_PADDING)
+
+    def display_table_data(self, rows):
+        # iid элемента Treeview совпадает с id записи; строка-кортеж уже
+        # в порядке столбцов и передается в Treeview как есть
+        for row in rows:
+            self.tree.insert("", "end", iid=str(row.id), values=row)
+        self.autosize_table_columns(rows)
+
+    def on_tree_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        # Пользователь долистал почти до конца загруженных строк - подгружаем ещё
+        if float(last) >= SCROLL_LOAD_THRESHOLD:
+            self.load_next_page()
+        # Окно перенесено к найденной записи и пользователь долистал почти до его начала
+        if float(first) <= 1 - SCROLL_LOAD_THRESHOLD:
+            self.load_prev_page()
+
+    def ensure_loaded(self):
+        # Данные вкладки загружаются при первом показе вкладки, а не при создании
+        if self.is_loaded:
+            return
+        self.is_loaded = True
+        self.load_next_page()
+
+    def load_next_page(self):
+        if not self.is_loaded or self.is_fully_loaded:
+            return
+        if self.page_task is not None and self.page_task.is_active():
+            return
+
+        self.page_task = self.executor.submit(
+            self.db_manager.get_data_page,
+            self.table_name,
+            self.last_loaded_id,
+            PAGE_SIZE,
+            on_success=self.on_page_loaded,
+            on_error=error_handler("Loading error", "Load table data error"),
+        )
+
+    def on_page_loaded(self, page):
+        if len(page) < PAGE_SIZE:
+            self.is_fully_loaded = True
+        self.append_loaded_rows(page)
+
+    def append_loaded_rows(self, rows):
+        # Пока шел запрос, часть строк могла быть загружена другим запросом
+        rows = [row for row in rows if row.id > self.last_loaded_id]
+        if not rows:
+            return
 
-        for col_index, col in enumerate(self.table_columns):
-            # Получение максимальной ширины заголовка
-            max_width = tree_font.measure(col.upper())
+        self.last_loaded_id = rows[-1].id
+        self.table_data.update((row.id, row) for row in rows)
+        self.loaded_ids.extend(row.id for row in rows)
+        self.display_table_data(rows)
+
+    def load_prev_page(self):
+        if not self.is_loaded or not self.first_loaded_id:
+            return
+        if self.prev_page_task is not None and self.prev_page_task.is_active():
+            return
+
+        self.prev_page_task = self.executor.submit(
+            self.db_manager.get_data_page_before,
+            self.table_name,
+            self.first_loaded_id,
+            PAGE_SIZE,
+            on_success=self.on_prev_page_loaded,
+            on_error=error_handler("Loading error", "Load table data error"),
+        )
+
+    def on_prev_page_loaded(self, page):
+        prepended_rows_num = self.prepend_loaded_rows(page)
+        if len(page) < PAGE_SIZE:
+            self.first_loaded_id = 0
+        # Строки вставлены над видимыми - прокручиваем на их число, чтобы
+        # видимые строки остались на месте
+        if prepended_rows_num:
+            self.tree.yview_scroll(prepended_rows_num, "units")
+
+    def prepend_loaded_rows(self, rows):
+        # Возвращает число строк, вставленных в начало Treeview
+        rows = [row for row in rows if row.id < self.first_loaded_id]
+        if not rows:
+            return 0
+
+        self.first_loaded_id = rows[0].id
+        self.table_data.update((row.id, row) for row in rows)
+        self.loaded_ids[:0] = [row.id for row in rows]
+        for position, row in enumerate(rows):
+            self.tree.insert("", position, iid=str(row.id), values=row)
+        self.autosize_table_columns(rows)
+        return len(rows)
+
+    def is_in_window(self, record_id):
+        return self.first_loaded_id <= record_id <= self.last_loaded_id
+
+    def load_rows_up_to(self, record_id, on_loaded):
+        # Догружаем строки между окном и record_id, если их немного (строки
+        # упорядочены по id, хватает одного запроса), иначе переносим окно к записи
+        if self.is_in_window(record_id) or (
+            self.is_fully_loaded and record_id > self.last_loaded_id
+        ):
+            on_loaded()
+            return
 
-            # Получение максимальной ширины содержимого столбца
-            for row in self.table_data:
-                cell_value = str(row[col])  # Конвертация значения в строку
-                cell_width = tree_font.measure(cell_value)
-                max_width = max(max_width, cell_width)
+        if record_id > self.last_loaded_id:
+            if record_id - self.last_loaded_id > MAX_LOAD_GAP_IDS:
+                self.move_window_to(record_id, on_loaded)
+                return
+            first_id, last_id = self.last_loaded_id, record_id
+        else:
+            if self.first_loaded_id - record_id > MAX_LOAD_GAP_IDS:
+                self.move_window_to(record_id, on_loaded)
+                return
+            first_id, last_id = record_id - 1, self.first_loaded_id - 1
+
+        window_generation = self.window_generation
+        self.executor.submit(
+            self.db_manager.get_data_range,
+            self.table_name,
+            first_id,
+            last_id,
+            on_success=lambda rows: self.on_rows_up_to_loaded(
+                window_generation, record_id, rows, on_loaded
+            ),
+            on_error=error_handler("Loading error", "Load table data error"),
+        )
 
-            # Установка ширины столбца
-            self.tree.column(col, width=max_width + padding)
+    def on_rows_up_to_loaded(self, window_generation, record_id, rows, on_loaded):
+        if window_generation != self.window_generation:
+            return
+        if record_id > self.last_loaded_id:
+            self.append_loaded_rows(rows)
+            self.last_loaded_id = max(self.last_loaded_id, record_id)
+        else:
+            self.prepend_loaded_rows(rows)
+            self.first_loaded_id = min(self.first_loaded_id, record_id)
+        on_loaded()
+
+    def move_window_to(self, record_id, on_loaded):
+        # Окно заменяется страницей строк, которая заканчивается на record_id;
+        # строки ниже и выше подгружаются прокруткой
+        self.window_generation += 1
+        window_generation = self.window_generation
+        for task in (self.page_task, self.prev_page_task):
+            if task is not None and task.is_active():
+                self.executor.cancel(task)
+        self.executor.submit(
+            self.db_manager.get_data_page_before,
+            self.table_name,
+            record_id + 1,
+            PAGE_SIZE // 2,
+            on_success=lambda rows: self.on_window_moved(
+                window_generation, record_id, rows, on_loaded
+            ),
+            on_error=error_handler("Loading error", "Load table data error"),
+        )
 
-    def display_table_data(self):
-        for row in self.table_data:
-            data = [row[key] for key in row.keys()]
-            self.tree.insert("", "end", values=data)
-        self.tree.pack(fill="both", expand=True, padx=5, pady=5)
-        self.autosize_table_columns()
+    def on_window_moved(self, window_generation, record_id, rows, on_loaded):
+        if window_generation != self.window_generation:
+            return
+        self.tree.delete(*self.tree.get_children())
+        self.table_data = {row.id: row for row in rows}
+        self.loaded_ids = [row.id for row in rows]
+        self.first_loaded_id = rows[0].id if len(rows) == PAGE_SIZE // 2 else 0
+        self.last_loaded_id = record_id
+        self.is_fully_loaded = False
+        self.display_table_data(rows)
+        on_loaded()
+        self.load_next_page()
 
     def update_displayed_table_data(self):
-        # Очистка Treeview
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        # Сверяем загруженное окно строк с БД по id и применяем к Treeview только изменения.
+        # Еще не открытая вкладка получит свежие данные при первом показе
+        if not self.is_loaded:
+            return
+        window_first_id = self.first_loaded_id
+        window_last_id = self.last_loaded_id
+        window_generation = self.window_generation
+        if not window_last_id:
+            self.apply_table_changes(
+                window_generation, window_first_id, window_last_id, []
+            )
+            return
+
+        self.executor.submit(
+            self.db_manager.get_data_range,
+            self.table_name,
+            max(window_first_id - 1, 0),
+            window_last_id,
+            on_success=lambda rows: self.apply_table_changes(
+                window_generation, window_first_id, window_last_id, rows
+            ),
+            on_error=error_handler("Loading error", "Refresh table data error"),
+        )
 
-        # Обновление данных
-        self.table_data = self.db_manager.get_data_from_table(self.table_name)
-        self.display_table_data()
+    def apply_table_changes(
+        self, window_generation, window_first_id, window_last_id, fresh_rows
+    ):
+        if window_generation != self.window_generation:
+            return
+        fresh_data = {row.id: row for row in fresh_rows}
+
+        # Строки за пределами окна могли догрузиться, пока шел запрос - их не трогаем
+        deleted_ids = [
+            record_id
+            for record_id in self.table_data
+            if window_first_id <= record_id <= window_last_id
+            and record_id not in fresh_data
+        ]
+        for record_id in deleted_ids:
+            self.remove_loaded_row(record_id)
+
+        changed_rows = [
+            row for row in fresh_data.values() if self.upsert_loaded_row(row)
+        ]
+        self.on_loaded_rows_changed(changed_rows)
+
+        # Новые строки за пределами загруженного окна
+        self.load_new_rows()
+
+    def load_new_rows(self):
+        # Строки с id больше загруженных догружаются, только если окно доходило
+        # до конца таблицы; иначе они придут со следующей страницей при прокрутке
+        if self.is_fully_loaded:
+            self.is_fully_loaded = False
+            self.load_next_page()
+
+    def apply_row_changes(self, record_ids):
+        # Изменения строк record_ids пришли уведомлением от сервера (в том числе
+        # от других клиентов): перечитываем только эти строки
+        if not self.is_loaded:
+            return
+        self.executor.submit(
+            self.db_manager.get_data_by_ids,
+            self.table_name,
+            record_ids,
+            on_success=lambda rows: self.on_changed_rows_loaded(record_ids, rows),
+            on_error=error_handler("Loading error", "Refresh table data error"),
+        )
+
+    def on_changed_rows_loaded(self, record_ids, rows):
+        fresh_data = {row.id: row for row in rows}
+
+        changed_rows = []
+        has_rows_after_window = False
+        for record_id in record_ids:
+            row = fresh_data.get(record_id)
+            if row is None:
+                # Строка удалена
+                if record_id in self.table_data:
+                    self.remove_loaded_row(record_id)
+            elif record_id > self.last_loaded_id:
+                # Строка еще не загружена - придет со следующей страницей
+                has_rows_after_window = True
+            elif record_id < self.first_loaded_id:
+                # Строка выше перенесенного окна - придет при прокрутке вверх
+                continue
+            elif self.upsert_loaded_row(row):
+                changed_rows.append(row)
+        self.on_loaded_rows_changed(changed_rows)
+
+        if has_rows_after_window:
+            self.load_new_rows()
+
+    def upsert_loaded_row(self, row):
+        # Возвращает True, если строка добавлена в Treeview или изменилась
+        record_id = row.id
+        old_row = self.table_data.get(record_id)
+        if old_row == row:
+            return False
+        if old_row is None:
+            self.insert_tree_row(row)
+        else:
+            self.tree.item(str(record_id), values=row)
+        self.table_data[record_id] = row
+        return True
+
+    def remove_loaded_row(self, record_id):
+        self.tree.delete(str(record_id))
+        del self.table_data[record_id]
+        del self.loaded_ids[bisect_left(self.loaded_ids, record_id)]
+
+    def on_loaded_rows_changed(self, changed_rows):
+        if not self.table_data:
+            self.reset_column_widths()
+        elif changed_rows:
+            self.autosize_table_columns(changed_rows)
+
+    def insert_tree_row(self, row):
+        # Вставка строки внутрь уже загруженного окна с сохранением порядка по id
+        position = bisect_left(self.loaded_ids, row.id)
+        self.loaded_ids.insert(position, row.id)
+        self.tree.insert("", position, iid=str(row.id), values=row)
 
     def add_table_data(self):
         input_table_win = tk.Toplevel(self)
@@ -129,15 +477,26 @@ class Tab(ttk.Frame):
         save_button.grid(row=2, column=0, columnspan=len(self.table_columns), pady=10)
 
     def save_added_table_data(self, headers, entries):
-        try:
-            self.db_manager.add_data(
-                self.table_name, headers, [e.get() for e in entries.values()]
-            )
-            ms.showinfo(title="Saved", message="Data saved successfully")
-            self.update_displayed_table_data()
-        except Exception as e:
-            ms.showerror(title="Saving data error", message="Check input data")
-            print(e)
+        self.executor.submit(
+            self.db_manager.add_data,
+            self.table_name,
+            headers,
+            [e.get() for e in entries.values()],
+            on_success=self.on_data_added,
+            on_error=error_handler("Saving data error", "Check input data"),
+            cancellable=False,
+        )
+
+    def on_data_added(self, result=None):
+        ms.showinfo(title="Saved", message="Data saved successfully")
+        # У новой записи id больше всех загруженных
+        if not self.notebook.is_receiving_changes():
+            self.load_new_rows()
+
+    def on_record_saved(self, record_id):
+        ms.showinfo(title="Saved", message="Data saved successfully")
+        if not self.notebook.is_receiving_changes():
+            self.apply_row_changes([record_id])
 
     def edit_table_cortege(self):
 
@@ -196,17 +555,23 @@ class Tab(ttk.Frame):
         save_button.grid(row=2, column=0, columnspan=len(self.table_columns), pady=10)
 
     def save_edited_cortege(self, cortege_id, entries, default_entries):
-        try:
-            for header in entries.keys():
-                if entries[header].get() != default_entries[header]:
-                    self.db_manager.update_record(
-                        self.table_name, header, entries[header].get(), "id", cortege_id
-                    )
-            ms.showinfo(title="Saved", message="Data saved successfully")
-            self.update_displayed_table_data()
-        except Exception as e:
-            ms.showerror(title="Saving data error", message="Check input data")
-            print(e)
+        # Значения виджетов читаются в главном потоке, запросы идут в фоновом
+        changed_values = {
+            header: entries[header].get()
+            for header in entries.keys()
+            if entries[header].get() != default_entries[header]
+        }
+        # Все измененные столбцы сохраняются одним UPDATE в одной транзакции
+        self.executor.submit(
+            self.db_manager.update_record_fields,
+            self.table_name,
+            changed_values,
+            "id",
+            cortege_id,
+            on_success=lambda result: self.on_record_saved(int(cortege_id)),
+            on_error=error_handler("Saving data error", "Check input data"),
+            cancellable=False,
+        )
 
     def delete_record(self):
         selected_cortege = self.tree.selection()
@@ -222,12 +587,17 @@ class Tab(ttk.Frame):
         ):
             return
 
-        try:
-            self.db_manager.delete_record(self.table_name, "id", selected_cortege[0])
-            self.notebook.update_all_tables()
-        except Exception as e:
-            ms.showerror(title="Error", message="Delete error")
-            print(e)
+        self.executor.submit(
+            self.db_manager.delete_record,
+            self.table_name,
+            "id",
+            selected_cortege[0],
+            on_success=lambda result: self.notebook.update_changed_rows(
+                self.table_name, [int(selected_cortege[0])]
+            ),
+            on_error=error_handler("Error", "Delete error"),
+            cancellable=False,
+        )
 
     def find_cortege_window(self):
         input_win = tk.Toplevel(self)
@@ -237,10 +607,10 @@ class Tab(ttk.Frame):
             "WM_DELETE_WINDOW", lambda: self.destroy_search_top_win(input_win)
         )
 
-        # Настройка сетки 4 х 2 для виджетов
-        for i in range(2):
-            input_win.grid_columnconfigure(i, weight=1)
+        # Настройка сетки 6 х 4 для виджетов
         for i in range(4):
+            input_win.grid_columnconfigure(i, weight=1)
+        for i in range(6):
             input_win.grid_rowconfigure(i, weight=1)
 
         # Кнопки для подсвечивания предыдущей / следующей найденной записи
@@ -256,25 +626,32 @@ class Tab(ttk.Frame):
             ),
         }
 
-        next_prev_btns["prev"].grid(row=2, column=0, padx=5, pady=5, sticky="nsew")
-        next_prev_btns["next"].grid(row=2, column=1, padx=5, pady=5, sticky="nsew")
-
-        # Лейбл для столбца, по которому ищем
-        key_column_label = tk.Label(input_win, text="Search column:")
-        key_column_label.grid(row=0, column=0, padx=5, pady=5, sticky="nsew")
+        next_prev_btns["prev"].grid(
+            row=4, column=0, columnspan=2, padx=5, pady=5, sticky="nsew"
+        )
+        next_prev_btns["next"].grid(
+            row=4, column=2, columnspan=2, padx=5, pady=5, sticky="nsew"
+        )
 
-        # Лейбл для значения, которое ищем
-        key_value_label = tk.Label(input_win, text="Search value:")
-        key_value_label.grid(row=0, column=1, padx=5, pady=5, sticky="nsew")
+        # Лейблы для столбца, режима поиска и значений
+        for col_idx, label_text in enumerate(
+            ["Search column:", "Mode:", "Search value:", "To (between):"]
+        ):
+            label = tk.Label(input_win, text=label_text)
+            label.grid(row=0, column=col_idx, padx=5, pady=5, sticky="nsew")
 
         # Поле для ввода поискового значения
         key_value_entry = tk.Entry(input_win, width=15, justify="center")
-        key_value_entry.grid(row=1, column=1, padx=5, pady=5, sticky="nsew")
+        key_value_entry.grid(row=1, column=2, padx=5, pady=5, sticky="nsew")
         key_val_widget_container = {
             "widget": key_value_entry,
             "value_container": key_value_entry,
         }
 
+        # Поле для верхней границы диапазона
+        key_value_to_entry = tk.Entry(input_win, width=15, justify="center")
+        key_value_to_entry.grid(row=1, column=3, padx=5, pady=5, sticky="nsew")
+
         # Меню выбора ключевого столбца
         key_column = tk.StringVar(value=self.table_columns[0])
         key_column_selection_menu = tk.OptionMenu(
@@ -288,37 +665,209 @@ class Tab(ttk.Frame):
         key_column_selection_menu.config(width=15)
         key_column_selection_menu.grid(row=1, column=0, padx=5, pady=5, sticky="nsew")
 
-        find_button = tk.Button(
+        # Меню выбора режима поиска
+        search_mode = tk.StringVar(value=SEARCH_MODE_LABELS[0][0])
+        search_mode_menu = tk.OptionMenu(
             input_win,
-            text="Find!",
-            command=lambda: self.find_cortege(
+            search_mode,
+            *[label for label, mode in SEARCH_MODE_LABELS + TEXT_SEARCH_MODE_LABELS],
+        )
+        search_mode_menu.config(width=8)
+        search_mode_menu.grid(row=1, column=1, padx=5, pady=5, sticky="nsew")
+        # Режим "similar" доступен только с расширением pg_trgm
+        if self.is_fuzzy_search_available is None:
+            self.executor.submit(
+                self.db_manager.is_fuzzy_search_available,
+                on_success=lambda available: self.on_fuzzy_search_checked(
+                    available, search_mode_menu, search_mode
+                ),
+                on_error=error_handler("Search Error", "Fuzzy search check error"),
+            )
+        elif not self.is_fuzzy_search_available:
+            self.remove_fuzzy_search_mode(search_mode_menu, search_mode)
+
+        # Условия, добавленные кнопкой "AND", объединяются с текущим условием через AND
+        search_filters = []
+        conditions_label = tk.Label(input_win, text="", justify="left")
+        conditions_label.grid(row=3, column=0, columnspan=4, padx=5, sticky="nsew")
+
+        def get_text_search_mode():
+            return dict(TEXT_SEARCH_MODE_LABELS).get(search_mode.get())
+
+        def get_current_filter():
+            return self.db_manager.make_search_filter(
                 key_column.get(),
                 key_val_widget_container["value_container"].get(),
-                next_prev_btns,
+                dict(SEARCH_MODE_LABELS)[search_mode.get()],
+                key_value_to_entry.get(),
+            )
+
+        add_condition_button = tk.Button(
+            input_win,
+            text="AND (add condition)",
+            command=lambda: (
+                ms.showerror(
+                    title="Search Error",
+                    message="Text search can't be combined with other conditions",
+                )
+                if get_text_search_mode()
+                else self.add_search_condition(
+                    search_filters, get_current_filter(), conditions_label
+                )
             ),
         )
-        find_button.grid(row=3, column=0, columnspan=2, pady=10, sticky="nsew")
+        add_condition_button.grid(
+            row=2, column=0, columnspan=2, padx=5, pady=5, sticky="nsew"
+        )
 
-    def find_cortege(self, key_col, key_val, next_prev_btns):
-        try:
-            self.found_records = self.db_manager.find_record(
-                self.table_name, key_col, key_val
+        clear_conditions_button = tk.Button(
+            input_win,
+            text="Clear conditions",
+            command=lambda: self.clear_search_conditions(
+                search_filters, conditions_label
+            ),
+        )
+        clear_conditions_button.grid(
+            row=2, column=2, columnspan=2, padx=5, pady=5, sticky="nsew"
+        )
+
+        find_button = tk.Button(
+            input_win,
+            text="Find!",
+            command=lambda: (
+                self.find_cortege_by_text(
+                    key_column.get(),
+                    key_val_widget_container["value_container"].get(),
+                    get_text_search_mode(),
+                    next_prev_btns,
+                )
+                if get_text_search_mode()
+                else self.find_cortege(
+                    search_filters + [get_current_filter()],
+                    next_prev_btns,
+                )
+            ),
+        )
+        find_button.grid(row=5, column=0, columnspan=4, pady=10, sticky="nsew")
+
+    def on_fuzzy_search_checked(self, available, search_mode_menu, search_mode):
+        self.is_fuzzy_search_available = available
+        # Окно поиска могли закрыть, пока шла проверка
+        if not available and search_mode_menu.winfo_exists():
+            self.remove_fuzzy_search_mode(search_mode_menu, search_mode)
+
+    def remove_fuzzy_search_mode(self, search_mode_menu, search_mode):
+        fuzzy_label = [
+            label for label, mode in TEXT_SEARCH_MODE_LABELS if mode == "fuzzy"
+        ][0]
+        menu = search_mode_menu["menu"]
+        menu.delete(menu.index(fuzzy_label))
+        if search_mode.get() == fuzzy_label:
+            search_mode.set(SEARCH_MODE_LABELS[0][0])
+
+    def add_search_condition(self, search_filters, search_filter, conditions_label):
+        search_filters.append(search_filter)
+        conditions_label["text"] = " AND ".join(
+            self.describe_search_filter(f) for f in search_filters
+        )
+
+    def clear_search_conditions(self, search_filters, conditions_label):
+        search_filters.clear()
+        conditions_label["text"] = ""
+
+    def describe_search_filter(self, search_filter):
+        if search_filter["mode"] == "range":
+            return "{} between {} and {}".format(
+                search_filter["column"],
+                search_filter["value"] or "-inf",
+                search_filter["value_to"] or "+inf",
+            )
+        if search_filter["mode"] == "prefix":
+            return "{} starts with {}".format(
+                search_filter["column"], search_filter["value"]
             )
-            self.show_found_records(next_prev_btns)
-        except Exception as e:
-            ms.showerror(title="Search Error", message="Check input data")
-            print(e)
+        return "{} = {}".format(search_filter["column"], search_filter["value"])
+
+    def find_cortege(self, search_filters, next_prev_btns):
+        self.reset_text_search()
+        self.executor.submit(
+            self.db_manager.find_records_by_filters,
+            self.table_name,
+            search_filters,
+            on_success=lambda found_records: self.on_records_found(
+                found_records, next_prev_btns
+            ),
+            on_error=error_handler("Search Error", "Check input data"),
+        )
+
+    def find_cortege_by_text(self, column, search_value, mode, next_prev_btns):
+        # Первые PAGE_SIZE строк по релевантности; next / previous идут в этом порядке,
+        # следующие страницы подгружаются, когда next доходит до конца списка
+        self.reset_text_search()
+        text_search = (column, search_value, mode)
+        self.executor.submit(
+            self.db_manager.search_text,
+            self.table_name,
+            column,
+            search_value,
+            mode,
+            on_success=lambda found_records: self.on_text_records_found(
+                found_records, text_search, next_prev_btns
+            ),
+            on_error=error_handler("Search Error", "Check input data"),
+        )
+
+    def on_text_records_found(self, found_records, text_search, next_prev_btns):
+        # Неполная страница - последняя, дальше искать нечего
+        if len(found_records) == PAGE_SIZE:
+            self.text_search = text_search
+        self.on_records_found(found_records, next_prev_btns)
+
+    def reset_text_search(self):
+        self.text_search = None
+        if self.found_page_task is not None:
+            self.executor.cancel(self.found_page_task)
+            self.found_page_task = None
+
+    def load_next_found_page(self):
+        if self.found_page_task is not None and self.found_page_task.is_active():
+            return
+        column, search_value, mode = self.text_search
+        self.found_page_task = self.executor.submit(
+            self.db_manager.search_text,
+            self.table_name,
+            column,
+            search_value,
+            mode,
+            len(self.found_records),
+            on_success=self.on_next_found_page_loaded,
+            on_error=error_handler("Search Error", "Loading next results error"),
+        )
+
+    def on_next_found_page_loaded(self, found_records):
+        if len(found_records) < PAGE_SIZE:
+            self.text_search = None
+        next_record_idx = len(self.found_records)
+        self.found_records = self.found_records + found_records
+        # Без новых строк next возвращается к первой найденной записи
+        self.highlight_record(next_record_idx % len(self.found_records))
+
+    def on_records_found(self, found_records, next_prev_btns):
+        self.found_records = found_records
+        self.show_found_records(next_prev_btns)
 
     def show_found_records(self, next_prev_btns):
-        tree_children = self.tree.get_children()
-        self.tree.selection_remove(*tree_children)
+        # Снимаем только текущее выделение, не перебирая все строки Treeview
+        self.tree.selection_remove(*self.tree.selection())
 
         if not self.found_records:
             ms.showinfo(message="Nothing was found")
             return
         found_records_num = len(self.found_records)
+        more_records_mark = "+" if self.text_search is not None else ""
         ms.showinfo(
-            title="Found Message Number", message=f"Found {found_records_num} records"
+            title="Found Message Number",
+            message=f"Found {found_records_num}{more_records_mark} records",
         )
 
         if found_records_num == 1:
@@ -332,29 +881,39 @@ class Tab(ttk.Frame):
         self.highlight_record(0)
 
     def highlight_record(self, record_idx_in_founds_list):
-        tree_children = self.tree.get_children()
-        self.tree.selection_remove(*tree_children)
-        tree_child_idx = self.find_tree_child_index(
-            self.found_records[record_idx_in_founds_list]["id"]
-        )
-        self.tree.selection_set(tree_child_idx)
+        record_id = self.found_records[record_idx_in_founds_list].id
         self.currentHighlightedRecordID = record_idx_in_founds_list
+        # Найденная запись может быть ещё не загружена в Treeview
+        self.load_rows_up_to(record_id, lambda: self.select_tree_record(record_id))
+
+    def select_tree_record(self, record_id):
+        tree_child_idx = self.find_tree_child_index(record_id)
+        if tree_child_idx is None:
+            return
+        # selection_set заменяет прежнее выделение целиком
+        self.tree.selection_set(tree_child_idx)
         self.tree.see(tree_child_idx)
 
     def destroy_search_top_win(self, top):
+        self.reset_text_search()
         self.found_records = []
         self.currentHighlightedRecordID = -1
         top.destroy()
 
     def find_tree_child_index(self, record_id):
-        for tree_child_idx in self.tree.get_children():
-            record_values = self.tree.item(tree_child_idx, "values")
-            if int(record_values[0]) == record_id:
-                return tree_child_idx
+        # iid строки Treeview совпадает с id записи, поэтому поиск - O(1)
+        tree_child_idx = str(record_id)
+        if self.tree.exists(tree_child_idx):
+            return tree_child_idx
         return None
 
     def next_found_record(self):
-        if self.found_records:
+        if not self.found_records:
+            return
+        last_record_idx = len(self.found_records) - 1
+        if self.currentHighlightedRecordID == last_record_idx and self.text_search:
+            self.load_next_found_page()
+        else:
             self.currentHighlightedRecordID = (
                 self.currentHighlightedRecordID + 1
             ) % len(self.found_records)
@@ -380,17 +939,21 @@ class Tab(ttk.Frame):
         else:
             new_widget = tk.Entry(master, width=15, justify="center")
             widget_container["value_container"] = new_widget
-        new_widget.grid(row=1, column=1, padx=5, pady=5, sticky="nsew")
+        new_widget.grid(row=1, column=2, padx=5, pady=5, sticky="nsew")
         widget_container["widget"] = new_widget
 
     def clear_table(self):
-        try:
-            self.db_manager.clear_table(self.table_name)
-            ms.showinfo(title="Success", message="Table cleared successfully")
-            self.notebook.update_all_tables()
-        except Exception as e:
-            ms.showerror(title="Clearing error", message="C")
-            print(e)
+        self.executor.submit(
+            self.db_manager.clear_table,
+            self.table_name,
+            on_success=self.on_table_cleared,
+            on_error=error_handler("Clearing error", "C"),
+            cancellable=False,
+        )
+
+    def on_table_cleared(self, result=None):
+        ms.showinfo(title="Success", message="Table cleared successfully")
+        self.notebook.update_all_tables(self.table_name)
 
     def dummy_action(self):
         print("Button clicked!")